@@ -19,6 +19,7 @@ class Extension(ext.Extension):
 
     def get_config_schema(self):
         from pandora import BaseAPIClient
+        from mopidy_pandora.quality import ADAPTIVE_AUDIO_QUALITY
         schema = super(Extension, self).get_config_schema()
         schema['api_host'] = config.String()
         schema['partner_encryption_key'] = config.String()
@@ -30,11 +31,35 @@ class Extension(ext.Extension):
         schema['password'] = config.Secret()
         schema['preferred_audio_quality'] = config.String(choices=[BaseAPIClient.LOW_AUDIO_QUALITY,
                                                                    BaseAPIClient.MED_AUDIO_QUALITY,
-                                                                   BaseAPIClient.HIGH_AUDIO_QUALITY])
+                                                                   BaseAPIClient.HIGH_AUDIO_QUALITY,
+                                                                   ADAPTIVE_AUDIO_QUALITY])
         schema['sort_order'] = config.String(choices=['date', 'A-Z', 'a-z'])
         schema['auto_setup'] = config.Boolean()
         schema['auto_set_repeat'] = config.Deprecated()
         schema['cache_time_to_live'] = config.Integer(minimum=0)
+        schema['cache_max_staleness'] = config.Integer(minimum=0)
+        schema['persist_station_lists'] = config.Boolean()
+        schema['playlist_low_water_mark'] = config.Integer(minimum=0)
+        schema['audio_url_ttl'] = config.Integer(minimum=0)
+        schema['playability_cache_ttl'] = config.Integer(minimum=0)
+        schema['audio_cache_size'] = config.Integer(minimum=0)
+        schema['audio_proxy_cache_size'] = config.Integer(minimum=0)
+        schema['audio_ring_buffer_size'] = config.Integer(minimum=0)
+        schema['connection_pool_size'] = config.Integer(minimum=1)
+        schema['connection_pool_maxsize'] = config.Integer(minimum=1)
+        schema['connect_timeout'] = config.Integer(minimum=1)
+        schema['read_timeout'] = config.Integer(minimum=1)
+        schema['login_deadline'] = config.Integer(minimum=0)
+        schema['station_list_deadline'] = config.Integer(minimum=0)
+        schema['playlist_deadline'] = config.Integer(minimum=0)
+        schema['feedback_deadline'] = config.Integer(minimum=0)
+        schema['playability_deadline'] = config.Integer(minimum=0)
+        schema['retry_max_attempts'] = config.Integer(minimum=1)
+        schema['circuit_breaker_threshold'] = config.Integer(minimum=1)
+        schema['circuit_breaker_reset_timeout'] = config.Integer(minimum=1)
+        schema['playlist_rate_limit'] = config.Integer(minimum=0)
+        schema['station_playlist_rate_limit'] = config.Integer(minimum=0)
+        schema['metrics_log_interval'] = config.Integer(minimum=0)
         schema['event_support_enabled'] = config.Boolean()
         schema['double_click_interval'] = config.String()
         schema['on_pause_resume_click'] = config.String(choices=['thumbs_up',
@@ -0,0 +1,194 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+
+import logging
+
+import os
+
+import shutil
+
+import threading
+
+import time
+
+from collections import Counter, OrderedDict
+
+import requests
+
+from mopidy_pandora.utils import run_async
+
+try:
+    from urllib.request import pathname2url
+except ImportError:  # Python 2
+    from urllib import pathname2url
+
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache(object):
+    """ Size-bounded, on-disk cache of the audio files of Pandora tracks.
+
+    Audio is downloaded in the background with :func:`prefetch` while the track is still waiting in the tracklist, so
+    that it can be played from the local file instead of having to be streamed from the Pandora servers. The least
+    recently used files are deleted once the combined size of the cached files exceeds ``maxsize``, except for the
+    files of tracks that have been pinned with :func:`pin`.
+
+    Audio URLs expire and track tokens are only valid for a single session, so the cache directory is emptied when
+    the cache is created.
+
+    :param path: the directory to store the audio files in.
+    :param maxsize: the maximum combined size (in bytes) of all of the cached audio files.
+    :param open_url: function that returns a streaming :class:`requests.Response` for the URL provided.
+    :param on_transfer: optional function that is called with the number of bytes downloaded, the time that it took
+           (in seconds), and the time-to-first-byte after each successful download.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path, maxsize, open_url, on_transfer=None):
+        self.path = path
+        self.maxsize = maxsize
+        self._open_url = open_url
+        self._on_transfer = on_transfer
+
+        self._lock = threading.Lock()
+        self._files = OrderedDict()
+        self._downloads = set()
+        self._pins = Counter()
+        self.currsize = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+        self.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._files
+
+    def __len__(self):
+        with self._lock:
+            return len(self._files)
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self.currsize = 0
+        shutil.rmtree(self.path, ignore_errors=True)
+        try:
+            os.makedirs(self.path)
+        except OSError:
+            logger.exception("Error creating Pandora audio cache directory '{}'.".format(self.path))
+
+    def get_uri(self, key):
+        """ Returns the 'file://' URI of the cached audio for 'key', or 'None' if it has not been downloaded yet. """
+        with self._lock:
+            if key not in self._files:
+                self.misses += 1
+                return None
+            # Mark as most recently used.
+            self._files[key] = self._files.pop(key)
+            self.hits += 1
+        return 'file://' + pathname2url(self._get_file_path(key))
+
+    def prefetch(self, key, url):
+        """ Download the audio at 'url' in the background, unless it has been cached or is being downloaded already.
+
+        :param key: the URI of the track that the audio belongs to.
+        :param url: the Pandora audio URL of the track.
+        :return: the Thread that the download is running in, or 'None' if no download was started.
+        """
+        with self._lock:
+            if key in self._files or key in self._downloads:
+                return None
+            self._downloads.add(key)
+        return self._download(key, url)
+
+    def pin(self, key):
+        """ Prevent the audio of the track identified by 'key' from being evicted until :func:`unpin` has been called
+        for it. Tracks can be pinned before their audio has been downloaded.
+        """
+        with self._lock:
+            self._pins[key] += 1
+
+    def unpin(self, key):
+        with self._lock:
+            if self._pins[key] <= 1:
+                self._pins.pop(key, None)
+            else:
+                self._pins[key] -= 1
+            self._evict()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'size': self.currsize,
+                'maxsize': self.maxsize,
+                'downloading': len(self._downloads),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'errors': self.errors,
+            }
+
+    @run_async
+    def _download(self, key, url):
+        file_path = self._get_file_path(key)
+        part_path = file_path + '.part'
+        response = None
+        try:
+            start_time = time.time()
+            response = self._open_url(url)
+            ttfb = time.time() - start_time
+            response.raise_for_status()
+            size = 0
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(self.CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.maxsize:
+                        raise IOError('Audio file is larger than the cache.')
+                    f.write(chunk)
+            os.rename(part_path, file_path)
+            if self._on_transfer is not None:
+                self._on_transfer(size, time.time() - start_time - ttfb, ttfb=ttfb)
+            with self._lock:
+                self._files[key] = size
+                self.currsize += size
+                self._evict(keep=key)
+            logger.debug("Cached audio for Pandora track '{}' ({:d} bytes).".format(key, size))
+        except (IOError, OSError, requests.exceptions.RequestException) as e:
+            logger.warning("Error caching audio for Pandora track '{}': {}".format(key, e))
+            with self._lock:
+                self.errors += 1
+            self._remove_file(part_path)
+        finally:
+            if response is not None:
+                response.close()
+            with self._lock:
+                self._downloads.discard(key)
+
+    def _evict(self, keep=None):
+        for key in list(self._files):
+            if self.currsize <= self.maxsize:
+                break
+            if key == keep or self._pins[key] > 0:
+                continue
+            self.currsize -= self._files.pop(key)
+            self.evictions += 1
+            self._remove_file(self._get_file_path(key))
+            logger.debug("Evicted audio for Pandora track '{}' from cache.".format(key))
+
+    def _get_file_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -2,17 +2,29 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import logging
 
+import os
+
+import threading
+
 from mopidy import backend, core
 
+from pandora import BaseAPIClient
 from pandora.errors import PandoraException
 
 import pykka
 
-from mopidy_pandora import listener, utils
+import requests
 
+from mopidy_pandora import Extension, listener, utils
+
+from mopidy_pandora.audiocache import AudioCache
 from mopidy_pandora.client import MopidyAPIClient, MopidySettingsDictBuilder
 from mopidy_pandora.library import PandoraLibraryProvider
+from mopidy_pandora.metrics import MetricsLogger
 from mopidy_pandora.playback import PandoraPlaybackProvider
+from mopidy_pandora.proxy import AudioProxy
+from mopidy_pandora.quality import ADAPTIVE_AUDIO_QUALITY, AdaptiveAudioQuality
+from mopidy_pandora.ringbuffer import AudioRingBuffer
 from mopidy_pandora.uri import PandoraUri  # noqa: I101
 
 
@@ -25,8 +37,18 @@ class PandoraBackend(pykka.ThreadingActor, backend.Backend, core.CoreListener, l
     def __init__(self, config, audio):
         super(PandoraBackend, self).__init__()
         self.config = config['pandora']
+
+        audio_quality = self.config.get('preferred_audio_quality')
+        self.quality_selector = None
+        if audio_quality == ADAPTIVE_AUDIO_QUALITY:
+            # Start off with medium quality, the selector adjusts it based on the throughput that is measured.
+            self.quality_selector = AdaptiveAudioQuality(initial_quality=BaseAPIClient.MED_AUDIO_QUALITY)
+            audio_quality = self.quality_selector.quality
+        on_transfer = self.quality_selector.record_transfer if self.quality_selector is not None else None
+
         settings = {
             'CACHE_TTL': self.config.get('cache_time_to_live'),
+            'CACHE_MAX_STALENESS': self.config.get('cache_max_staleness'),
             'API_HOST': self.config.get('api_host'),
             'DECRYPTION_KEY': self.config['partner_decryption_key'],
             'ENCRYPTION_KEY': self.config['partner_encryption_key'],
@@ -34,22 +56,198 @@ class PandoraBackend(pykka.ThreadingActor, backend.Backend, core.CoreListener, l
             'PARTNER_PASSWORD': self.config['partner_password'],
             'DEVICE': self.config['partner_device'],
             'PROXY': utils.format_proxy(config['proxy']),
-            'AUDIO_QUALITY': self.config.get('preferred_audio_quality')
+            'AUDIO_QUALITY': audio_quality,
+            'POOL_CONNECTIONS': self.config.get('connection_pool_size'),
+            'POOL_MAXSIZE': self.config.get('connection_pool_maxsize'),
+            'CONNECT_TIMEOUT': self.config.get('connect_timeout'),
+            'READ_TIMEOUT': self.config.get('read_timeout'),
+            'DEADLINES': {
+                'login': self.config.get('login_deadline'),
+                'station_list': self.config.get('station_list_deadline'),
+                'playlist': self.config.get('playlist_deadline'),
+                'feedback': self.config.get('feedback_deadline'),
+                'playability': self.config.get('playability_deadline'),
+            },
+            'RETRY_MAX_ATTEMPTS': self.config.get('retry_max_attempts'),
+            'CIRCUIT_BREAKER_THRESHOLD': self.config.get('circuit_breaker_threshold'),
+            'CIRCUIT_BREAKER_RESET_TIMEOUT': self.config.get('circuit_breaker_reset_timeout'),
+            'PLAYLIST_RATE_LIMIT': self.config.get('playlist_rate_limit'),
+            'STATION_PLAYLIST_RATE_LIMIT': self.config.get('station_playlist_rate_limit'),
         }
+        if self.config.get('persist_station_lists'):
+            settings['SNAPSHOT_PATH'] = os.path.join(Extension.get_cache_dir(config), 'station_lists.json')
 
         self.api = MopidySettingsDictBuilder(settings, client_class=MopidyAPIClient).build()
-        self.library = PandoraLibraryProvider(backend=self, sort_order=self.config.get('sort_order'))
+        self.library = PandoraLibraryProvider(backend=self, sort_order=self.config.get('sort_order'),
+                                              playlist_low_water_mark=self.config.get('playlist_low_water_mark'),
+                                              audio_url_ttl=self.config.get('audio_url_ttl'),
+                                              playability_cache_ttl=self.config.get('playability_cache_ttl'))
         self.playback = PandoraPlaybackProvider(audio, self)
         self.uri_schemes = [PandoraUri.SCHEME]
 
+        self.audio_cache = None
+        if self.config.get('audio_cache_size'):
+            self.audio_cache = AudioCache(os.path.join(Extension.get_cache_dir(config), 'audio'),
+                                          self.config['audio_cache_size'] * 1024 * 1024, self.api.transport.open_url,
+                                          on_transfer=on_transfer)
+
+        self.audio_proxy = None
+        if self.config.get('audio_proxy_cache_size'):
+            ring_buffer = None
+            if self.config.get('audio_ring_buffer_size'):
+                ring_buffer = AudioRingBuffer(self.config['audio_ring_buffer_size'] * 1024 * 1024)
+            self.audio_proxy = AudioProxy(os.path.join(Extension.get_cache_dir(config), 'proxy'),
+                                          self.config['audio_proxy_cache_size'] * 1024 * 1024,
+                                          self.api.transport.open_url, ring_buffer=ring_buffer,
+                                          on_transfer=on_transfer)
+
+        # Playability probes are run one at a time, so that a long tracklist does not result in a burst of concurrent
+        # requests to the audio server every time that the track changes.
+        self._probe_scheduler = utils.Scheduler(name='PandoraPlayabilityProbe')
+        self._pending_probes = set()
+        self._pending_probes_lock = threading.Lock()
+
+        self.metrics_logger = None
+        if self.config.get('metrics_log_interval'):
+            self.metrics_logger = MetricsLogger(self.api.metrics, self.config['metrics_log_interval'])
+
     def on_start(self):
+        if self.metrics_logger is not None:
+            self.metrics_logger.start()
+        if self.audio_proxy is not None:
+            self.audio_proxy.start()
+        snapshot_loaded = self.api.load_snapshot()
         self.api.login(self.config['username'], self.config['password'])
+        if snapshot_loaded:
+            self._revalidate_snapshot()
+
+    def on_stop(self):
+        self._probe_scheduler.stop()
+        if self.metrics_logger is not None:
+            self.metrics_logger.stop()
+        if self.audio_proxy is not None:
+            self.audio_proxy.stop()
+
+    def get_metrics(self):
+        """ Returns a dictionary of the metrics collected by the API client, the playlist buffer statistics of each
+        station that is being played, and the track, audio cache, audio proxy, and audio quality statistics.
+        """
+        metrics = self.api.get_metrics()
+        metrics['playlists'] = self.library.get_prefetch_stats()
+        metrics['track_cache'] = self.library.pandora_track_cache.stats
+        if self.audio_cache is not None:
+            metrics['audio_cache'] = self.audio_cache.stats
+        if self.audio_proxy is not None:
+            metrics['audio_proxy'] = self.audio_proxy.stats
+        if self.quality_selector is not None:
+            metrics['audio_quality'] = self.quality_selector.stats
+        return metrics
+
+    @utils.run_async
+    def _revalidate_snapshot(self):
+        self.api.revalidate_snapshot()
 
     def end_of_tracklist_reached(self, station_id=None, auto_play=False):
         self.prepare_next_track(station_id, auto_play)
 
+    def queued_tracks_changed(self, track_uris):
+        self.library.pandora_track_cache.set_queued(track_uris)
+        self.prefetch_audio(track_uris)
+
+    def prefetch_audio(self, track_uris):
+        """ Start downloading the audio of the queued tracks into the audio cache, if it is enabled.
+
+        :param track_uris: the URIs of the tracks in the tracklist.
+        """
+        if self.audio_cache is None:
+            return
+        for track_uri in track_uris:
+            if track_uri == self.playback.current_track_uri:
+                # Already being streamed.
+                continue
+            try:
+                audio_url = self.library.lookup_pandora_track(track_uri).audio_url
+            except KeyError:
+                continue
+            if audio_url:
+                self.audio_cache.prefetch(track_uri, audio_url)
+
+    def track_playback_started(self, tl_track):
+        self.invalidate_expiring_tracks(tl_track.track.uri, tl_track.track.length)
+        self.prepare_upcoming_tracks(tl_track.track.uri)
+
+    def track_playback_resumed(self, tl_track, time_position):
+        self.invalidate_expiring_tracks(tl_track.track.uri, tl_track.track.length, time_position)
+
+    def invalidate_expiring_tracks(self, current_uri, length=None, time_position=0):
+        """ Invalidate the queued tracks whose audio URLs will expire before the track that is currently being played
+        has finished, so that they can be replaced before they reach the head of the tracklist.
+
+        :param current_uri: the URI of the track that is currently being played.
+        :param length: the length of the current track in milliseconds.
+        :param time_position: the current playback position in the track in milliseconds.
+        """
+        if not PandoraUri.is_pandora_uri(current_uri):
+            return
+        margin = max((length or 0) - (time_position or 0), 0) / 1000
+        for track_uri in self.library.pandora_track_cache.queued:
+            if track_uri != current_uri and self.library.is_track_expired(track_uri, margin):
+                logger.info("Audio URL for Pandora track '{}' is about to expire, replacing it.".format(track_uri))
+                self._trigger_track_invalidated(track_uri)
+
     def prepare_next_track(self, station_id, auto_play=False):
-        self._trigger_next_track_available(self.library.get_next_pandora_track(station_id), auto_play)
+        track = self.library.get_next_pandora_track(station_id)
+        self._trigger_next_track_available(track, auto_play)
+        if track is not None and self.library.playability_cache_ttl:
+            self.probe_track_playability(track.uri)
+
+    def prepare_upcoming_tracks(self, current_uri=None):
+        """ Make sure that the playability of the queued tracks has been checked recently, so that changing to the
+        next track does not have to wait for the audio server.
+
+        :param current_uri: the URI of the track that is currently being played, which does not need to be checked.
+        """
+        if not self.library.playability_cache_ttl:
+            return
+        for track_uri in self.library.pandora_track_cache.queued:
+            if track_uri != current_uri:
+                self.probe_track_playability(track_uri)
+
+    def probe_track_playability(self, track_uri):
+        """ Check if the track is playable in the background, so that the result is already available by the time that
+        playback changes to it. Tracks that are not playable are invalidated so that they can be replaced.
+
+        Tracks that have been checked recently, or that are already waiting to be checked, are skipped.
+
+        :param track_uri: the URI of the track to check.
+        :return: True if a check was scheduled, False otherwise.
+        """
+        if self.library.is_playability_cached(track_uri):
+            return False
+        with self._pending_probes_lock:
+            if track_uri in self._pending_probes:
+                return False
+            self._pending_probes.add(track_uri)
+        self._probe_scheduler.call_soon(self._probe_track_playability, track_uri)
+        return True
+
+    def _probe_track_playability(self, track_uri):
+        try:
+            if self.library.is_track_playable(track_uri):
+                return
+        except KeyError:
+            # Track has already been removed from the cache, nothing to check.
+            return
+        except (AttributeError, requests.exceptions.RequestException) as e:
+            # Leave it to the check when changing tracks to decide whether or not the track should be skipped.
+            logger.warning("Error checking if Pandora track '{}' is playable: {}".format(track_uri, e))
+            return
+        finally:
+            with self._pending_probes_lock:
+                self._pending_probes.discard(track_uri)
+
+        logger.info("Pandora track '{}' is not playable, replacing it.".format(track_uri))
+        self._trigger_track_invalidated(track_uri)
 
     def event_triggered(self, track_uri, pandora_event):
         self.process_event(track_uri, pandora_event)
@@ -69,6 +267,10 @@ class PandoraBackend(pykka.ThreadingActor, backend.Backend, core.CoreListener, l
         except PandoraException:
             logger.exception('Error calling Pandora event: {}.'.format(pandora_event))
             return False
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error calling Pandora event: {}. Could not reach the Pandora server: {}."
+                           .format(pandora_event, e))
+            return False
 
     def thumbs_up(self, track_uri):
         return self.api.add_feedback(PandoraUri.factory(track_uri).token, True)
@@ -94,5 +296,8 @@ class PandoraBackend(pykka.ThreadingActor, backend.Backend, core.CoreListener, l
     def _trigger_next_track_available(self, track, auto_play=False):
         listener.PandoraBackendListener.send('next_track_available', track=track, auto_play=auto_play)
 
+    def _trigger_track_invalidated(self, track_uri):
+        listener.PandoraBackendListener.send('track_invalidated', track_uri=track_uri)
+
     def _trigger_event_processed(self, track_uri, pandora_event):
         listener.PandoraBackendListener.send('event_processed', track_uri=track_uri, pandora_event=pandora_event)
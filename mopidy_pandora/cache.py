@@ -0,0 +1,145 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+
+import threading
+
+from collections import Counter, OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class TrackCache(object):
+    """ Least recently used cache of Pandora tracks that never evicts tracks that are still needed for playback.
+
+    Tracks can be pinned any number of times, and are only eligible for eviction once every pin has been released
+    again. The tracks that are currently queued in the tracklist are pinned using :func:`set_queued`. If all of the
+    cached tracks are pinned then the cache is allowed to grow beyond ``maxsize`` until some of them are unpinned.
+
+    :param maxsize: the maximum number of unpinned tracks to keep in the cache.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+
+        self._lock = threading.RLock()
+        self._items = OrderedDict()
+        self._pins = Counter()
+        self._queued = Counter()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+            # Mark as most recently used.
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            self._evict(keep=key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._items[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def peek(self, key, default=None):
+        """ Returns the cached value for 'key' without marking it as recently used. """
+        with self._lock:
+            return self._items.get(key, default)
+
+    def pop(self, key, *args):
+        with self._lock:
+            return self._items.pop(key, *args)
+
+    @property
+    def currsize(self):
+        return len(self)
+
+    def pin(self, key):
+        """ Prevent the track identified by 'key' from being evicted until :func:`unpin` has been called for it. """
+        with self._lock:
+            self._pins[key] += 1
+
+    def unpin(self, key):
+        with self._lock:
+            if self._pins[key] <= 1:
+                self._pins.pop(key, None)
+            else:
+                self._pins[key] -= 1
+            self._evict()
+
+    def is_pinned(self, key):
+        with self._lock:
+            return self._pins[key] > 0
+
+    def set_queued(self, keys):
+        """ Pin the tracks in 'keys', which are currently queued for playback, and release the pins of tracks that
+        were queued before but have since been removed.
+
+        :param keys: the URIs of all of the tracks in the tracklist. URIs may occur more than once.
+        """
+        with self._lock:
+            queued = Counter(keys)
+            for key, count in (queued - self._queued).items():
+                self._pins[key] += count
+            for key, count in (self._queued - queued).items():
+                self._pins[key] -= count
+                if self._pins[key] <= 0:
+                    del self._pins[key]
+            self._queued = queued
+            self._evict()
+
+    @property
+    def queued(self):
+        """ The keys of the tracks that are currently queued for playback. """
+        with self._lock:
+            return list(self._queued)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'pinned': sum(1 for key in self._items if self._pins[key] > 0),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _evict(self, keep=None):
+        excess = len(self._items) - self.maxsize
+        if excess <= 0:
+            return
+
+        # Evict the least recently used tracks that are not pinned.
+        for key in [key for key in self._items if self._pins[key] <= 0 and key != keep][:excess]:
+            del self._items[key]
+            self.evictions += 1
+            logger.debug("Evicted Pandora track '{}' from cache.".format(key))
@@ -1,15 +1,25 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import logging
+import threading
 import time
 
-from cachetools import TTLCache
+from collections import Counter
+from contextlib import contextmanager
+
+from cachetools import LRUCache, TTLCache
 
 import pandora
 from pandora.clientbuilder import APITransport, DEFAULT_API_HOST, Encryptor, SettingsDictBuilder
+from pandora.errors import PandoraException, StationDoesNotExist
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from mopidy_pandora.metrics import Metrics
+from mopidy_pandora.snapshot import StationListSnapshot
+from mopidy_pandora.utils import CircuitBreaker, CircuitOpenError, RateLimitExceeded, RetryPolicy, SingleFlight, \
+    TokenBucket, run_async
 
 logger = logging.getLogger(__name__)
 
@@ -20,27 +30,396 @@ class MopidySettingsDictBuilder(SettingsDictBuilder):
         enc = Encryptor(settings['DECRYPTION_KEY'],
                         settings['ENCRYPTION_KEY'])
 
-        trans = APITransport(enc,
-                             settings.get('API_HOST', DEFAULT_API_HOST),
-                             settings.get('PROXY', None))
+        trans = MopidyAPITransport(enc,
+                                   settings.get('API_HOST', DEFAULT_API_HOST),
+                                   settings.get('PROXY', None),
+                                   pool_connections=settings.get('POOL_CONNECTIONS'),
+                                   pool_maxsize=settings.get('POOL_MAXSIZE'),
+                                   timeout=(settings.get('CONNECT_TIMEOUT'), settings.get('READ_TIMEOUT')),
+                                   deadlines=settings.get('DEADLINES'),
+                                   retry_max_attempts=settings.get('RETRY_MAX_ATTEMPTS'),
+                                   circuit_breaker_threshold=settings.get('CIRCUIT_BREAKER_THRESHOLD'),
+                                   circuit_breaker_reset_timeout=settings.get('CIRCUIT_BREAKER_RESET_TIMEOUT'))
 
         quality = settings.get('AUDIO_QUALITY',
                                self.client_class.MED_AUDIO_QUALITY)
 
+        snapshot = None
+        if settings.get('SNAPSHOT_PATH'):
+            snapshot = StationListSnapshot(settings['SNAPSHOT_PATH'])
+
+        playlist_rate_limiter = None
+        if settings.get('PLAYLIST_RATE_LIMIT') or settings.get('STATION_PLAYLIST_RATE_LIMIT'):
+            playlist_rate_limiter = PlaylistRateLimiter(settings.get('PLAYLIST_RATE_LIMIT'),
+                                                        settings.get('STATION_PLAYLIST_RATE_LIMIT'))
+
         return self.client_class(settings['CACHE_TTL'], trans,
                                  settings['PARTNER_USER'],
                                  settings['PARTNER_PASSWORD'],
-                                 settings['DEVICE'], quality)
+                                 settings['DEVICE'], quality,
+                                 snapshot=snapshot,
+                                 cache_max_staleness=settings.get('CACHE_MAX_STALENESS') or 0,
+                                 playlist_rate_limiter=playlist_rate_limiter)
+
+
+class PooledSession(requests.Session):
+    """ Requests session that keeps a pool of keep-alive connections open for each host, and applies a default
+    timeout to every request that does not specify its own.
+
+    :param pool_connections: the number of hosts to keep connection pools for.
+    :param pool_maxsize: the maximum number of connections to keep open to any single host.
+    :param timeout: the default (connect, read) timeout in seconds. A value of 'None' waits indefinitely.
+    """
+
+    def __init__(self, pool_connections=requests.adapters.DEFAULT_POOLSIZE,
+                 pool_maxsize=requests.adapters.DEFAULT_POOLSIZE, timeout=None):
+        super(PooledSession, self).__init__()
+        self.timeout = timeout
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=3)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(PooledSession, self).request(method, url, **kwargs)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """ Raised when an operation did not complete within the deadline configured for its operation type.
+
+    This is a :class:`requests.exceptions.Timeout`, so that it is handled like any other timeout. It is not retried
+    by :class:`MopidyAPITransport`, which replaces pydora's retry logic.
+    """
+
+    def __init__(self, operation, deadline):
+        super(DeadlineExceeded, self).__init__("Pandora '{}' operation exceeded deadline of {} seconds."
+                                               .format(operation, deadline))
+        self.operation = operation
+        self.deadline = deadline
+
+
+class MopidyAPITransport(APITransport):
+    """ Pandora API transport that shares a single :class:`PooledSession` between calls to the Pandora API and
+    playability checks of the audio URLs, so that connections to both are re-used between track changes.
+
+    Each Pandora API method belongs to an operation type (see ``OPERATIONS``). The total time that all of the requests
+    made for an operation may take, including retries, can be limited by specifying a deadline for its type.
+
+    Failed calls to the methods in ``IDEMPOTENT_METHODS`` are retried using jittered exponential backoff. Calls to each
+    method are also protected by a :class:`mopidy_pandora.utils.CircuitBreaker`, which fails fast with a
+    :class:`mopidy_pandora.utils.CircuitOpenError` after repeated failures instead of sending more requests to a
+    degraded server.
+    """
+
+    OPERATIONS = {
+        'auth.partnerLogin': 'login',
+        'auth.userLogin': 'login',
+        'user.getStationList': 'station_list',
+        'user.getStationListChecksum': 'station_list',
+        'station.getGenreStations': 'station_list',
+        'station.getGenreStationsChecksum': 'station_list',
+        'station.getStation': 'station_list',
+        'station.createStation': 'station_list',
+        'station.deleteStation': 'station_list',
+        'music.search': 'station_list',
+        'station.getPlaylist': 'playlist',
+        'ad.getAdMetadata': 'playlist',
+        'ad.registerAd': 'playlist',
+        'station.addFeedback': 'feedback',
+        'station.deleteFeedback': 'feedback',
+        'bookmark.addArtistBookmark': 'feedback',
+        'bookmark.addSongBookmark': 'feedback',
+        'user.sleepSong': 'feedback',
+    }
+
+    # Methods that can safely be called again if the first attempt failed. Creating stations and registering
+    # advertisements are not retried, as the first attempt may have been processed by the server already.
+    IDEMPOTENT_METHODS = frozenset([
+        'auth.partnerLogin',
+        'auth.userLogin',
+        'user.getStationList',
+        'user.getStationListChecksum',
+        'station.getGenreStations',
+        'station.getGenreStationsChecksum',
+        'station.getStation',
+        'station.deleteStation',
+        'music.search',
+        'station.getPlaylist',
+        'ad.getAdMetadata',
+        'station.addFeedback',
+        'station.deleteFeedback',
+        'bookmark.addArtistBookmark',
+        'bookmark.addSongBookmark',
+        'user.sleepSong',
+    ])
+
+    def __init__(self, cryptor, api_host=DEFAULT_API_HOST, proxy=None, pool_connections=None, pool_maxsize=None,
+                 timeout=None, deadlines=None, retry_max_attempts=None, circuit_breaker_threshold=None,
+                 circuit_breaker_reset_timeout=None):
+        super(MopidyAPITransport, self).__init__(cryptor, api_host, proxy)
+
+        session = PooledSession(pool_connections=pool_connections or requests.adapters.DEFAULT_POOLSIZE,
+                                pool_maxsize=pool_maxsize or requests.adapters.DEFAULT_POOLSIZE,
+                                timeout=timeout)
+        session.proxies = self._http.proxies
+        self._http = session
+
+        self.deadlines = deadlines or {}
+        self.timeouts = Counter()
+        self._timeouts_lock = threading.Lock()
+        self._local = threading.local()
+
+        self.retry_policy = RetryPolicy(max_attempts=retry_max_attempts or 3, retry_on=self._is_transient_error)
+        self.circuit_breaker_threshold = circuit_breaker_threshold or 5
+        self.circuit_breaker_reset_timeout = circuit_breaker_reset_timeout or 30
+        self.circuit_breakers = {}
+        self._circuit_breakers_lock = threading.Lock()
+
+    def __call__(self, method, **data):
+        # Replaces pydora's transport, which retries every method a fixed number of times.
+        return self._execute(method, data)
+
+    @property
+    def session(self):
+        return self._http
+
+    def get_circuit_breaker(self, method):
+        with self._circuit_breakers_lock:
+            circuit_breaker = self.circuit_breakers.get(method)
+            if circuit_breaker is None:
+                circuit_breaker = self.circuit_breakers[method] = CircuitBreaker(
+                    method,
+                    failure_threshold=self.circuit_breaker_threshold,
+                    reset_timeout=self.circuit_breaker_reset_timeout,
+                    is_failure=self._is_failure)
+            return circuit_breaker
+
+    @classmethod
+    def get_operation(cls, method):
+        return cls.OPERATIONS.get(method)
+
+    @contextmanager
+    def deadline(self, operation):
+        """ Context manager that limits the total time that all of the requests made within it may take to the
+        deadline configured for 'operation'. Nested deadlines are ignored in favour of the outermost one.
+        """
+        if getattr(self._local, 'deadline', None) is not None or not self.deadlines.get(operation):
+            yield
+            return
+
+        self._local.deadline = (operation, time.time() + self.deadlines[operation])
+        try:
+            yield
+        finally:
+            self._local.deadline = None
+
+    def test_url(self, url):
+        with self.deadline('playability'):
+            return self._request(self._http.head, url).status_code == requests.codes.OK
+
+    def open_url(self, url, **kwargs):
+        """ Start streaming the content at 'url', re-using the connections that are kept open to the audio servers. """
+        return self._request(self._http.get, url, stream=True, **kwargs)
+
+    def _make_http_request(self, url, data, params):
+        try:
+            data = data.encode('utf-8')
+        except AttributeError:
+            pass
+
+        params = self.remove_empty_values(params)
+
+        result = self._request(self._http.post, url, data=data, params=params)
+        result.raise_for_status()
+        return result.content
+
+    def _execute(self, method, data):
+        circuit_breaker = self.get_circuit_breaker(method)
+        if method in self.IDEMPOTENT_METHODS:
+            return circuit_breaker.call(self.retry_policy.call, self._call, method, data)
+        return circuit_breaker.call(self._call, method, data)
+
+    def _call(self, method, data):
+        self._start_request(method)
+
+        url = self._build_url(method)
+        data = self._build_data(method, dict(data))
+        params = self._build_params(method)
+        result = self._make_http_request(url, data, params)
+
+        return self._parse_response(result)
+
+    @staticmethod
+    def _is_transient_error(e):
+        # Errors reported by the Pandora API are unlikely to go away by calling the same method again, but running
+        # out of time or not being able to reach the server at all might.
+        if isinstance(e, (DeadlineExceeded, CircuitOpenError)):
+            return False
+        return not isinstance(e, PandoraException)
+
+    @classmethod
+    def _is_failure(cls, e):
+        return isinstance(e, DeadlineExceeded) or cls._is_transient_error(e)
+
+    def _request(self, request, url, **kwargs):
+        deadline = getattr(self._local, 'deadline', None)
+        if deadline is None:
+            return request(url, **kwargs)
+
+        operation, expires_at = deadline
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            self._record_timeout(operation)
+            raise DeadlineExceeded(operation, self.deadlines[operation])
+
+        # Don't wait for longer than the time remaining until the deadline.
+        connect_timeout, read_timeout = self._http.timeout or (None, None)
+        kwargs['timeout'] = (min(connect_timeout or remaining, remaining), min(read_timeout or remaining, remaining))
+        try:
+            return request(url, **kwargs)
+        except requests.exceptions.Timeout:
+            self._record_timeout(operation)
+            if time.time() >= expires_at:
+                # Timed out because the deadline expired, fail the operation as a whole instead of retrying it.
+                raise DeadlineExceeded(operation, self.deadlines[operation])
+            raise
+
+    def _record_timeout(self, operation):
+        with self._timeouts_lock:
+            self.timeouts[operation] += 1
+        logger.warning("Pandora '{}' request timed out.".format(operation))
+
+
+class PlaylistRateLimiter(object):
+    """ Paces the requests for station playlists, using a :class:`mopidy_pandora.utils.TokenBucket` for the account as a
+    whole and one for each station.
+
+    Pandora only allows a limited number of playlist requests per station and per account in a given time period, and
+    accounts that exceed it are throttled. Prefetching playlists, or skipping over a streak of unplayable tracks, could
+    otherwise use up the allowance in no time.
+
+    Each bucket allows a burst of a tenth of its hourly limit. Requests beyond that are rejected with
+    :class:`mopidy_pandora.utils.RateLimitExceeded`, so that the Mopidy actor threads are never blocked. Requests that
+    are made within :meth:`allow_delay` (e.g. by the background playlist prefetcher) are delayed until the buckets have
+    been refilled instead, and only rejected if they would have to wait for longer than ``max_delay`` seconds.
+
+    :param account_limit: the maximum number of playlist requests per hour for the account, or '0' for no limit.
+    :param station_limit: the maximum number of playlist requests per hour for each station, or '0' for no limit.
+    :param max_delay: the maximum number of seconds that a request made within :meth:`allow_delay` may be delayed for.
+    """
+    MAX_STATIONS = 100
+
+    def __init__(self, account_limit=0, station_limit=0, max_delay=10):
+        self.station_limit = station_limit
+        self.max_delay = max_delay
+
+        self.account_bucket = None
+        if account_limit:
+            self.account_bucket = self._create_bucket('account', account_limit)
+
+        self._lock = threading.Lock()
+        self._station_buckets = LRUCache(self.MAX_STATIONS)
+        self._local = threading.local()
+
+    @contextmanager
+    def allow_delay(self):
+        """ Context manager within which the current thread waits for playlist requests that exceed the rate limit to
+        be allowed, instead of failing right away.
+        """
+        allow_delay = getattr(self._local, 'allow_delay', False)
+        self._local.allow_delay = True
+        try:
+            yield
+        finally:
+            self._local.allow_delay = allow_delay
+
+    def acquire(self, station_token):
+        """ Reserve a playlist request for the station, waiting until it may be made if called within
+        :meth:`allow_delay`.
+
+        :return: the number of seconds that the request was delayed for.
+        :raises RateLimitExceeded: if the request would have to be delayed outside of :meth:`allow_delay`, or for
+            longer than 'max_delay'.
+        """
+        max_delay = self.max_delay if getattr(self._local, 'allow_delay', False) else 0
+        buckets = [bucket for bucket in (self.get_station_bucket(station_token), self.account_bucket)
+                   if bucket is not None]
+        reserved = []
+        try:
+            for bucket in buckets:
+                reserved.append((bucket, bucket.reserve(max_delay)))
+        except RateLimitExceeded:
+            for bucket, _ in reserved:
+                bucket.cancel()
+            raise
+
+        delay = max([d for _, d in reserved] or [0])
+        if delay > 0:
+            logger.info("Delaying Pandora playlist request for station '{}' by {:.1f} seconds to stay within the "
+                        "rate limit.".format(station_token, delay))
+            time.sleep(delay)
+        return delay
+
+    def get_remaining(self, station_token):
+        """ Returns the number of playlist requests for the station that can be made without being delayed, or 'None'
+        if no limits apply.
+        """
+        remaining = [bucket.remaining for bucket in (self.get_station_bucket(station_token), self.account_bucket)
+                     if bucket is not None]
+        return min(remaining) if remaining else None
+
+    def get_station_bucket(self, station_token):
+        if not self.station_limit:
+            return None
+        with self._lock:
+            bucket = self._station_buckets.get(station_token)
+            if bucket is None:
+                bucket = self._station_buckets[station_token] = self._create_bucket(station_token, self.station_limit)
+            return bucket
+
+    @property
+    def stats(self):
+        with self._lock:
+            station_buckets = list(self._station_buckets.items())
+        return {
+            'account': self.account_bucket.stats if self.account_bucket is not None else None,
+            'stations': dict((station_token, bucket.stats) for station_token, bucket in station_buckets),
+        }
+
+    @staticmethod
+    def _create_bucket(name, hourly_limit):
+        return TokenBucket(name, hourly_limit / 3600, max(hourly_limit // 10, 1))
 
 
 class MopidyAPIClient(pandora.APIClient):
     """Pydora API Client for Mopidy-Pandora
 
-    This API client implements caching of the station list.
+    This API client implements caching of the station list. The cached lists can optionally be persisted to disk
+    using a :class:`mopidy_pandora.snapshot.StationListSnapshot`, so that they are available immediately on startup.
+
+    If ``cache_max_staleness`` is specified then lists that have expired will still be returned immediately for up
+    to that many seconds, while a fresh copy is retrieved from the Pandora server in the background.
+
+    Concurrent requests for the station list, genre stations, or the same station are coalesced so that only one
+    request is sent to the Pandora server at a time.
+
+    Stations are looked up using an index of the cached station list. Station tokens that the Pandora server
+    could not find are remembered for ``cache_ttl`` seconds, so that repeated lookups fail without another request.
+
+    The latency and outcome of every Pandora API call, as well as cache hits and misses, are recorded in ``metrics``.
+
+    Playlist requests are paced by the :class:`PlaylistRateLimiter` provided as ``playlist_rate_limiter``, if any.
     """
+    STATION_NOT_FOUND_CACHE_SIZE = 100
+    # Number of seconds to remember that a station does not exist on the Pandora server.
+    STATION_NOT_FOUND_CACHE_TTL = 300
+    AUDIO_URL_MAP_CACHE_SIZE = 100
 
     def __init__(self, cache_ttl, transport, partner_user, partner_password, device,
-                 default_audio_quality=pandora.BaseAPIClient.MED_AUDIO_QUALITY):
+                 default_audio_quality=pandora.BaseAPIClient.MED_AUDIO_QUALITY, snapshot=None, cache_max_staleness=0,
+                 playlist_rate_limiter=None):
 
         super(MopidyAPIClient, self).__init__(transport, partner_user, partner_password, device,
                                               default_audio_quality)
@@ -48,47 +427,304 @@ class MopidyAPIClient(pandora.APIClient):
         self.station_list_cache = TTLCache(1, cache_ttl)
         self.genre_stations_cache = TTLCache(1, cache_ttl)
 
+        self.cache_max_staleness = cache_max_staleness if cache_ttl > 0 else 0
+        self.station_list_stale_cache = TTLCache(1, cache_ttl + self.cache_max_staleness)
+        self.genre_stations_stale_cache = TTLCache(1, cache_ttl + self.cache_max_staleness)
+
+        self.snapshot = snapshot
+
+        self.station_not_found_cache = TTLCache(self.STATION_NOT_FOUND_CACHE_SIZE,
+                                                min(cache_ttl, self.STATION_NOT_FOUND_CACHE_TTL))
+        self._station_index = {}
+        self._station_index_list = None
+
+        self._cache_lock = threading.RLock()
+        self._revalidating = set()
+        self._single_flight = SingleFlight()
+
+        self.metrics = Metrics()
+        self.playlist_rate_limiter = playlist_rate_limiter
+
+        # pydora only keeps the audio URL for the default quality, remember the others so that they can be used too.
+        self._audio_url_maps = LRUCache(self.AUDIO_URL_MAP_CACHE_SIZE)
+        self._audio_url_maps_lock = threading.Lock()
+
+    def __call__(self, method, **kwargs):
+        with self.metrics.timer(method), self.transport.deadline(self.transport.get_operation(method)):
+            result = super(MopidyAPIClient, self).__call__(method, **kwargs)
+        if method == 'station.getPlaylist':
+            self._store_audio_url_maps(result)
+        return result
+
+    def get_audio_url_map(self, track_token):
+        """ Returns the URLs of all of the audio qualities that are available for the track, as provided in the
+        'audioUrlMap' of the playlist that it was retrieved with, or 'None' if they are not known.
+        """
+        with self._audio_url_maps_lock:
+            return self._audio_url_maps.get(track_token)
+
+    def _store_audio_url_maps(self, playlist):
+        with self._audio_url_maps_lock:
+            for item in (playlist or {}).get('items', []):
+                if item.get('trackToken') and item.get('audioUrlMap'):
+                    self._audio_url_maps[item['trackToken']] = item['audioUrlMap']
+
+    def get_playlist(self, station_token):
+        if self.playlist_rate_limiter is not None:
+            self.playlist_rate_limiter.acquire(station_token)
+        return super(MopidyAPIClient, self).get_playlist(station_token)
+
+    @contextmanager
+    def allow_playlist_delay(self):
+        """ Context manager within which playlist requests wait for the rate limiter instead of failing right away.
+        Must not be used on the Mopidy actor threads.
+        """
+        if self.playlist_rate_limiter is None:
+            yield
+            return
+        with self.playlist_rate_limiter.allow_delay():
+            yield
+
+    def _authenticate(self):
+        with self.metrics.timer('login'), self.transport.deadline('login'):
+            return super(MopidyAPIClient, self)._authenticate()
+
+    def get_metrics(self):
+        """ Returns a dictionary of the API call and cache metrics, the number of requests that timed out per
+        operation type, the state of the circuit breaker for each API method, and the remaining playlist request
+        budget and queueing delays if playlist requests are rate limited.
+        """
+        metrics = self.metrics.as_dict()
+        metrics['timeouts'] = dict(getattr(self.transport, 'timeouts', {}))
+        metrics['circuit_breakers'] = dict((method, circuit_breaker.state) for method, circuit_breaker
+                                           in list(getattr(self.transport, 'circuit_breakers', {}).items()))
+        if self.playlist_rate_limiter is not None:
+            metrics['playlist_rate_limits'] = self.playlist_rate_limiter.stats
+        return metrics
+
+    def load_snapshot(self):
+        """ Populate the station list and genre stations caches from the on-disk snapshot, if one is available.
+
+        :return: True if any of the caches were populated from the snapshot, False otherwise.
+        """
+        if self.snapshot is None or self.station_list_cache.ttl == 0:
+            return False
+
+        station_list, genre_stations = self.snapshot.load(self)
+        if station_list is not None and self.station_list_cache.currsize == 0:
+            self._set_cached(self.station_list_cache, self.station_list_stale_cache, station_list)
+        if genre_stations is not None and self.genre_stations_cache.currsize == 0:
+            self._set_cached(self.genre_stations_cache, self.genre_stations_stale_cache, genre_stations)
+
+        return station_list is not None or genre_stations is not None
+
+    def revalidate_snapshot(self):
+        """ Check if the station list has changed on the Pandora server since the snapshot was taken, and refresh
+        the cached lists if necessary.
+        """
+        self._refresh_station_list(force_refresh=True)
+        self._refresh_genre_stations(force_refresh=True)
+
     def get_station_list(self, force_refresh=False):
+        self._record_cache_lookup('station_list', self.station_list_cache)
+        station_list = self._get_stale_while_revalidate(self.station_list_cache, self.station_list_stale_cache,
+                                                        self._refresh_station_list, force_refresh)
+        if station_list is not None:
+            return station_list
+
+        return self._refresh_station_list(force_refresh)
+
+    def get_station(self, station_token):
+        station = self.get_station_index().get(station_token)
+        if station is not None:
+            self.metrics.record_cache_hit('station')
+            return station
+
+        with self._cache_lock:
+            error = self.station_not_found_cache.get(station_token)
+        if error is not None:
+            self.metrics.record_cache_hit('station')
+            raise error
+
+        self.metrics.record_cache_miss('station')
+
+        try:
+            # Could not find station_token in cached list, try retrieving from Pandora server.
+            return self._single_flight.call(('get_station', station_token),
+                                            super(MopidyAPIClient, self).get_station, station_token)
+        except StationDoesNotExist as e:
+            # Only remember stations that definitely do not exist. Other errors, like timeouts or the server being
+            # in read-only mode, are likely to be temporary.
+            with self._cache_lock:
+                self.station_not_found_cache[station_token] = e
+            raise
+
+    def get_station_index(self):
+        """ Returns a dictionary of all of the stations in the station list, keyed on both station ID and token.
+        The index is only rebuilt if the station list has changed since it was last accessed. The previous index is
+        retained if the station list could not be retrieved.
+        """
+        station_list = self.get_station_list()
+        with self._cache_lock:
+            if station_list is not self._station_index_list and self._is_retrieved_station_list(station_list):
+                index = {}
+                for station in station_list:
+                    index[station.id] = station
+                    index[station.token] = station
+                self._station_index = index
+                self._station_index_list = station_list
+                self.station_not_found_cache.clear()
+            return self._station_index
+
+    def _is_retrieved_station_list(self, station_list):
+        # The empty list that is returned when the station list could not be retrieved is never cached.
+        if self.station_list_cache.ttl == 0:
+            return True
+        return station_list is self._get_cached(self.station_list_cache) or \
+            station_list is self._get_cached(self.station_list_stale_cache)
+
+    def get_station_list_checksum(self):
+        return self._single_flight.call('get_station_list_checksum',
+                                        super(MopidyAPIClient, self).get_station_list_checksum)
+
+    def get_genre_stations(self, force_refresh=False):
+        self._record_cache_lookup('genre_stations', self.genre_stations_cache)
+        genre_stations = self._get_stale_while_revalidate(self.genre_stations_cache, self.genre_stations_stale_cache,
+                                                          self._refresh_genre_stations, force_refresh)
+        if genre_stations is not None:
+            return genre_stations
+
+        return self._refresh_genre_stations(force_refresh)
+
+    def create_station(self, *args, **kwargs):
+        result = super(MopidyAPIClient, self).create_station(*args, **kwargs)
+        self.invalidate_station_list()
+        return result
+
+    def delete_station(self, station_token):
+        result = super(MopidyAPIClient, self).delete_station(station_token)
+        self.invalidate_station_list()
+        return result
+
+    def invalidate_station_list(self):
+        """ Discard all cached copies of the station list, including stale ones. The next call to
+        :func:`get_station_list` will always retrieve the station list from the Pandora server.
+        """
+        with self._cache_lock:
+            self.station_list_cache.clear()
+            self.station_list_stale_cache.clear()
+            self.station_not_found_cache.clear()
+
+    def _refresh_station_list(self, force_refresh=False):
         station_list = []
         try:
-            if (self.station_list_cache.currsize == 0 or
-                    (force_refresh and self.station_list_cache.values()[0].has_changed())):
+            cached = self._get_cached(self.station_list_cache)
+            if cached is None or (force_refresh and cached.has_changed()):
 
-                station_list = super(MopidyAPIClient, self).get_station_list()
-                self.station_list_cache[time.time()] = station_list
+                station_list = self._single_flight.call('get_station_list',
+                                                        super(MopidyAPIClient, self).get_station_list)
+                self._set_cached(self.station_list_cache, self.station_list_stale_cache, station_list)
+                if self.snapshot is not None:
+                    self.snapshot.save(station_list=station_list)
 
+        except CircuitOpenError as e:
+            logger.warning('Error retrieving Pandora station list: {}'.format(e))
+            return self._get_fallback(self.station_list_cache, self.station_list_stale_cache, [])
         except requests.exceptions.RequestException:
             logger.exception('Error retrieving Pandora station list.')
-            station_list = []
+            return self._get_fallback(self.station_list_cache, self.station_list_stale_cache, [])
 
-        try:
-            return self.station_list_cache.values()[0]
-        except IndexError:
+        cached = self._get_cached(self.station_list_cache)
+        if cached is None:
             # Cache disabled
             return station_list
+        return cached
 
-    def get_station(self, station_token):
-        try:
-            return self.get_station_list()[station_token]
-        except TypeError:
-            # Could not find station_token in cached list, try retrieving from Pandora server.
-            return super(MopidyAPIClient, self).get_station(station_token)
-
-    def get_genre_stations(self, force_refresh=False):
+    def _refresh_genre_stations(self, force_refresh=False):
         genre_stations = []
         try:
-            if (self.genre_stations_cache.currsize == 0 or
-                    (force_refresh and self.genre_stations_cache.values()[0].has_changed())):
+            cached = self._get_cached(self.genre_stations_cache)
+            if cached is None or (force_refresh and cached.has_changed()):
 
-                genre_stations = super(MopidyAPIClient, self).get_genre_stations()
-                self.genre_stations_cache[time.time()] = genre_stations
+                genre_stations = self._single_flight.call('get_genre_stations',
+                                                          super(MopidyAPIClient, self).get_genre_stations)
+                self._set_cached(self.genre_stations_cache, self.genre_stations_stale_cache, genre_stations)
+                if self.snapshot is not None:
+                    self.snapshot.save(genre_stations=genre_stations)
 
+        except CircuitOpenError as e:
+            logger.warning('Error retrieving Pandora genre stations: {}'.format(e))
+            return self._get_fallback(self.genre_stations_cache, self.genre_stations_stale_cache, genre_stations)
         except requests.exceptions.RequestException:
             logger.exception('Error retrieving Pandora genre stations.')
-            return genre_stations
+            return self._get_fallback(self.genre_stations_cache, self.genre_stations_stale_cache, genre_stations)
 
-        try:
-            return self.genre_stations_cache.values()[0]
-        except IndexError:
+        cached = self._get_cached(self.genre_stations_cache)
+        if cached is None:
             # Cache disabled
             return genre_stations
+        return cached
+
+    def _get_stale_while_revalidate(self, cache, stale_cache, refresh, force_refresh):
+        """ Returns the cached value immediately if one is available, even if it has expired, and schedules a refresh
+        in the background if necessary.
+
+        :return: the (possibly stale) cached value, or None if the caller will have to wait for the refresh.
+        """
+        if not self.cache_max_staleness:
+            return None
+
+        cached = self._get_cached(cache)
+        if cached is None:
+            cached = self._get_cached(stale_cache)
+            if cached is None:
+                return None
+            # Expired: retrieve a new copy without checking if it has changed first.
+            force_refresh = False
+        elif not force_refresh:
+            return cached
+
+        self._revalidate_async(refresh, force_refresh)
+        return cached
+
+    def _revalidate_async(self, refresh, force_refresh):
+        with self._cache_lock:
+            if refresh.__name__ in self._revalidating:
+                # Already being refreshed.
+                return
+            self._revalidating.add(refresh.__name__)
+
+        self._revalidate(refresh, force_refresh)
+
+    @run_async
+    def _revalidate(self, refresh, force_refresh):
+        try:
+            refresh(force_refresh)
+        finally:
+            with self._cache_lock:
+                self._revalidating.discard(refresh.__name__)
+
+    def _get_fallback(self, cache, stale_cache, default):
+        # Serve the latest list that is still available if a new one could not be retrieved.
+        cached = self._get_cached(cache)
+        if cached is None:
+            cached = self._get_cached(stale_cache)
+        return default if cached is None else cached
+
+    def _record_cache_lookup(self, name, cache):
+        if self._get_cached(cache) is None:
+            self.metrics.record_cache_miss(name)
+        else:
+            self.metrics.record_cache_hit(name)
+
+    def _get_cached(self, cache):
+        with self._cache_lock:
+            for value in cache.values():
+                return value
+            return None
+
+    def _set_cached(self, cache, stale_cache, value):
+        with self._cache_lock:
+            t = time.time()
+            cache[t] = value
+            stale_cache[t] = value
@@ -13,13 +13,13 @@ from difflib import SequenceMatcher
 from functools import total_ordering
 
 from mopidy import audio, core
-from mopidy.audio import PlaybackState
 
 import pykka
 
 from mopidy_pandora import listener
+from mopidy_pandora.state import CoreState
 from mopidy_pandora.uri import AdItemUri, PandoraUri
-from mopidy_pandora.utils import run_async
+from mopidy_pandora.utils import Scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +42,8 @@ def only_execute_for_pandora_uris(func):
         :param kwargs: all kwargs will be passed to the target function.
         :return: the return value of the function if it was run or 'None' otherwise.
         """
-        uri = get_active_uri(self.core, *args, **kwargs)
+        core_state = getattr(self, 'core_state', None) or CoreState(self.core)
+        uri = core_state.get_active_uri(*args, **kwargs)
         if uri and PandoraUri.is_pandora_uri(uri):
             return func(self, *args, **kwargs)
 
@@ -63,19 +64,7 @@ def get_active_uri(core, *args, **kwargs):
     :param kwargs: all available kwargs from the calling function.
     :return: the URI of the active Mopidy track, if it could be determined, or None otherwise.
     """
-    uri = None
-    track = kwargs.get('track', None)
-    if track:
-        uri = track.uri
-    else:
-        tl_track = kwargs.get('tl_track', core.playback.get_current_tl_track().get())
-        if tl_track:
-            uri = tl_track.track.uri
-    if not uri:
-        history = core.history.get_history().get()
-        if history:
-            uri = history[0]
-    return uri
+    return CoreState(core).get_active_uri(*args, **kwargs)
 
 
 class PandoraFrontend(pykka.ThreadingActor,
@@ -92,25 +81,23 @@ class PandoraFrontend(pykka.ThreadingActor,
 
         self.setup_required = True
         self.core = core
+        self.core_state = CoreState(core)
 
         self.track_change_completed_event = threading.Event()
         self.track_change_completed_event.set()
 
+    def on_event(self, event, **kwargs):
+        self.core_state.on_event(event, **kwargs)
+        super(PandoraFrontend, self).on_event(event, **kwargs)
+
     def set_options(self):
         # Setup playback to mirror behaviour of official Pandora front-ends.
         if self.auto_setup and self.setup_required:
-            if self.core.tracklist.get_consume().get() is False:
-                self.core.tracklist.set_consume(True)
-                return
-            if self.core.tracklist.get_repeat().get() is True:
-                self.core.tracklist.set_repeat(False)
-                return
-            if self.core.tracklist.get_random().get() is True:
-                self.core.tracklist.set_random(False)
-                return
-            if self.core.tracklist.get_single().get() is True:
-                self.core.tracklist.set_single(False)
-                return
+            for option, value in [('consume', True), ('repeat', False), ('random', False), ('single', False)]:
+                if self.core_state.get_option(option) is not value:
+                    getattr(self.core.tracklist, 'set_' + option)(value)
+                    self.core_state.set_option(option, value)
+                    return
 
             self.setup_required = False
 
@@ -141,21 +128,25 @@ class PandoraFrontend(pykka.ThreadingActor,
     def track_playback_resumed(self, tl_track, time_position):
         self.set_options()
 
+    def tracklist_changed(self):
+        track_uris = [track.uri for track in self.core_state.get_tracks() if PandoraUri.is_pandora_uri(track.uri)]
+        self._trigger_queued_tracks_changed(track_uris)
+
     def is_end_of_tracklist_reached(self, track=None):
-        length = self.core.tracklist.get_length().get()
+        length = self.core_state.get_length()
         if length <= 1:
             return True
         if track:
-            tl_track = self.core.tracklist.filter({'uri': [track.uri]}).get()[0]
-            track_index = self.core.tracklist.index(tl_track).get()
+            tl_track = self.core_state.filter(track.uri)[0]
+            track_index = self.core_state.index(tl_track)
         else:
-            track_index = self.core.tracklist.index().get()
+            track_index = self.core_state.index()
 
         return track_index == length - 1
 
     def is_station_changed(self, track):
         try:
-            previous_track_uri = PandoraUri.factory(self.core.history.get_history().get()[1][1].uri)
+            previous_track_uri = PandoraUri.factory(self.core_state.get_history()[1][1].uri)
             if previous_track_uri.station_id != PandoraUri.factory(track.uri).station_id:
                 return True
         except (IndexError, NotImplementedError):
@@ -182,6 +173,16 @@ class PandoraFrontend(pykka.ThreadingActor,
 
         self.core.tracklist.remove({'uri': [track.uri]})
 
+    def track_invalidated(self, track_uri):
+        tl_tracks = self.core_state.filter(track_uri)
+        if not tl_tracks:
+            return
+        if self.is_end_of_tracklist_reached(tl_tracks[0].track):
+            # Fetch a replacement for the track.
+            self._trigger_end_of_tracklist_reached(PandoraUri.factory(track_uri).station_id, auto_play=False)
+
+        self.core.tracklist.remove({'uri': [track_uri]})
+
     def next_track_available(self, track, auto_play=False):
         if track:
             self.add_track(track, auto_play)
@@ -194,14 +195,14 @@ class PandoraFrontend(pykka.ThreadingActor,
 
     def add_track(self, track, auto_play=False):
         # Add the next Pandora track
-        self.core.tracklist.add(uris=[track.uri])
+        tl_tracks = self.core.tracklist.add(uris=[track.uri]).get()
+        self.core_state.add_tl_tracks(tl_tracks)
         if auto_play:
-            tl_tracks = self.core.tracklist.get_tl_tracks().get()
             self.core.playback.play(tlid=tl_tracks[-1].tlid)
         self._trim_tracklist(maxsize=2)
 
     def _trim_tracklist(self, keep_only=None, maxsize=2):
-        tl_tracks = self.core.tracklist.get_tl_tracks().get()
+        tl_tracks = self.core_state.get_tl_tracks()
         if keep_only:
             trim_tlids = [t.tlid for t in tl_tracks if t.track.uri != keep_only.uri]
             if len(trim_tlids) > 0:
@@ -218,6 +219,9 @@ class PandoraFrontend(pykka.ThreadingActor,
     def _trigger_end_of_tracklist_reached(self, station_id, auto_play=False):
         listener.PandoraFrontendListener.send('end_of_tracklist_reached', station_id=station_id, auto_play=auto_play)
 
+    def _trigger_queued_tracks_changed(self, track_uris):
+        listener.PandoraFrontendListener.send('queued_tracks_changed', track_uris=track_uris)
+
 
 @total_ordering
 class MatchResult(object):
@@ -235,6 +239,9 @@ class MatchResult(object):
 
 EventMarker = namedtuple('EventMarker', 'event, uri, time')
 
+# Used by event sequences that are not given a scheduler of their own.
+_default_scheduler = Scheduler(name='PandoraEventSequence')
+
 
 class EventMonitorFrontend(pykka.ThreadingActor,
                            core.CoreListener,
@@ -247,10 +254,13 @@ class EventMonitorFrontend(pykka.ThreadingActor,
     def __init__(self, config, core):
         super(EventMonitorFrontend, self).__init__()
         self.core = core
+        self.core_state = CoreState(core)
         self.event_sequences = []
         self.sequence_match_results = None
         self._track_changed_marker = None
         self._monitor_lock = threading.Lock()
+        self._monitoring = False
+        self._scheduler = Scheduler(name='PandoraEventMonitor')
 
         self.config = config['pandora']
         self.is_active = self.config['event_support_enabled']
@@ -261,46 +271,55 @@ class EventMonitorFrontend(pykka.ThreadingActor,
 
         interval = float(self.config['double_click_interval'])
         self.sequence_match_results = Queue.PriorityQueue(maxsize=4)
+        self._scheduler.start()
+        sequence_kwargs = {'interval': interval, 'scheduler': self._scheduler, 'on_completed': self._check_sequences}
 
         self.event_sequences.append(EventSequence(self.config['on_pause_resume_click'],
                                                   ['track_playback_paused',
                                                    'track_playback_resumed'], self.sequence_match_results,
-                                                  interval=interval))
+                                                  **sequence_kwargs))
 
         self.event_sequences.append(EventSequence(self.config['on_pause_resume_pause_click'],
                                                   ['track_playback_paused',
                                                    'track_playback_resumed',
                                                    'track_playback_paused'], self.sequence_match_results,
-                                                  interval=interval))
+                                                  **sequence_kwargs))
 
         self.event_sequences.append(EventSequence(self.config['on_pause_previous_click'],
                                                   ['track_playback_paused',
                                                    'track_playback_ended',
                                                    'track_playback_paused'], self.sequence_match_results,
                                                   wait_for='track_changed_previous',
-                                                  interval=interval))
+                                                  **sequence_kwargs))
 
         self.event_sequences.append(EventSequence(self.config['on_pause_next_click'],
                                                   ['track_playback_paused',
                                                    'track_playback_ended',
                                                    'track_playback_paused'], self.sequence_match_results,
                                                   wait_for='track_changed_next',
-                                                  interval=interval))
+                                                  **sequence_kwargs))
 
         self.trigger_events = set(e.target_sequence[0] for e in self.event_sequences)
 
-    @only_execute_for_pandora_uris
+    def on_stop(self):
+        self._scheduler.stop()
+
     def on_event(self, event, **kwargs):
         if not self.is_active:
             return
 
+        self.core_state.on_event(event, **kwargs)
+        self._handle_event(event, **kwargs)
+
+    @only_execute_for_pandora_uris
+    def _handle_event(self, event, **kwargs):
         super(EventMonitorFrontend, self).on_event(event, **kwargs)
         self._detect_track_change(event, **kwargs)
 
         if self._monitor_lock.acquire(False):
             if event in self.trigger_events:
                 # Monitor not running and current event will not trigger any starts either, ignore
-                self.notify_all(event, uri=get_active_uri(self.core, event, **kwargs), **kwargs)
+                self.notify_all(event, uri=self.core_state.get_active_uri(event, **kwargs), **kwargs)
                 self.monitor_sequences()
             else:
                 self._monitor_lock.release()
@@ -327,11 +346,16 @@ class EventMonitorFrontend(pykka.ThreadingActor,
                                             new_uri=kwargs['tl_track'].track.uri)
                 self._track_changed_marker = None
 
-    @run_async
     def monitor_sequences(self):
-        for es in self.event_sequences:
+        self._monitoring = True
+        self._scheduler.call_soon(self._check_sequences)
+
+    def _check_sequences(self):
+        # Runs on the scheduler thread, whenever monitoring starts and each time that one of the sequences completes.
+        if not self._monitoring or any(es.is_monitoring() for es in self.event_sequences):
             # Wait until all sequences have been processed
-            es.wait()
+            return
+        self._monitoring = False
 
         # Get the last item in the queue (will have highest ratio)
         match = None
@@ -344,9 +368,9 @@ class EventMonitorFrontend(pykka.ThreadingActor,
                 logger.info('Ignoring doubleclick event for Pandora advertisement...')
             else:
                 self._trigger_event_triggered(match.marker.event, match.marker.uri)
-            # Resume playback...
-            if self.core.playback.get_state().get() != PlaybackState.PLAYING:
-                self.core.playback.resume()
+            # Resume playback. Mopidy ignores this if playback is not paused, so there is no need to block the
+            # scheduler thread on retrieving the playback state first.
+            self.core.playback.resume()
 
         self._monitor_lock.release()
 
@@ -355,7 +379,7 @@ class EventMonitorFrontend(pykka.ThreadingActor,
             self.core.tracklist.clear()
 
     def _get_track_change_direction(self, track_marker):
-        history = self.core.history.get_history().get()
+        history = self.core_state.get_history()
         for i, h in enumerate(history):
             # TODO: find a way to eliminate this timing disparity between when 'track_playback_ended' event for
             #       one track is processed, and the next track is added to the history.
@@ -385,20 +409,23 @@ class EventMonitorFrontend(pykka.ThreadingActor,
 class EventSequence(object):
     pykka_traversable = True
 
-    def __init__(self, on_match_event, target_sequence, result_queue, interval=1.0, strict=False, wait_for=None):
+    def __init__(self, on_match_event, target_sequence, result_queue, interval=1.0, strict=False, wait_for=None,
+                 scheduler=None, on_completed=None):
         self.on_match_event = on_match_event
         self.target_sequence = target_sequence
         self.result_queue = result_queue
         self.interval = interval
         self.strict = strict
         self.wait_for = wait_for
+        self.scheduler = scheduler or _default_scheduler
+        self.on_completed = on_completed
 
         self.wait_for_event = threading.Event()
         if not self.wait_for:
             self.wait_for_event.set()
 
         self.events_seen = []
-        self._timer = None
+        self._waiting = None
         self.target_uri = None
 
         self.monitoring_completed = threading.Event()
@@ -414,6 +441,7 @@ class EventSequence(object):
             self.events_seen.append(event)
             if not self.wait_for_event.is_set() and self.wait_for == event:
                 self.wait_for_event.set()
+                self.scheduler.call_soon(self._stop_waiting)
 
         elif self.target_sequence[0] == event:
             if kwargs.get('time_position', 0) == 0:
@@ -430,25 +458,41 @@ class EventSequence(object):
         self.monitoring_completed.clear()
 
         self.target_uri = uri
-        self._timer = threading.Timer(self.interval, self.stop_monitor, args=(self.interval,))
-        self._timer.daemon = True
-        self._timer.start()
+        self.scheduler.call_later(self.interval, self.stop_monitor, self.interval)
 
-    @run_async
     def stop_monitor(self, timeout):
+        # Runs on the scheduler thread, so it must not block while waiting for the 'wait_for' event.
+        if not self.is_sequence_seen():
+            self._complete()
+        elif self.wait_for_event.is_set():
+            self._complete(matched=True)
+        else:
+            self._waiting = self.scheduler.call_later(timeout, self._stop_waiting)
+
+    def is_sequence_seen(self):
+        if self.strict:
+            i = 0
+            try:
+                for e in self.target_sequence:
+                    i = self.events_seen[i:].index(e) + 1
+            except ValueError:
+                # Make sure that we have seen every event in the target sequence, and in the right order
+                return False
+            return True
+        # Make sure that we have seen every event in the target sequence, ignoring order
+        return all([e in self.events_seen for e in self.target_sequence])
+
+    def _stop_waiting(self):
+        # Called once the 'wait_for' event has been seen, or the time to wait for it has run out.
+        if self._waiting is None:
+            return
+        self.scheduler.cancel(self._waiting)
+        self._waiting = None
+        self._complete(matched=self.wait_for_event.is_set())
+
+    def _complete(self, matched=False):
         try:
-            if self.strict:
-                i = 0
-                try:
-                    for e in self.target_sequence:
-                        i = self.events_seen[i:].index(e) + 1
-                except ValueError:
-                    # Make sure that we have seen every event in the target sequence, and in the right order
-                    return
-            elif not all([e in self.events_seen for e in self.target_sequence]):
-                # Make sure that we have seen every event in the target sequence, ignoring order
-                return
-            if self.wait_for_event.wait(timeout=timeout):
+            if matched:
                 self.result_queue.put(
                     MatchResult(
                         EventMarker(self.on_match_event, self.target_uri, int(time.time() * 1000)),
@@ -458,6 +502,8 @@ class EventSequence(object):
         finally:
             self.reset()
             self.monitoring_completed.set()
+        if self.on_completed is not None:
+            self.on_completed()
 
     def reset(self):
         if self.wait_for:
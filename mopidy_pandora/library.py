@@ -1,25 +1,35 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import Queue
+
 import logging
 
 import re
 
+import threading
+
+import time
+
 from collections import namedtuple
 
-from cachetools import LRUCache
+from cachetools import LRUCache, TTLCache
 
 from mopidy import backend, models
 
 from pandora.models.pandora import Station
 
-from pydora.utils import iterate_forever
+import requests
 
+from mopidy_pandora.cache import TrackCache
+from mopidy_pandora.prefetch import PlaylistPrefetcher
+from mopidy_pandora.utils import SingleFlight, run_async
 from mopidy_pandora.uri import AdItemUri, GenreUri, PandoraUri, SearchUri, StationUri, TrackUri  # noqa I101
 
 logger = logging.getLogger(__name__)
 
 StationCacheItem = namedtuple('StationCacheItem', 'station, iter')
-TrackCacheItem = namedtuple('TrackCacheItem', 'ref, track')
+TrackCacheItem = namedtuple('TrackCacheItem', 'ref, track, fetched_at')
+TrackCacheItem.__new__.__defaults__ = (None,)
 
 
 class PandoraLibraryProvider(backend.LibraryProvider):
@@ -29,12 +39,21 @@ class PandoraLibraryProvider(backend.LibraryProvider):
     root_directory = models.Ref.directory(name=ROOT_DIR_NAME, uri=PandoraUri('directory').uri)
     genre_directory = models.Ref.directory(name=GENRE_DIR_NAME, uri=PandoraUri('genres').uri)
 
-    def __init__(self, backend, sort_order):
+    def __init__(self, backend, sort_order, playlist_low_water_mark=1, audio_url_ttl=0, playability_cache_ttl=0):
         super(PandoraLibraryProvider, self).__init__(backend)
         self.sort_order = sort_order.lower()
+        self.playlist_low_water_mark = playlist_low_water_mark
+        self.audio_url_ttl = audio_url_ttl
+        self.playability_cache_ttl = playability_cache_ttl
 
         self.pandora_station_cache = LRUCache(maxsize=5, missing=self.get_station_cache_item)
-        self.pandora_track_cache = LRUCache(maxsize=10)
+        self.pandora_track_cache = TrackCache(maxsize=10)
+
+        self._playability_lock = threading.Lock()
+        self._playability_cache = None
+        if playability_cache_ttl:
+            self._playability_cache = TTLCache(maxsize=10, ttl=playability_cache_ttl)
+        self._playability_checks = SingleFlight()
 
     def browse(self, uri):
         self.backend.playback.reset_skip_limits()
@@ -156,13 +175,13 @@ class PandoraLibraryProvider(backend.LibraryProvider):
             if self.sort_order == 'a-z':
                 stations.sort(key=lambda x: x.name, reverse=False)
 
-            for station in self._formatted_station_list(stations):
+            stations = self._formatted_station_list(stations)
+            for station, station_uri in zip(stations, PandoraUri.factory_many(stations)):
                 # As of version 5 of the Pandora API, station IDs and tokens are always equivalent.
                 # We're using this assumption as we don't have the station token available for deleting the station.
                 # Detect if any Pandora API changes ever breaks this assumption in the future.
                 assert station.token == station.id
-                station_directories.append(
-                    models.Ref.directory(name=station.name, uri=PandoraUri.factory(station).uri))
+                station_directories.append(models.Ref.directory(name=station.name, uri=station_uri.uri))
 
         station_directories.insert(0, self.genre_directory)
 
@@ -184,9 +203,9 @@ class PandoraLibraryProvider(backend.LibraryProvider):
                 for category in sorted(self.backend.api.get_genre_stations().keys())]
 
     def _browse_genre_stations(self, uri):
-        return [models.Ref.directory(name=station.name, uri=PandoraUri.factory(station).uri)
-                for station in self.backend.api.get_genre_stations()
-                [PandoraUri.factory(uri).category_name]]
+        stations = self.backend.api.get_genre_stations()[PandoraUri.factory(uri).category_name]
+        return [models.Ref.directory(name=station.name, uri=station_uri.uri)
+                for station, station_uri in zip(stations, PandoraUri.factory_many(stations))]
 
     def lookup_pandora_track(self, uri):
         return self.pandora_track_cache[uri].track
@@ -197,9 +216,14 @@ class PandoraLibraryProvider(backend.LibraryProvider):
             station_id = pandora_uri.station_id
 
         station = self.backend.api.get_station(station_id)
-        station_iter = iterate_forever(station.get_playlist)
+        station_iter = PlaylistPrefetcher(station.get_playlist, self.playlist_low_water_mark,
+                                          prefetch_context=self.backend.api.allow_playlist_delay)
         return StationCacheItem(station, station_iter)
 
+    def get_prefetch_stats(self):
+        return {station_id: item.iter.stats for station_id, item in list(self.pandora_station_cache.items())
+                if isinstance(item.iter, PlaylistPrefetcher)}
+
     def get_next_pandora_track(self, station_id):
         try:
             station_iter = self.pandora_station_cache[station_id].iter
@@ -216,10 +240,118 @@ class PandoraLibraryProvider(backend.LibraryProvider):
         else:
             track_name = track.song_name
 
+        if self.backend.quality_selector is not None:
+            self._select_audio_quality(track)
+
         ref = models.Ref.track(name=track_name, uri=track_uri.uri)
-        self.pandora_track_cache[track_uri.uri] = TrackCacheItem(ref, track)
+        fetched_at = station_iter.last_fetched_at if isinstance(station_iter, PlaylistPrefetcher) else time.time()
+        self.pandora_track_cache[track_uri.uri] = TrackCacheItem(ref, track, fetched_at)
         return ref
 
+    def _select_audio_quality(self, track):
+        audio_url_map = self.backend.api.get_audio_url_map(track.track_token)
+        if not audio_url_map:
+            return
+        quality, audio = self.backend.quality_selector.select(audio_url_map)
+        if audio is not None:
+            logger.debug("Using '{}' audio for Pandora track '{}'.".format(quality, track.song_name))
+            track.audio_url = audio['audioUrl']
+            track.bitrate = audio.get('bitrate')
+
+    def is_track_expired(self, uri, margin=0):
+        """ Check if the audio URL of a cached track has expired, or will expire within the next 'margin' seconds.
+
+        :param uri: the URI of the track to check.
+        :param margin: the number of seconds for which the audio URL should still be valid.
+        :return: True if the audio URL is expected to have expired by then, False if it is still valid or if
+                 expiry tracking has been disabled.
+        """
+        if not self.audio_url_ttl:
+            return False
+        item = self.pandora_track_cache.peek(uri)
+        if item is None or item.fetched_at is None:
+            return False
+        return time.time() + margin >= item.fetched_at + self.audio_url_ttl
+
+    def is_track_playable(self, uri):
+        """ Check if the audio URL of a cached track can be retrieved.
+
+        Recent results are re-used for 'playability_cache_ttl' seconds, and concurrent checks for the same track share a
+        single request to the audio server. If the audio URL cannot be retrieved, the URLs of the other audio qualities
+        that are available for the track are checked as well, and the track switches to the first one that works.
+
+        :param uri: the URI of the track to check.
+        :return: True if the track is playable, False otherwise.
+        """
+        if self._playability_cache is not None:
+            with self._playability_lock:
+                playable = self._playability_cache.get(uri)
+            if playable is not None:
+                return playable
+
+        return self._playability_checks.call(uri, self._check_playability, uri)
+
+    def is_playability_cached(self, uri):
+        """ Returns True if the result of a recent playability check of the track is still available. """
+        if self._playability_cache is None:
+            return False
+        with self._playability_lock:
+            return uri in self._playability_cache
+
+    def _check_playability(self, uri):
+        track = self.lookup_pandora_track(uri)
+        start_time = time.time()
+        try:
+            playable = track.get_is_playable()
+            if self.backend.quality_selector is not None:
+                self.backend.quality_selector.record_ttfb(time.time() - start_time)
+        except requests.exceptions.RequestException:
+            if not self._use_alternate_audio_url(track):
+                raise
+            playable = True
+        else:
+            playable = playable or self._use_alternate_audio_url(track)
+
+        if self._playability_cache is not None:
+            with self._playability_lock:
+                self._playability_cache[uri] = playable
+        return playable
+
+    def _use_alternate_audio_url(self, track):
+        """ Check the audio URLs of the other qualities that are available for 'track' concurrently, and switch the
+        track to the first one that is playable.
+
+        :return: True if a playable audio URL was found, False otherwise.
+        """
+        audio_url_map = self.backend.api.get_audio_url_map(track.track_token) or {}
+        alternates = [(quality, audio) for quality, audio in audio_url_map.items()
+                      if audio.get('audioUrl') and audio['audioUrl'] != track.audio_url]
+        if not alternates:
+            return False
+
+        results = Queue.Queue()
+        for quality, audio in alternates:
+            self._probe_audio_url(quality, audio, result_queue=results)
+
+        for _ in alternates:
+            quality, audio, playable = results.get()
+            if playable:
+                logger.info("Audio URL for Pandora track '{}' is not available, using '{}' audio instead."
+                            .format(track.song_name, quality))
+                track.audio_url = audio['audioUrl']
+                track.bitrate = audio.get('bitrate')
+                return True
+        return False
+
+    @run_async
+    def _probe_audio_url(self, quality, audio, result_queue=None):
+        try:
+            playable = self.backend.api.transport.test_url(audio['audioUrl'])
+        except requests.exceptions.RequestException as e:
+            logger.debug("Error checking '{}' audio URL: {}".format(quality, e))
+            playable = False
+        result_queue.put((quality, audio, playable))
+
     def refresh(self, uri=None):
         if not uri or uri == self.root_directory.uri:
             self.backend.api.get_station_list(force_refresh=True)
@@ -248,19 +380,21 @@ class PandoraLibraryProvider(backend.LibraryProvider):
         search_result = self.backend.api.search(search_text, include_near_matches=False, include_genre_stations=True)
 
         tracks = []
-        for genre in search_result.genre_stations:
-            tracks.append(models.Track(uri=SearchUri(genre.token).uri,
+        genre_uris = SearchUri.from_tokens([genre.token for genre in search_result.genre_stations])
+        for genre, search_uri in zip(search_result.genre_stations, genre_uris):
+            tracks.append(models.Track(uri=search_uri.uri,
                                        name='{} (Pandora genre)'.format(genre.station_name),
                                        artists=[models.Artist(name=genre.station_name)]))
 
-        for song in search_result.songs:
-            tracks.append(models.Track(uri=SearchUri(song.token).uri,
+        song_uris = SearchUri.from_tokens([song.token for song in search_result.songs])
+        for song, search_uri in zip(search_result.songs, song_uris):
+            tracks.append(models.Track(uri=search_uri.uri,
                                        name='{} (Pandora station)'.format(song.song_name),
                                        artists=[models.Artist(name=song.artist)]))
 
         artists = []
-        for artist in search_result.artists:
-            search_uri = SearchUri(artist.token)
+        artist_uris = SearchUri.from_tokens([artist.token for artist in search_result.artists])
+        for artist, search_uri in zip(search_result.artists, artist_uris):
             if search_uri.is_artist_search:
                 station_name = '{} (Pandora artist)'.format(artist.artist)
             else:
@@ -72,6 +72,14 @@ class PandoraFrontendListener(listener.Listener):
         """
         pass
 
+    def queued_tracks_changed(self, track_uris):
+        """
+        Called whenever the Pandora tracks in the tracklist have changed.
+        :param track_uris: the URIs of all of the Pandora tracks that are currently in the tracklist.
+        :type track_uris: list of strings
+        """
+        pass
+
 
 class PandoraBackendListener(backend.BackendListener):
 
@@ -95,6 +103,17 @@ class PandoraBackendListener(backend.BackendListener):
         """
         pass
 
+    def track_invalidated(self, track_uri):
+        """
+        Called when the audio URL of a track in the tracklist has expired, or is about to expire before the track can
+        be played. Lets the frontend know that it should remove the track from the tracklist, and replace it with
+        another track if necessary.
+
+        :param track_uri: the URI of the track that can no longer be played.
+        :type track_uri: string
+        """
+        pass
+
     def event_processed(self, track_uri, pandora_event):
         """
         Called when the backend has successfully processed the event for the given URI.
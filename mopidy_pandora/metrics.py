@@ -0,0 +1,149 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+
+import threading
+
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram(object):
+    """ Counts the number of observed latencies that fall within each of a fixed set of buckets.
+
+    :param buckets: the upper bounds (in seconds) of the histogram buckets, in ascending order. Latencies that exceed
+           the largest bound are counted in an additional 'inf' bucket.
+    """
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, latency):
+        for i, bound in enumerate(self.buckets):
+            if latency <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self):
+        buckets = dict(('{:g}'.format(bound), count) for bound, count in zip(self.buckets, self.counts))
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.mean,
+            'max': self.max,
+            'buckets': buckets,
+        }
+
+
+class Metrics(object):
+    """ Thread-safe collection of call latencies, call and error counts, and cache hit / miss counters. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(LatencyHistogram)
+        self._errors = defaultdict(lambda: defaultdict(int))
+        self._cache = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    @contextmanager
+    def timer(self, name):
+        """ Context manager that records the time taken to execute its body as a call to 'name', along with the type
+        of any exception that is raised.
+        """
+        start_time = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.record_call(name, time.time() - start_time, error=e)
+            raise
+        self.record_call(name, time.time() - start_time)
+
+    def record_call(self, name, latency, error=None):
+        with self._lock:
+            self._latencies[name].observe(latency)
+            if error is not None:
+                self._errors[name][type(error).__name__] += 1
+
+    def record_cache_hit(self, name):
+        with self._lock:
+            self._cache[name]['hits'] += 1
+
+    def record_cache_miss(self, name):
+        with self._lock:
+            self._cache[name]['misses'] += 1
+
+    def as_dict(self):
+        with self._lock:
+            calls = {}
+            for name, histogram in self._latencies.items():
+                errors = dict(self._errors.get(name, {}))
+                calls[name] = {
+                    'count': histogram.count,
+                    'errors': sum(errors.values()),
+                    'errors_by_type': errors,
+                    'latency': histogram.as_dict(),
+                }
+            cache = dict((name, dict(counters)) for name, counters in self._cache.items())
+
+        return {'calls': calls, 'cache': cache}
+
+    def format_summary(self):
+        """ Returns a list of human-readable lines that summarize the metrics collected so far. """
+        metrics = self.as_dict()
+        lines = []
+        for name, call in sorted(metrics['calls'].items()):
+            lines.append("'{}': {:d} calls, {:d} errors, mean {:.3f}s, max {:.3f}s."
+                         .format(name, call['count'], call['errors'], call['latency']['mean'],
+                                 call['latency']['max']))
+        for name, counters in sorted(metrics['cache'].items()):
+            lines.append("'{}' cache: {:d} hits, {:d} misses.".format(name, counters['hits'], counters['misses']))
+        return lines
+
+
+class MetricsLogger(object):
+    """ Periodically logs a summary of the metrics that have been collected.
+
+    :param metrics: the :class:`Metrics` to summarize.
+    :param interval: the number of seconds to wait between summaries.
+    """
+
+    def __init__(self, metrics, interval):
+        self.metrics = metrics
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='PandoraMetricsLogger')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def log_summary(self):
+        for line in self.metrics.format_summary():
+            logger.info('Pandora metrics: {}'.format(line))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.log_summary()
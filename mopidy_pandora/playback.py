@@ -21,26 +21,45 @@ class PandoraPlaybackProvider(backend.PlaybackProvider):
         # TODO: It shouldn't be necessary to keep track of the number of tracks that have been skipped in the
         # player anymore once https://github.com/mopidy/mopidy/issues/1221 has been fixed.
         self._consecutive_track_skips = 0
+        self._current_track_uri = None
+        self._pinned_audio_uri = None
 
-        # TODO: add gapless playback when it is supported in Mopidy > 1.1
-        # self.audio.set_about_to_finish_callback(self.callback)
+        # Mopidy 1.1 does not support gapless playback yet: the core still stops playback and calls 'change_track'
+        # once the end of the current track has been reached (see:
+        # https://discuss.mopidy.com/t/has-the-gapless-playback-implementation-been-completed-yet/784/2). Use the
+        # about-to-finish notification to validate the upcoming tracks ahead of time instead, so that changing tracks
+        # does not have to wait for any requests to the Pandora servers. Newer versions of Mopidy install their own
+        # callback, which calls 'change_track' for the next track directly.
+        self.audio.set_about_to_finish_callback(self.about_to_finish)
 
-        # def callback(self):
-        # See: https://discuss.mopidy.com/t/has-the-gapless-playback-implementation-been-completed-yet/784/2
-        # self.audio.set_uri(self.translate_uri(self.get_next_track()))
+    @property
+    def current_track_uri(self):
+        return self._current_track_uri
+
+    def about_to_finish(self):
+        self.backend.prepare_upcoming_tracks(self._current_track_uri)
 
     def change_pandora_track(self, track):
         """ Attempt to retrieve the Pandora playlist item from the buffer and verify that it is ready to be played.
 
         A track is playable if it has been stored in the buffer, has a URL, and the header for the Pandora URL can be
-        retrieved and the status code checked.
+        retrieved and the status code checked. The result of a recent check of the URL is re-used if one is available,
+        and tracks whose audio has already been downloaded to the audio cache or audio proxy are always playable.
 
         :param track: the track to retrieve and check the Pandora playlist item for.
         :return: True if the track is playable, False otherwise.
         """
         try:
-            pandora_track = self.backend.library.lookup_pandora_track(track.uri)
-            if pandora_track.get_is_playable():
+            self.backend.library.lookup_pandora_track(track.uri)
+            self.pin_cached_audio(track.uri)
+            if self.is_audio_cached(track.uri):
+                # Audio has already been downloaded, no need to check the Pandora URL.
+                self._consecutive_track_skips = 0
+                return
+            if self.backend.library.is_track_expired(track.uri):
+                # Don't waste a request on checking a URL that is known to have expired already.
+                raise Unplayable("Audio URL for track with URI '{}' has expired.".format(track.uri))
+            if self.backend.library.is_track_playable(track.uri):
                 # Success, reset track skip counter.
                 self._consecutive_track_skips = 0
             else:
@@ -61,6 +80,7 @@ class PandoraPlaybackProvider(backend.PlaybackProvider):
             self._trigger_track_changing(track)
             self.check_skip_limit()
             self.change_pandora_track(track)
+            self._current_track_uri = track.uri
             return super(PandoraPlaybackProvider, self).change_track(track)
 
         except KeyError:
@@ -70,6 +90,27 @@ class PandoraPlaybackProvider(backend.PlaybackProvider):
             logger.warning(e)
             return False
 
+    def is_audio_cached(self, uri):
+        """ Returns True if the audio for the track can be played without having to retrieve it from Pandora first. """
+        if self.backend.audio_cache is not None and uri in self.backend.audio_cache:
+            return True
+        return self.backend.audio_proxy is not None and self.backend.audio_proxy.is_cached(uri)
+
+    def pin_cached_audio(self, uri):
+        """ Keep the audio of the track that is about to be played in the audio cache and audio proxy, so that it
+        cannot be evicted by downloads of other tracks before the URI has been translated, or while the track is being
+        played.
+        """
+        if uri == self._pinned_audio_uri:
+            return
+        for cache in (self.backend.audio_cache, self.backend.audio_proxy):
+            if cache is None:
+                continue
+            cache.pin(uri)
+            if self._pinned_audio_uri is not None:
+                cache.unpin(self._pinned_audio_uri)
+        self._pinned_audio_uri = uri
+
     def check_skip_limit(self):
         if self._consecutive_track_skips >= self.SKIP_LIMIT:
             self._trigger_skip_limit_exceeded()
@@ -80,7 +121,14 @@ class PandoraPlaybackProvider(backend.PlaybackProvider):
         self._consecutive_track_skips = 0
 
     def translate_uri(self, uri):
-        return self.backend.library.lookup_pandora_track(uri).audio_url
+        if self.backend.audio_cache is not None:
+            cached_uri = self.backend.audio_cache.get_uri(uri)
+            if cached_uri is not None:
+                return cached_uri
+        audio_url = self.backend.library.lookup_pandora_track(uri).audio_url
+        if self.backend.audio_proxy is not None and audio_url:
+            return self.backend.audio_proxy.get_url(uri, audio_url)
+        return audio_url
 
     def _trigger_track_changing(self, track):
         listener.PandoraPlaybackListener.send('track_changing', track=track)
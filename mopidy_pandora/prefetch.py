@@ -0,0 +1,135 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+
+import threading
+
+import time
+
+from collections import deque
+
+from mopidy_pandora.utils import run_async
+
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistPrefetcher(object):
+    """ Iterator over the playlist items of a Pandora station that refills itself in the background.
+
+    Pandora only returns a handful of tracks with every playlist request. Instead of waiting for the next batch to be
+    retrieved once the current one has been exhausted, the next batch is requested in a separate thread as soon as
+    the number of buffered items falls below ``low_water_mark``.
+
+    :param get_playlist: callable that returns an iterable of playlist items for the station.
+    :param low_water_mark: fetch the next playlist batch in the background once fewer than this many items remain in
+           the buffer. Setting this to ``0`` only fetches a new batch once the buffer is empty.
+    :param prefetch_context: optional callable that returns a context manager to fetch the playlist batches in the
+           background with, e.g. to let them wait for the playlist rate limiter.
+
+    The time at which the playlist item that was returned last was retrieved from the Pandora server is available as
+    ``last_fetched_at``.
+    """
+
+    def __init__(self, get_playlist, low_water_mark=1, prefetch_context=None):
+        self._get_playlist = get_playlist
+        self.low_water_mark = low_water_mark
+        self._prefetch_context = prefetch_context
+
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._refilling = False
+        self._refill_error = None
+
+        self.refill_count = 0
+        self.last_refill_latency = None
+        self.last_fetched_at = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._condition:
+            refill_now = False
+            if not self._buffer:
+                if self._refill_error is not None:
+                    # Last background refill failed, let the caller know before trying again.
+                    error, self._refill_error = self._refill_error, None
+                    raise error
+                if self._refilling:
+                    # Background refill already in progress, wait for it to complete.
+                    while self._refilling:
+                        self._condition.wait()
+                else:
+                    self._refilling = True
+                    refill_now = True
+
+        if refill_now:
+            self._refill(raise_errors=True)
+
+        with self._condition:
+            if not self._buffer:
+                error, self._refill_error = self._refill_error, None
+                if error is not None:
+                    raise error
+                raise StopIteration
+
+            item, self.last_fetched_at = self._buffer.popleft()
+
+            prefetch = len(self._buffer) < self.low_water_mark and not self._refilling
+            if prefetch:
+                self._refilling = True
+
+        if prefetch:
+            self._refill_async()
+
+        item.prepare_playback()
+        return item
+
+    next = __next__  # Python 2
+
+    @property
+    def depth(self):
+        return len(self._buffer)
+
+    @property
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'refill_count': self.refill_count,
+            'last_refill_latency': self.last_refill_latency,
+        }
+
+    @run_async
+    def _refill_async(self):
+        self._refill(context=self._prefetch_context)
+
+    def _refill(self, raise_errors=False, context=None):
+        start_time = time.time()
+        try:
+            if context is None:
+                items = list(self._get_playlist())
+            else:
+                with context():
+                    items = list(self._get_playlist())
+        except Exception as e:
+            with self._condition:
+                self._refill_error = None if raise_errors else e
+                self._refilling = False
+                self._condition.notify_all()
+            if raise_errors:
+                raise
+            logger.warning('Error prefetching Pandora playlist: {}'.format(e))
+            return
+
+        fetched_at = time.time()
+        latency = fetched_at - start_time
+        with self._condition:
+            self._buffer.extend((item, fetched_at) for item in items)
+            self.refill_count += 1
+            self.last_refill_latency = latency
+            self._refilling = False
+            self._condition.notify_all()
+
+        logger.debug('Fetched {:d} Pandora playlist items in {:.3f} seconds (buffer depth: {:d}).'
+                     .format(len(items), latency, self.depth))
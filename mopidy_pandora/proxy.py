@@ -0,0 +1,498 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+
+import logging
+
+import os
+
+import re
+
+import shutil
+
+import socket
+
+import threading
+
+import time
+
+from collections import Counter, OrderedDict
+
+import requests
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+logger = logging.getLogger(__name__)
+
+
+class RangeSet(object):
+    """ Set of non-overlapping, half-open ``[start, end)`` byte ranges. Adjacent and overlapping ranges are merged. """
+
+    def __init__(self):
+        self._ranges = []
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __len__(self):
+        return len(self._ranges)
+
+    @property
+    def size(self):
+        return sum(end - start for start, end in self._ranges)
+
+    def add(self, start, end):
+        if start >= end:
+            return
+        ranges = []
+        for s, e in self._ranges:
+            if e < start or s > end:
+                ranges.append((s, e))
+            else:
+                start, end = min(s, start), max(e, end)
+        ranges.append((start, end))
+        self._ranges = sorted(ranges)
+
+    def get_end(self, pos):
+        """ Returns the end of the range that contains 'pos', or 'None' if 'pos' is not in any of the ranges. """
+        for start, end in self._ranges:
+            if start <= pos < end:
+                return end
+        return None
+
+    def get_next_start(self, pos):
+        """ Returns the start of the first range that begins after 'pos', or 'None' if there is no such range. """
+        for start, _ in self._ranges:
+            if start > pos:
+                return start
+        return None
+
+
+class CachedAudio(object):
+    """ The parts of a track's audio file that have been downloaded so far, stored in a sparse file at 'path'.
+
+    'users' is the number of requests that are currently streaming the audio, which is never evicted while in use.
+    """
+
+    def __init__(self, key, url, path):
+        self.key = key
+        self.url = url
+        self.path = path
+        self.length = None
+        self.content_type = 'audio/mpeg'
+        self.ranges = RangeSet()
+        self.lock = threading.Lock()
+        self.users = 0
+
+    @property
+    def complete(self):
+        with self.lock:
+            return self.length is not None and self.ranges.get_end(0) == self.length
+
+
+class AudioProxy(object):
+    """ Local HTTP server that streams the audio of Pandora tracks from the Pandora audio servers to GStreamer.
+
+    All of the data that is streamed through the proxy is also written to a cache on disk, along with the byte ranges
+    that have been downloaded for each track. Requests for ranges that are available in the cache (e.g. when seeking
+    back or resuming playback after the audio URL has expired) are served from disk, using ``sendfile`` where the
+    platform supports it, and only the missing ranges are requested from the audio server.
+
+    The cache for the least recently used tracks is deleted once the combined size of the downloaded data exceeds
+    ``maxsize``, except for tracks that are being streamed or that have been pinned with :func:`pin`. If a
+    ``ring_buffer`` is provided, the audio of each track that has been downloaded completely is also copied to it, so
+    that recently played tracks can still be replayed from memory after they have been evicted.
+
+    :param path: the directory to store the cached audio in.
+    :param maxsize: the maximum combined size (in bytes) of all of the cached audio.
+    :param open_url: function that returns a streaming :class:`requests.Response` for the URL and keyword arguments
+           (e.g. 'headers') provided.
+    :param host: the interface to listen on.
+    :param port: the port to listen on. '0' picks a free port.
+    :param ring_buffer: optional :class:`mopidy_pandora.ringbuffer.AudioRingBuffer` to keep recently played tracks in.
+    :param on_transfer: optional function that is called with the number of bytes received from the audio server, the
+           time spent waiting for them (in seconds), and the time-to-first-byte after each upstream request.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path, maxsize, open_url, host='127.0.0.1', port=0, ring_buffer=None, on_transfer=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.host = host
+        self.port = port
+        self.ring_buffer = ring_buffer
+        self._open_url = open_url
+        self._on_transfer = on_transfer
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pins = Counter()
+        self._server = None
+        self._thread = None
+
+        self.cache_bytes = 0
+        self.upstream_bytes = 0
+        self.evictions = 0
+
+    @property
+    def url(self):
+        return 'http://{}:{:d}'.format(*self._server.server_address[:2])
+
+    def start(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path)
+
+        self._server = _ThreadingHTTPServer((self.host, self.port), _ProxyRequestHandler)
+        self._server.proxy = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='PandoraAudioProxy')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def get_url(self, key, url):
+        """ Returns the URL that the audio at 'url' can be streamed from via the proxy.
+
+        :param key: the URI of the track that the audio belongs to.
+        :param url: the Pandora audio URL of the track. Replaces the URL that was registered for 'key' before, if any.
+        """
+        token = self._get_token(key)
+        with self._lock:
+            entry = self._entries.pop(token, None)
+            if entry is None:
+                entry = CachedAudio(key, url, os.path.join(self.path, token))
+            entry.url = url
+            self._entries[token] = entry
+        return '{}/{}'.format(self.url, token)
+
+    def is_cached(self, key):
+        """ Returns True if all of the audio for the track identified by 'key' is available locally. """
+        if self.ring_buffer is not None and key in self.ring_buffer:
+            return True
+        with self._lock:
+            entry = self._entries.get(self._get_token(key))
+        return entry is not None and entry.complete
+
+    def pin(self, key):
+        """ Prevent the audio of the track identified by 'key' from being evicted until :func:`unpin` has been called
+        for it. Tracks can be pinned before their audio has been requested.
+        """
+        with self._lock:
+            self._pins[key] += 1
+
+    def unpin(self, key):
+        with self._lock:
+            if self._pins[key] <= 1:
+                self._pins.pop(key, None)
+            else:
+                self._pins[key] -= 1
+        self.evict()
+
+    def acquire_entry(self, token):
+        """ Returns the cached audio for 'token', or 'None' if there is none. The audio is not evicted until
+        :func:`release_entry` has been called for it.
+        """
+        with self._lock:
+            entry = self._entries.pop(token, None)
+            if entry is not None:
+                # Mark as most recently used.
+                self._entries[token] = entry
+                entry.users += 1
+            return entry
+
+    def release_entry(self, entry):
+        with self._lock:
+            entry.users -= 1
+        self.evict(keep=entry)
+
+    def open_upstream(self, entry, start):
+        """ Request the audio from the Pandora server, starting at byte 'start'. """
+        start_time = time.time()
+        response = self._open_url(entry.url, headers={'Range': 'bytes={:d}-'.format(start)})
+        ttfb = time.time() - start_time
+        try:
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            response.close()
+            raise
+
+        upstream = _Upstream(response, start, ttfb=ttfb, on_transfer=self._on_transfer)
+        with entry.lock:
+            if entry.length is None:
+                entry.length = upstream.length
+            entry.content_type = response.headers.get('Content-Type', entry.content_type)
+        return upstream
+
+    def buffer_audio(self, entry):
+        """ Copy the audio of 'entry' to the ring buffer, if it has been downloaded completely. """
+        if self.ring_buffer is None or entry.key in self.ring_buffer or not entry.complete:
+            return
+        try:
+            with open(entry.path, 'rb') as f:
+                self.ring_buffer.put(entry.key, f, entry.length)
+        except (IOError, OSError):
+            logger.exception("Error buffering audio for Pandora track '{}'.".format(entry.key))
+
+    def record_transfer(self, cache_bytes=0, upstream_bytes=0):
+        with self._lock:
+            self.cache_bytes += cache_bytes
+            self.upstream_bytes += upstream_bytes
+
+    @property
+    def currsize(self):
+        with self._lock:
+            return sum(entry.ranges.size for entry in self._entries.values())
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = {
+                'tracks': len(self._entries),
+                'size': sum(entry.ranges.size for entry in self._entries.values()),
+                'maxsize': self.maxsize,
+                'cache_bytes': self.cache_bytes,
+                'upstream_bytes': self.upstream_bytes,
+                'evictions': self.evictions,
+            }
+        if self.ring_buffer is not None:
+            stats['ring_buffer'] = self.ring_buffer.stats
+        return stats
+
+    def evict(self, keep=None):
+        with self._lock:
+            size = sum(entry.ranges.size for entry in self._entries.values())
+            for token in list(self._entries):
+                if size <= self.maxsize:
+                    break
+                entry = self._entries[token]
+                entry_size = entry.ranges.size
+                if entry is keep or entry_size == 0 or entry.users > 0 or self._pins[entry.key] > 0:
+                    continue
+                if self.ring_buffer is not None and entry.key in self.ring_buffer:
+                    # Still available from the ring buffer, only the downloaded data has to go.
+                    with entry.lock:
+                        entry.ranges = RangeSet()
+                else:
+                    del self._entries[token]
+                size -= entry_size
+                self.evictions += 1
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                logger.debug("Evicted cached audio for Pandora track '{}' from audio proxy.".format(entry.key))
+
+    @staticmethod
+    def _get_token(key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class _Upstream(object):
+    """ Streaming response from the Pandora audio server, and the position in the file that it has reached. """
+
+    def __init__(self, response, start, ttfb=None, on_transfer=None):
+        self.response = response
+        self.ttfb = ttfb
+        self.num_bytes = 0
+        self.duration = 0
+        self._on_transfer = on_transfer
+        self.partial = response.status_code == requests.codes.partial_content
+        if self.partial:
+            self.offset = start
+            match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+            self.length = int(match.group(1)) if match else None
+        else:
+            # Server does not support range requests, the response contains the whole file.
+            self.offset = 0
+            length = response.headers.get('Content-Length')
+            self.length = int(length) if length is not None else None
+
+    def read(self, size):
+        start_time = time.time()
+        data = self.response.raw.read(size, decode_content=True)
+        self.duration += time.time() - start_time
+        self.num_bytes += len(data)
+        return data
+
+    def close(self):
+        self.response.close()
+        on_transfer, self._on_transfer = self._on_transfer, None
+        if on_transfer is not None:
+            on_transfer(self.num_bytes, self.duration, ttfb=self.ttfb)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        logger.debug('Error handling Pandora audio proxy request from {}.'.format(client_address), exc_info=True)
+
+
+class _ProxyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug('Pandora audio proxy: {}'.format(format % args))
+
+    @property
+    def proxy(self):
+        return self.server.proxy
+
+    def do_GET(self):  # noqa: N802
+        entry = self.proxy.acquire_entry(self.path.strip('/'))
+        if entry is None:
+            return self._send_error(404)
+
+        start, end = self._parse_range(self.headers.get('Range'))
+        self._headers_sent = False
+        self._upstream = None
+        try:
+            if entry.length is None:
+                self._upstream = self.proxy.open_upstream(entry, start)
+            if entry.length is None:
+                return self._send_error(502)
+            if end is None or end >= entry.length:
+                end = entry.length - 1
+            if start > end:
+                return self._send_error(416, {'Content-Range': 'bytes */{:d}'.format(entry.length)})
+
+            self._send_headers(entry, start, end)
+            if self.proxy.ring_buffer is not None and entry.key in self.proxy.ring_buffer:
+                self._send_buffered(entry, start, end + 1)
+            else:
+                self._send_body(entry, start, end + 1)
+                self.proxy.buffer_audio(entry)
+
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error streaming Pandora audio from '{}': {}".format(entry.url, e))
+            self.close_connection = True
+            if not self._headers_sent:
+                self._send_error(502)
+        except (IOError, OSError, socket.error):
+            # Client disconnected, e.g. because playback was stopped or a seek was performed.
+            self.close_connection = True
+        except KeyError:
+            # Audio was overwritten in the ring buffer while it was being sent.
+            self.close_connection = True
+        finally:
+            if self._upstream is not None:
+                self._upstream.close()
+            self.proxy.release_entry(entry)
+
+    _headers_sent = False
+    _upstream = None
+
+    def _send_headers(self, entry, start, end):
+        if self.headers.get('Range'):
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {:d}-{:d}/{:d}'.format(start, end, entry.length))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', entry.content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self._headers_sent = True
+
+    def _send_buffered(self, entry, pos, stop):
+        while pos < stop:
+            data = self.proxy.ring_buffer.read(entry.key, pos, min(stop - pos, self.proxy.CHUNK_SIZE))
+            if not data:
+                break
+            self.wfile.write(data)
+            self.proxy.record_transfer(cache_bytes=len(data))
+            pos += len(data)
+
+    def _send_body(self, entry, pos, stop):
+        with open(entry.path, 'ab'):
+            # Create the cache file if it does not exist yet.
+            pass
+
+        with open(entry.path, 'r+b') as cache_file:
+            while pos < stop:
+                with entry.lock:
+                    cached_end = entry.ranges.get_end(pos)
+                    next_start = entry.ranges.get_next_start(pos)
+
+                if cached_end is not None:
+                    count = min(cached_end, stop) - pos
+                    self._send_file(cache_file, pos, count)
+                    self.proxy.record_transfer(cache_bytes=count)
+                    pos += count
+                    continue
+
+                # Re-use the current upstream response if it is positioned at the start of the missing range. Servers
+                # that do not support range requests always return the whole file, so rather keep on reading from those.
+                upstream = self._upstream
+                if upstream is not None and (upstream.offset > pos or upstream.offset < pos and upstream.partial):
+                    upstream.close()
+                    upstream = self._upstream = None
+                if upstream is None:
+                    upstream = self._upstream = self.proxy.open_upstream(entry, pos)
+
+                gap_end = min(next_start or entry.length, stop)
+                self._copy_upstream(entry, cache_file, upstream, pos, gap_end)
+                if upstream.offset < gap_end:
+                    raise requests.exceptions.ChunkedEncodingError('Incomplete response from audio server.')
+                pos = gap_end
+
+    def _copy_upstream(self, entry, cache_file, upstream, pos, stop):
+        while upstream.offset < stop:
+            chunk = upstream.read(min(self.proxy.CHUNK_SIZE, stop - upstream.offset))
+            if not chunk:
+                break
+            offset = upstream.offset
+            cache_file.seek(offset)
+            cache_file.write(chunk)
+            cache_file.flush()
+            upstream.offset += len(chunk)
+            with entry.lock:
+                entry.ranges.add(offset, upstream.offset)
+
+            # Only send the part of the chunk that the client has asked for.
+            begin = max(pos, offset) - offset
+            end = min(stop, upstream.offset) - offset
+            if end > begin:
+                self.wfile.write(chunk[begin:end])
+                self.proxy.record_transfer(upstream_bytes=end - begin)
+
+    def _send_file(self, f, pos, count):
+        if hasattr(os, 'sendfile'):
+            self.wfile.flush()
+            while count > 0:
+                sent = os.sendfile(self.connection.fileno(), f.fileno(), pos, count)
+                if sent == 0:
+                    break
+                pos += sent
+                count -= sent
+        else:
+            f.seek(pos)
+            while count > 0:
+                data = f.read(min(count, self.proxy.CHUNK_SIZE))
+                if not data:
+                    break
+                self.wfile.write(data)
+                count -= len(data)
+
+    def _send_error(self, status, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    @staticmethod
+    def _parse_range(value):
+        match = re.match(r'bytes=(\d+)-(\d*)$', value or '')
+        if match is None:
+            return 0, None
+        return int(match.group(1)), int(match.group(2)) if match.group(2) else None
@@ -0,0 +1,138 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+
+import threading
+
+from pandora import BaseAPIClient
+
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE_AUDIO_QUALITY = 'adaptive'
+
+
+class AdaptiveAudioQuality(object):
+    """ Selects the highest audio quality that can be streamed without stalling, based on the throughput and
+    time-to-first-byte measured while downloading audio from the Pandora servers.
+
+    Both measurements are smoothed using an exponentially weighted moving average. To prevent the quality from
+    flapping between two levels, upgrading to the next quality requires the throughput to exceed that quality's
+    bitrate by ``upgrade_margin``, while downgrading only happens once the throughput drops below the current
+    quality's bitrate times ``downgrade_margin``. Until the throughput has been measured, a fast time-to-first-byte
+    restores the quality one step at a time, up to ``initial_quality``.
+
+    :param initial_quality: the quality to use until enough measurements are available.
+    :param alpha: the weight of new measurements in the moving averages, between 0 and 1.
+    :param upgrade_margin: the factor by which the throughput has to exceed the next quality's bitrate.
+    :param downgrade_margin: the factor of the current quality's bitrate below which the throughput has to drop.
+    :param max_ttfb: the time-to-first-byte (in seconds) above which the quality is lowered.
+    """
+    QUALITIES = (BaseAPIClient.LOW_AUDIO_QUALITY, BaseAPIClient.MED_AUDIO_QUALITY, BaseAPIClient.HIGH_AUDIO_QUALITY)
+
+    # Nominal bitrates (in kbps) of the audio streams of each quality.
+    BITRATES = {
+        BaseAPIClient.LOW_AUDIO_QUALITY: 32,
+        BaseAPIClient.MED_AUDIO_QUALITY: 64,
+        BaseAPIClient.HIGH_AUDIO_QUALITY: 192,
+    }
+
+    # Transfers smaller than this are too short to say anything meaningful about the available throughput.
+    MIN_SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self, initial_quality=BaseAPIClient.MED_AUDIO_QUALITY, alpha=0.3, upgrade_margin=2.0,
+                 downgrade_margin=1.2, max_ttfb=2.0):
+        self.alpha = alpha
+        self.upgrade_margin = upgrade_margin
+        self.downgrade_margin = downgrade_margin
+        self.max_ttfb = max_ttfb
+
+        self._lock = threading.Lock()
+        self._index = self._initial_index = self.QUALITIES.index(initial_quality)
+        self.throughput = None
+        self.ttfb = None
+        self.upgrades = 0
+        self.downgrades = 0
+
+    @property
+    def quality(self):
+        with self._lock:
+            return self.QUALITIES[self._index]
+
+    def record_transfer(self, num_bytes, duration, ttfb=None):
+        """ Record the outcome of downloading audio.
+
+        :param num_bytes: the number of bytes that were downloaded.
+        :param duration: the number of seconds spent waiting for the data to arrive.
+        :param ttfb: the number of seconds until the server started responding, if known.
+        """
+        with self._lock:
+            if ttfb is not None:
+                self.ttfb = self._average(self.ttfb, ttfb)
+            if num_bytes >= self.MIN_SAMPLE_SIZE and duration > 0:
+                self.throughput = self._average(self.throughput, num_bytes / duration)
+            self._update()
+
+    def record_ttfb(self, ttfb):
+        self.record_transfer(0, 0, ttfb=ttfb)
+
+    def select(self, audio_url_map):
+        """ Returns a (quality, audio) tuple for the best stream in 'audio_url_map' that does not exceed the quality
+        that is currently supported. Lower qualities are tried first, followed by higher ones if none are available.
+
+        :param audio_url_map: the 'audioUrlMap' of a Pandora playlist item.
+        """
+        index = self.QUALITIES.index(self.quality)
+        for quality in self.QUALITIES[index::-1] + self.QUALITIES[index + 1:]:
+            audio = audio_url_map.get(quality)
+            if audio and audio.get('audioUrl'):
+                return quality, audio
+        return None, None
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'quality': self.QUALITIES[self._index],
+                'throughput': self.throughput,
+                'ttfb': self.ttfb,
+                'upgrades': self.upgrades,
+                'downgrades': self.downgrades,
+            }
+
+    def _average(self, average, sample):
+        if average is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * average
+
+    def _update(self):
+        index = self._index
+        if self.ttfb is not None and self.ttfb > self.max_ttfb:
+            index = max(index - 1, 0)
+        elif self.throughput is not None:
+            while index > 0 and self.throughput < self._get_rate(index) * self.downgrade_margin:
+                index -= 1
+            slow_start = self.ttfb is not None and self.ttfb > self.max_ttfb / 2
+            if (index == self._index and index < len(self.QUALITIES) - 1 and not slow_start and
+                    self.throughput >= self._get_rate(index + 1) * self.upgrade_margin):
+                index += 1
+        elif self.ttfb is not None and self.ttfb <= self.max_ttfb / 2 and index < self._initial_index:
+            # Without throughput measurements (e.g. if audio is not downloaded by the cache or proxy), a fast response
+            # is the only sign that the connection has recovered from an earlier downgrade.
+            index += 1
+
+        if index < self._index:
+            self.downgrades += 1
+        elif index > self._index:
+            self.upgrades += 1
+        else:
+            return
+
+        logger.info("Changing Pandora audio quality from '{}' to '{}' (throughput: {:.0f} kB/s, ttfb: {}s)."
+                    .format(self.QUALITIES[self._index], self.QUALITIES[index], (self.throughput or 0) / 1000,
+                            '{:.2f}'.format(self.ttfb) if self.ttfb is not None else 'n/a'))
+        self._index = index
+
+    def _get_rate(self, index):
+        """ Returns the number of bytes per second required to stream audio of the quality at 'index'. """
+        return self.BITRATES[self.QUALITIES[index]] * 1000 / 8
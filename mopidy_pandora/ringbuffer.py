@@ -0,0 +1,117 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+
+import mmap
+
+import threading
+
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class AudioRingBuffer(object):
+    """ Fixed-size, memory-mapped ring buffer that holds the audio of the most recently played tracks.
+
+    Audio files are written one after the other, wrapping around to the start of the buffer once the end has been
+    reached. Tracks whose audio is overwritten in the process are dropped, so memory use never exceeds ``size`` no
+    matter how many tracks are stored.
+
+    :param size: the size of the buffer in bytes.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, size):
+        self.size = size
+        self._buffer = mmap.mmap(-1, size)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._head = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def put(self, key, f, length):
+        """ Copy the audio for the track identified by 'key' from the file object 'f' into the buffer.
+
+        :param key: the URI of the track.
+        :param f: file object to read 'length' bytes from, starting at the current position.
+        :param length: the size of the audio file.
+        :return: True if the audio was stored, False if it does not fit in the buffer.
+        """
+        if length > self.size:
+            return False
+
+        with self._lock:
+            self._entries.pop(key, None)
+            offset = self._head
+            self._drop_overlapping(offset, length)
+
+            pos = offset
+            remaining = length
+            while remaining > 0:
+                data = f.read(min(remaining, self.CHUNK_SIZE, self.size - pos))
+                if not data:
+                    break
+                self._buffer[pos:pos + len(data)] = data
+                pos = (pos + len(data)) % self.size
+                remaining -= len(data)
+
+            if remaining > 0:
+                logger.warning("Error buffering audio for Pandora track '{}': file is incomplete.".format(key))
+                return False
+
+            self._entries[key] = (offset, length)
+            self._head = pos
+            return True
+
+    def get_length(self, key):
+        with self._lock:
+            return self._entries[key][1]
+
+    def read(self, key, pos, count):
+        """ Returns up to 'count' bytes of the audio for the track identified by 'key', starting at position 'pos'.
+
+        :raises KeyError: if the track's audio is not available in the buffer.
+        """
+        with self._lock:
+            offset, length = self._entries[key]
+            count = max(min(count, length - pos), 0)
+            start = (offset + pos) % self.size
+            end = start + count
+            if end <= self.size:
+                return self._buffer[start:end]
+            return self._buffer[start:] + self._buffer[:end - self.size]
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'tracks': len(self._entries),
+                'used': sum(length for _, length in self._entries.values()),
+                'size': self.size,
+            }
+
+    def _drop_overlapping(self, offset, length):
+        for key, (entry_offset, entry_length) in list(self._entries.items()):
+            if self._overlaps(offset, length, entry_offset, entry_length):
+                del self._entries[key]
+                logger.debug("Dropped audio for Pandora track '{}' from ring buffer.".format(key))
+
+    def _segments(self, offset, length):
+        end = offset + length
+        if end <= self.size:
+            return [(offset, end)]
+        return [(offset, self.size), (0, end - self.size)]
+
+    def _overlaps(self, offset_a, length_a, offset_b, length_b):
+        return any(start_a < end_b and start_b < end_a
+                   for start_a, end_a in self._segments(offset_a, length_a)
+                   for start_b, end_b in self._segments(offset_b, length_b))
@@ -0,0 +1,114 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+import logging
+
+import os
+
+import tempfile
+
+import threading
+
+from pandora.models.pandora import GenreStationList, StationList
+
+
+logger = logging.getLogger(__name__)
+
+
+class StationListSnapshot(object):
+    """ Persists the Pandora station list and genre stations to a local file.
+
+    Loading the lists from disk on startup allows the library to be browsed immediately, instead of having to wait
+    for both lists to be downloaded from the Pandora server first. The station list checksum is stored along with the
+    lists so that the snapshot can be revalidated later on. Saving the snapshot is thread-safe, so that both lists can
+    be refreshed in the background at the same time.
+
+    :param path: the file that the snapshot should be written to and read from.
+    """
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self, api_client):
+        """ Load the station list and genre stations from disk.
+
+        :param api_client: the API client that the restored Pandora models should be bound to.
+        :return: a (station_list, genre_stations) tuple. Lists that are not available in the snapshot are 'None'.
+        """
+        data = self._read()
+        station_list = data.get('station_list')
+        if station_list is not None:
+            station_list = StationList.from_json(api_client, station_list)
+
+        genre_stations = data.get('genre_stations')
+        if genre_stations is not None:
+            genre_stations = GenreStationList.from_json(api_client, genre_stations)
+
+        return station_list, genre_stations
+
+    def save(self, station_list=None, genre_stations=None):
+        """ Write the station list and / or genre stations to disk, retaining any list that is not provided.
+
+        :param station_list: the :class:`pandora.models.pandora.StationList` to store.
+        :param genre_stations: the :class:`pandora.models.pandora.GenreStationList` to store.
+        """
+        with self._lock:
+            data = self._read()
+            data['version'] = self.VERSION
+            if station_list is not None:
+                data['station_list'] = self._encode_station_list(station_list)
+            if genre_stations is not None:
+                data['genre_stations'] = self._encode_genre_stations(genre_stations)
+
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile(mode='w', dir=os.path.dirname(self.path) or '.',
+                                                 prefix=os.path.basename(self.path) + '.', suffix='.tmp',
+                                                 delete=False) as f:
+                    tmp_path = f.name
+                    f.write(json.dumps(data))
+                os.rename(tmp_path, self.path)
+            except (IOError, OSError):
+                logger.exception("Error writing Pandora station list snapshot to '{}'.".format(self.path))
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.loads(f.read())
+        except (IOError, OSError):
+            # No snapshot available yet.
+            return {}
+        except ValueError:
+            logger.warning("Ignoring corrupt Pandora station list snapshot '{}'.".format(self.path))
+            return {}
+
+        if data.get('version') != self.VERSION:
+            logger.info("Ignoring outdated Pandora station list snapshot '{}'.".format(self.path))
+            return {}
+
+        return data
+
+    @classmethod
+    def _encode_model(cls, model):
+        # Only fields that do not require formatting can be restored using 'from_json'.
+        return dict((field.field, getattr(model, key)) for key, field in model._fields.items()
+                    if field.formatter is None and getattr(model, key) is not None)
+
+    @classmethod
+    def _encode_station_list(cls, station_list):
+        data = cls._encode_model(station_list)
+        data['stations'] = [cls._encode_model(station) for station in station_list]
+        return data
+
+    @classmethod
+    def _encode_genre_stations(cls, genre_stations):
+        data = cls._encode_model(genre_stations)
+        data['categories'] = [{'categoryName': category,
+                               'stations': [cls._encode_model(station) for station in stations]}
+                              for category, stations in genre_stations.items()]
+        return data
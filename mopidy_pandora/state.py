@@ -0,0 +1,131 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+
+from collections import deque
+
+from mopidy import models
+from mopidy.audio import PlaybackState
+
+
+_UNKNOWN = object()
+
+
+class CoreState(object):
+    """ Local model of the Mopidy tracklist, current track, tracklist options, and playback history.
+
+    The model is updated incrementally from the CoreListener events that the frontends already receive, so that most
+    decisions can be made without blocking on a round-trip to the core actor. Parts of the model that cannot be derived
+    from an event (e.g. the contents of the tracklist after 'tracklist_changed') are invalidated instead, and retrieved
+    from the core the next time that they are needed.
+
+    The model is not thread-safe, and should only be used from the thread of the actor that owns it.
+
+    :param core: the Mopidy core actor proxy.
+    """
+    OPTIONS = ('consume', 'repeat', 'random', 'single')
+
+    # Only the most recent history entries are ever needed to detect track and station changes.
+    HISTORY_SIZE = 20
+
+    def __init__(self, core):
+        self.core = core
+
+        self._tl_tracks = None
+        self._options = None
+        self._history = None
+        self._current_tl_track = _UNKNOWN
+
+        # Number of round-trips to the core actor that were needed to keep the model up to date.
+        self.core_calls = 0
+
+    def on_event(self, event, **kwargs):
+        if event == 'tracklist_changed':
+            self._tl_tracks = None
+        elif event == 'options_changed':
+            self._options = None
+        elif event in ['track_playback_started', 'track_playback_paused', 'track_playback_resumed']:
+            tl_track = kwargs.get('tl_track')
+            if tl_track is None:
+                self._current_tl_track = _UNKNOWN
+                return
+            self._current_tl_track = tl_track
+            if event == 'track_playback_started' and self._history is not None:
+                # Mopidy adds tracks to its history just before 'track_playback_started' is sent.
+                self._history.appendleft((int(time.time() * 1000),
+                                          models.Ref.track(uri=tl_track.track.uri, name=tl_track.track.name)))
+            elif event == 'track_playback_paused':
+                # Changing tracks while paused adds them to the history without sending 'track_playback_started'.
+                self._history = None
+        elif event == 'playback_state_changed' and kwargs.get('new_state') == PlaybackState.STOPPED:
+            # The current track may be cleared when playback stops, retrieve it again when needed.
+            self._current_tl_track = _UNKNOWN
+
+    def get_active_uri(self, *args, **kwargs):
+        """ See :func:`mopidy_pandora.frontend.get_active_uri`. """
+        uri = None
+        track = kwargs.get('track', None)
+        if track:
+            uri = track.uri
+        else:
+            tl_track = kwargs['tl_track'] if 'tl_track' in kwargs else self.get_current_tl_track()
+            if tl_track:
+                uri = tl_track.track.uri
+        if not uri:
+            history = self.get_history()
+            if history:
+                uri = history[0][1].uri
+        return uri
+
+    def get_current_tl_track(self):
+        if self._current_tl_track is _UNKNOWN:
+            self._current_tl_track = self._get(self.core.playback.get_current_tl_track())
+        return self._current_tl_track
+
+    def get_history(self):
+        if self._history is None:
+            self._history = deque(self._get(self.core.history.get_history())[:self.HISTORY_SIZE],
+                                  maxlen=self.HISTORY_SIZE)
+        return list(self._history)
+
+    def get_tl_tracks(self):
+        if self._tl_tracks is None:
+            self._tl_tracks = list(self._get(self.core.tracklist.get_tl_tracks()))
+        return list(self._tl_tracks)
+
+    def get_tracks(self):
+        return [tl_track.track for tl_track in self.get_tl_tracks()]
+
+    def get_length(self):
+        return len(self.get_tl_tracks())
+
+    def index(self, tl_track=None):
+        if tl_track is None:
+            tl_track = self.get_current_tl_track()
+        try:
+            return self.get_tl_tracks().index(tl_track)
+        except ValueError:
+            return None
+
+    def filter(self, uri):
+        return [tl_track for tl_track in self.get_tl_tracks() if tl_track.track.uri == uri]
+
+    def add_tl_tracks(self, tl_tracks):
+        """ Record tracks that were added to the tracklist by the owner of the model. """
+        if self._tl_tracks is not None:
+            self._tl_tracks.extend(tl_tracks)
+
+    def get_option(self, name):
+        if self._options is None:
+            self._options = {option: self._get(getattr(self.core.tracklist, 'get_' + option)())
+                             for option in self.OPTIONS}
+        return self._options[name]
+
+    def set_option(self, name, value):
+        """ Record a tracklist option that was changed by the owner of the model. """
+        if self._options is not None:
+            self._options[name] = value
+
+    def _get(self, future):
+        self.core_calls += 1
+        return future.get()
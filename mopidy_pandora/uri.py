@@ -4,6 +4,10 @@ import logging
 
 import re
 
+import threading
+
+from cachetools import LRUCache
+
 from mopidy import compat, models
 
 from pandora.models.pandora import AdItem, GenreStation, PlaylistItem, Station
@@ -14,37 +18,104 @@ logger = logging.getLogger(__name__)
 
 
 def with_metaclass(meta, *bases):
-    return meta(str('NewBase'), bases, {})
+    return meta(str('NewBase'), bases, {'__slots__': ()})
 
 
 class _PandoraUriMeta(type):
     def __init__(cls, name, bases, clsdict):  # noqa: N805
         super(_PandoraUriMeta, cls).__init__(name, bases, clsdict)
-        if hasattr(cls, 'uri_type'):
+        if isinstance(getattr(cls, 'uri_type', None), basestring):
             cls.TYPES[cls.uri_type] = cls
 
 
 class PandoraUri(with_metaclass(_PandoraUriMeta, object)):
+    """ Immutable value object for a Pandora URI.
+
+    The fields that make up the URI are listed in ``_fields`` and stored in ``__slots__``. The encoded URI string is
+    built once when the object is created. URI objects compare equal to, and hash the same as, their URI string, so
+    either one can be used to look up items in a dictionary or cache.
+    """
+    __slots__ = ('_uri_type', '_uri')
+    _fields = ()
+
     TYPES = {}
     SCHEME = 'pandora'
 
-    def __init__(self, uri_type=None):
-        self.uri_type = uri_type
+    # URI strings are parsed once, and the resulting objects are shared by all callers that parse the same string.
+    PARSE_CACHE_SIZE = 1000
+    _parse_cache = LRUCache(maxsize=PARSE_CACHE_SIZE)
+    _parse_cache_lock = threading.Lock()
+
+    def __init__(self, uri_type=None, **fields):
+        self._init(uri_type, fields)
+
+    def _init(self, uri_type, fields, quoted=None):
+        object.__setattr__(self, '_uri_type', uri_type)
+        parts = ['{}:{}'.format(self.SCHEME, self.uri_type)]
+        for name in self._fields:
+            value = fields[name]
+            object.__setattr__(self, name, value)
+            parts.append(PandoraUri._quote(value, quoted))
+        object.__setattr__(self, '_uri', ':'.join(parts))
+
+    @classmethod
+    def _create(cls, quoted, **fields):
+        """ Create a URI without going through the constructor of 'cls', for use by the batch conversions.
+
+        :param quoted: dictionary of field values that have been quoted already, shared by all of the URIs in a batch.
+        """
+        uri_obj = cls.__new__(cls)
+        uri_obj._init(cls.uri_type, fields, quoted)
+        return uri_obj
+
+    @staticmethod
+    def _quote(value, quoted=None):
+        if quoted is None:
+            return '{}'.format(quote(PandoraUri.encode(value)))
+        try:
+            return quoted[value]
+        except KeyError:
+            result = quoted[value] = '{}'.format(quote(PandoraUri.encode(value)))
+            return result
 
     def __repr__(self):
-        return '{}:{uri_type}'.format(self.SCHEME, **self.__dict__)
+        return self._uri
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pandora URI '{}' is immutable.".format(self._uri))
+
+    def __delattr__(self, name):
+        raise AttributeError("Pandora URI '{}' is immutable.".format(self._uri))
+
+    def __eq__(self, other):
+        if isinstance(other, PandoraUri):
+            return self._uri == other._uri
+        if isinstance(other, basestring):
+            return self._uri == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self._uri)
+
+    @property
+    def uri_type(self):
+        return self._uri_type
 
     @property
     def encoded_attributes(self):
-        encoded_dict = {}
-        for k, v in list(self.__dict__.items()):
-            encoded_dict[k] = quote(PandoraUri.encode(v))
+        encoded_dict = {'uri_type': quote(PandoraUri.encode(self.uri_type))}
+        for name in self._fields:
+            encoded_dict[name] = quote(PandoraUri.encode(getattr(self, name)))
 
         return encoded_dict
 
     @property
     def uri(self):
-        return repr(self)
+        return self._uri
 
     @classmethod
     def encode(cls, value):
@@ -58,11 +129,11 @@ class PandoraUri(with_metaclass(_PandoraUriMeta, object)):
     def factory(cls, obj):
         if isinstance(obj, basestring):
             # A string
-            return PandoraUri._from_uri(obj)
+            return PandoraUri._parse(obj)
 
         if isinstance(obj, models.Ref) or isinstance(obj, models.Track):
             # A mopidy track or track reference
-            return PandoraUri._from_uri(obj.uri)
+            return PandoraUri._parse(obj.uri)
 
         elif isinstance(obj, Station) or isinstance(obj, GenreStation):
             # One of the station types
@@ -74,6 +145,77 @@ class PandoraUri(with_metaclass(_PandoraUriMeta, object)):
         else:
             raise NotImplementedError("Unsupported URI object type '{}'".format(type(obj)))
 
+    @classmethod
+    def factory_many(cls, objs):
+        """ Convert a sequence of URI strings, Mopidy tracks or track references, stations, or playlist items to URI
+        objects in a single pass.
+
+        Equivalent to calling :func:`factory` for each item, but the parse cache is only locked twice for the whole
+        sequence and the quoted form of values that occur more than once (e.g. the station ID of every track in a
+        playlist) is shared.
+
+        :param objs: the items to convert.
+        :return: a list of URI objects, in the same order as 'objs'.
+        """
+        quoted = {}
+        uri_objs = []
+        uris = {}
+        for i, obj in enumerate(objs):
+            if isinstance(obj, basestring):
+                uris[i] = obj
+            elif isinstance(obj, models.Ref) or isinstance(obj, models.Track):
+                uris[i] = obj.uri
+            elif isinstance(obj, Station) or isinstance(obj, GenreStation):
+                uri_objs.append(cls._from_station(obj, quoted))
+                continue
+            elif isinstance(obj, PlaylistItem) or isinstance(obj, AdItem):
+                uri_objs.append(cls._from_track(obj, quoted))
+                continue
+            else:
+                raise NotImplementedError("Unsupported URI object type '{}'".format(type(obj)))
+            uri_objs.append(None)
+
+        if uris:
+            for i, uri_obj in cls._parse_many(uris).items():
+                uri_objs[i] = uri_obj
+        return uri_objs
+
+    @classmethod
+    def _parse_many(cls, uris):
+        for uri in uris.values():
+            if not uri.startswith(PandoraUri.SCHEME + ':'):
+                raise NotImplementedError('Not a Pandora URI: {}'.format(uri))
+
+        with PandoraUri._parse_cache_lock:
+            uri_objs = dict((i, PandoraUri._parse_cache.get(uri)) for i, uri in uris.items())
+
+        parsed = dict((uri, cls._from_uri(uri)) for i, uri in uris.items() if uri_objs[i] is None)
+        if parsed:
+            with PandoraUri._parse_cache_lock:
+                for uri, uri_obj in parsed.items():
+                    parsed[uri] = PandoraUri._parse_cache.setdefault(uri, uri_obj)
+            for i, uri in uris.items():
+                if uri_objs[i] is None:
+                    uri_objs[i] = parsed[uri]
+        return uri_objs
+
+    @classmethod
+    def _parse(cls, uri):
+        """ Returns the shared, immutable URI object for the URI string 'uri', parsing it only if it has not been
+        parsed recently.
+        """
+        if not uri.startswith(PandoraUri.SCHEME + ':'):
+            # Fast path for URIs from other backends, no need to parse or cache those.
+            raise NotImplementedError('Not a Pandora URI: {}'.format(uri))
+
+        with PandoraUri._parse_cache_lock:
+            uri_obj = PandoraUri._parse_cache.get(uri)
+        if uri_obj is None:
+            uri_obj = cls._from_uri(uri)
+            with PandoraUri._parse_cache_lock:
+                uri_obj = PandoraUri._parse_cache.setdefault(uri, uri_obj)
+        return uri_obj
+
     @classmethod
     def _from_uri(cls, uri):
         parts = [unquote(cls.encode(p)) for p in uri.split(':')]
@@ -86,61 +228,50 @@ class PandoraUri(with_metaclass(_PandoraUriMeta, object)):
             raise NotImplementedError("Unsupported Pandora URI type '{}'".format(uri))
 
     @classmethod
-    def _from_station(cls, station):
+    def _from_station(cls, station, quoted=None):
         if isinstance(station, Station) or isinstance(station, GenreStation):
             if GenreStationUri.pattern.match(station.id) and station.id == station.token:
-                return GenreStationUri(station.id, station.token)
-            return StationUri(station.id, station.token)
+                return GenreStationUri._create(quoted, station_id=station.id, token=station.token)
+            return StationUri._create(quoted, station_id=station.id, token=station.token)
         else:
             raise NotImplementedError("Unsupported station item type '{}'".format(station))
 
     @classmethod
-    def _from_track(cls, track):
+    def _from_track(cls, track, quoted=None):
         if isinstance(track, PlaylistItem):
-            return PlaylistItemUri(track.station_id, track.track_token)
+            return PlaylistItemUri._create(quoted, station_id=track.station_id, token=track.track_token)
         elif isinstance(track, AdItem):
-            return AdItemUri(track.station_id, track.ad_token)
+            return AdItemUri._create(quoted, station_id=track.station_id, ad_token=track.ad_token)
         else:
             raise NotImplementedError("Unsupported playlist item type '{}'".format(track))
 
     @classmethod
     def is_pandora_uri(cls, uri):
         try:
-            return uri and isinstance(uri, basestring) and uri.startswith(PandoraUri.SCHEME) and PandoraUri.factory(uri)
+            return uri and isinstance(uri, basestring) and uri.startswith(PandoraUri.SCHEME + ':') and \
+                PandoraUri.factory(uri)
         except NotImplementedError:
             return False
 
 
 class GenreUri(PandoraUri):
+    __slots__ = _fields = ('category_name',)
     uri_type = 'genre'
 
     def __init__(self, category_name):
-        super(GenreUri, self).__init__(self.uri_type)
-        self.category_name = category_name
-
-    def __repr__(self):
-        return '{}:{category_name}'.format(
-            super(GenreUri, self).__repr__(),
-            **self.encoded_attributes
-        )
+        super(GenreUri, self).__init__(self.uri_type, category_name=category_name)
 
 
 class StationUri(PandoraUri):
+    __slots__ = _fields = ('station_id', 'token')
     uri_type = 'station'
 
     def __init__(self, station_id, token):
-        super(StationUri, self).__init__(self.uri_type)
-        self.station_id = station_id
-        self.token = token
-
-    def __repr__(self):
-        return '{}:{station_id}:{token}'.format(
-            super(StationUri, self).__repr__(),
-            **self.encoded_attributes
-        )
+        super(StationUri, self).__init__(self.uri_type, station_id=station_id, token=token)
 
 
 class GenreStationUri(StationUri):
+    __slots__ = ()
     uri_type = 'genre_station'
     pattern = re.compile('^([G])(\d*)$')
 
@@ -154,54 +285,45 @@ class GenreStationUri(StationUri):
 
 
 class TrackUri(PandoraUri):
+    __slots__ = ()
     uri_type = 'track'
 
 
 class PlaylistItemUri(TrackUri):
+    __slots__ = _fields = ('station_id', 'token')
 
     def __init__(self, station_id, token):
-        super(PlaylistItemUri, self).__init__(self.uri_type)
-        self.station_id = station_id
-        self.token = token
-
-    def __repr__(self):
-        return '{}:{station_id}:{token}'.format(
-            super(PlaylistItemUri, self).__repr__(),
-            **self.encoded_attributes
-        )
+        super(PlaylistItemUri, self).__init__(self.uri_type, station_id=station_id, token=token)
 
 
 class AdItemUri(TrackUri):
+    __slots__ = _fields = ('station_id', 'ad_token')
     uri_type = 'ad'
 
     def __init__(self, station_id, ad_token):
-        super(AdItemUri, self).__init__(self.uri_type)
-        self.station_id = station_id
-        self.ad_token = ad_token
-
-    def __repr__(self):
-        return '{}:{station_id}:{ad_token}'.format(
-            super(AdItemUri, self).__repr__(),
-            **self.encoded_attributes
-        )
+        super(AdItemUri, self).__init__(self.uri_type, station_id=station_id, ad_token=ad_token)
 
 
 class SearchUri(PandoraUri):
+    __slots__ = _fields = ('token',)
     uri_type = 'search'
+    pattern = re.compile('^([SRCG])')
 
     def __init__(self, token):
-        super(SearchUri, self).__init__(self.uri_type)
-
         # Check that this really is a search result URI as opposed to a regular URI.
         # Search result tokens always start with 'S' (song), 'R' (artist), 'C' (composer), or 'G' (genre station).
-        assert re.match('^([SRCG])', token)
-        self.token = token
+        assert SearchUri.pattern.match(token)
+        super(SearchUri, self).__init__(self.uri_type, token=token)
 
-    def __repr__(self):
-        return '{}:{token}'.format(
-            super(SearchUri, self).__repr__(),
-            **self.encoded_attributes
-        )
+    @classmethod
+    def from_tokens(cls, tokens):
+        """ Returns a list of search URIs for the search result tokens provided. """
+        quoted = {}
+        uri_objs = []
+        for token in tokens:
+            assert SearchUri.pattern.match(token)
+            uri_objs.append(cls._create(quoted, token=token))
+        return uri_objs
 
     @property
     def is_track_search(self):
@@ -1,10 +1,25 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import heapq
+
+import itertools
+
 import json
 
+import logging
+
+import random
+
+import threading
+
+import time
+
 import requests
 
 
+logger = logging.getLogger(__name__)
+
+
 def run_async(func):
     """ Function decorator intended to make "func" run in a separate thread (asynchronously).
 
@@ -35,6 +50,351 @@ def run_async(func):
     return async_func
 
 
+class SingleFlight(object):
+    """ Coalesces concurrent calls for the same key, so that only one of them is actually executed.
+
+    Callers that arrive while a call for the same key is still in progress wait for it to complete, and receive the
+    same result (or exception) as the caller that made the call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def call(self, key, func, *args, **kwargs):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.completed.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.completed.set()
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._flights
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.completed = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RetryPolicy(object):
+    """ Retries failed calls using exponential backoff with full jitter.
+
+    :param max_attempts: the maximum number of times that a call should be attempted.
+    :param base_delay: the maximum delay (in seconds) before the first retry, doubled with every subsequent attempt.
+    :param max_delay: the upper limit (in seconds) for the delay between attempts.
+    :param retry_on: a function that returns 'True' if the call should be retried for the exception provided.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8, retry_on=None):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on or (lambda e: True)
+
+    def call(self, func, *args, **kwargs):
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.retry_on(e):
+                    raise
+                delay = self.get_delay(attempt)
+                logger.debug('Attempt {:d} failed ({}), retrying in {:.2f} seconds.'.format(attempt, e, delay))
+                time.sleep(delay)
+                attempt += 1
+
+    def get_delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """ Raised instead of making a call while the :class:`CircuitBreaker` for it is open. """
+    pass
+
+
+class CircuitBreaker(object):
+    """ Stops making calls that are likely to fail after repeated failures, until ``reset_timeout`` has elapsed.
+
+    Once the timeout has elapsed a single trial call is allowed through: the breaker closes again if it succeeds, and
+    re-opens if it fails.
+
+    :param name: the name of the endpoint protected by the breaker, used for logging.
+    :param failure_threshold: the number of consecutive failures after which the breaker should open.
+    :param reset_timeout: the length of time (in seconds) that the breaker should stay open for.
+    :param is_failure: a function that returns 'True' if the exception provided should count as a failure.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, is_failure=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda e: True)
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def call(self, func, *args, **kwargs):
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+
+        self._on_success()
+        return result
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                # Allow a single trial call through.
+                self._state = self.HALF_OPEN
+                return
+            raise CircuitOpenError("Circuit breaker for '{}' is open.".format(self.name))
+
+    def _on_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker for '{}' closed.".format(self.name))
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def _on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit breaker for '{}' opened after {:d} failures."
+                                   .format(self.name, self._failures))
+                self._state = self.OPEN
+                self._opened_at = time.time()
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """ Raised instead of making a call that would have to wait too long for a :class:`TokenBucket`. """
+    pass
+
+
+class TokenBucket(object):
+    """ Token bucket rate limiter that allows bursts of up to ``capacity`` calls, refilled at ``rate`` calls per second.
+
+    Calls reserve a token up front. If the bucket is empty the reservation is still granted, and the caller is told
+    how long it has to wait before the call may be made, so that concurrent callers are queued in order.
+
+    :param name: the name of the resource protected by the bucket, used for logging.
+    :param rate: the number of tokens that are added to the bucket per second.
+    :param capacity: the maximum number of tokens that the bucket can hold.
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)
+        self._updated_at = time.time()
+
+        self.calls = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.total_delay = 0
+        self.last_delay = 0
+
+    @property
+    def remaining(self):
+        """ The number of calls that can still be made without having to wait. """
+        with self._lock:
+            self._refill()
+            return max(int(self._tokens), 0)
+
+    def reserve(self, max_delay=None):
+        """ Reserve a token for a call.
+
+        :param max_delay: the maximum number of seconds that the caller is willing to wait, or 'None' to wait as long as
+               necessary.
+        :return: the number of seconds that the caller has to wait before making the call.
+        :raises RateLimitExceeded: if the caller would have to wait longer than 'max_delay'. No token is reserved.
+        """
+        with self._lock:
+            self._refill()
+            delay = max(1 - self._tokens, 0) / self.rate
+            if max_delay is not None and delay > max_delay:
+                self.rejected += 1
+                raise RateLimitExceeded("Rate limit for '{}' exceeded, next call allowed in {:.1f} seconds."
+                                        .format(self.name, delay))
+            self._tokens -= 1
+            self.calls += 1
+            if delay > 0:
+                self.delayed += 1
+                self.total_delay += delay
+            self.last_delay = delay
+            return delay
+
+    def cancel(self):
+        """ Return the token of a reservation for a call that will not be made after all. """
+        with self._lock:
+            self._tokens = min(self._tokens + 1, self.capacity)
+            self.calls -= 1
+
+    @property
+    def stats(self):
+        with self._lock:
+            self._refill()
+            return {
+                'remaining': max(int(self._tokens), 0),
+                'capacity': self.capacity,
+                'calls': self.calls,
+                'delayed': self.delayed,
+                'rejected': self.rejected,
+                'total_delay': self.total_delay,
+                'last_delay': self.last_delay,
+            }
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self._tokens + (now - self._updated_at) * self.rate, self.capacity)
+        self._updated_at = now
+
+
+class Scheduler(object):
+    """ Runs functions at a given time on a single, long-lived background thread.
+
+    Pending calls are kept in a heap ordered by their deadline, so that any number of timeouts can be handled without
+    starting a thread for each of them. The functions are run one at a time and should not block. The thread is started
+    when the first call is scheduled, if :meth:`start` has not been called before.
+
+    :param name: the name of the scheduler thread.
+    """
+
+    def __init__(self, name='PandoraScheduler'):
+        self.name = name
+        self._condition = threading.Condition()
+        self._calls = []
+        self._counter = itertools.count()
+        self._thread = None
+        self._stopped = None
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stopped,), name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopped.set()
+            self._calls = []
+            self._thread = None
+            self._condition.notify_all()
+
+    def call_later(self, delay, func, *args, **kwargs):
+        """ Schedule 'func' to be called with 'args' and 'kwargs' after 'delay' seconds.
+
+        :return: a handle that can be passed to :meth:`cancel`.
+        """
+        self.start()
+        call = _ScheduledCall(time.time() + delay, next(self._counter), func, args, kwargs)
+        with self._condition:
+            heapq.heappush(self._calls, call)
+            if self._calls[0] is call:
+                # The new call is due before the one that the scheduler thread is currently waiting for.
+                self._condition.notify()
+        return call
+
+    def call_soon(self, func, *args, **kwargs):
+        return self.call_later(0, func, *args, **kwargs)
+
+    def cancel(self, call):
+        # Cancelled calls are discarded once they reach the top of the heap.
+        call.cancelled = True
+
+    @property
+    def pending(self):
+        with self._condition:
+            return sum(1 for call in self._calls if not call.cancelled)
+
+    def _run(self, stopped):
+        while True:
+            with self._condition:
+                while not stopped.is_set():
+                    if not self._calls:
+                        self._condition.wait()
+                        continue
+                    timeout = self._calls[0].deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if stopped.is_set():
+                    return
+                call = heapq.heappop(self._calls)
+            if call.cancelled:
+                continue
+            try:
+                call.func(*call.args, **call.kwargs)
+            except Exception:
+                logger.exception("Error running scheduled call '{}'.".format(getattr(call.func, '__name__', call.func)))
+
+
+class _ScheduledCall(object):
+
+    def __init__(self, deadline, seq, func, args, kwargs):
+        self.deadline = deadline
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
 def format_proxy(proxy_config):
     if not proxy_config.get('hostname'):
         return None
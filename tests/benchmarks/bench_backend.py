@@ -0,0 +1,98 @@
+""" End-to-end benchmark of :class:`mopidy_pandora.backend.PandoraBackend` against a local :class:`FakeTuner`.
+
+Usage::
+
+    python -m tests.benchmarks.bench_backend --latency 0.05 --jitter 0.02 --fault-rate 0.05 --tracks 20
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+
+import time
+
+import mock
+
+from mopidy_pandora.backend import PandoraBackend
+from mopidy_pandora.library import PandoraLibraryProvider
+from mopidy_pandora.uri import PandoraUri
+
+from tests import conftest
+from tests.fake_tuner import FakeTuner
+
+
+def timed(results, name, func, *args, **kwargs):
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    results.setdefault(name, []).append(time.time() - start_time)
+    return result
+
+
+def create_backend(tuner, args):
+    config = conftest.config()
+    config['pandora'].update(tuner.config)
+    config['pandora']['preferred_audio_quality'] = 'highQuality'
+    config['pandora']['playlist_low_water_mark'] = args.low_water_mark
+    config['proxy'] = {}
+
+    backend = PandoraBackend(config=config, audio=mock.Mock())
+    tuner.apply(backend.api.transport)
+    return backend
+
+
+def run(args):
+    results = {}
+    with FakeTuner(latency=args.latency, jitter=args.jitter, fault_rate=args.fault_rate,
+                   playlist_size=args.playlist_size, seed=args.seed) as tuner:
+        backend = create_backend(tuner, args)
+
+        timed(results, 'login', backend.on_start)
+        timed(results, 'browse stations (cold)', backend.library.browse, PandoraLibraryProvider.root_directory.uri)
+        timed(results, 'browse stations (warm)', backend.library.browse, PandoraLibraryProvider.root_directory.uri)
+        timed(results, 'browse genres', backend.library.browse, PandoraLibraryProvider.genre_directory.uri)
+
+        station = backend.api.get_station_list()[0]
+        station_uri = PandoraUri.factory(station).uri
+        timed(results, 'first track', backend.library.browse, station_uri)
+
+        track = None
+        for _ in range(args.tracks):
+            track = timed(results, 'next track', backend.library.get_next_pandora_track, station.id)
+            if track is None:
+                continue
+            timed(results, 'playability check', backend.playback.change_pandora_track, track)
+            if args.think_time:
+                time.sleep(args.think_time)
+
+        if track is not None:
+            timed(results, 'thumbs up', backend.process_event, track.uri, 'thumbs_up')
+
+        metrics = backend.get_metrics()
+
+    print('{:<24} {:>6} {:>10} {:>10} {:>10}'.format('operation', 'count', 'mean (ms)', 'p95 (ms)', 'max (ms)'))
+    for name, latencies in results.items():
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        mean = sum(latencies) / len(latencies)
+        print('{:<24} {:>6d} {:>10.1f} {:>10.1f} {:>10.1f}'.format(name, len(latencies), 1000 * mean,
+                                                                   1000 * p95, 1000 * latencies[-1]))
+    print()
+    print('API requests: {}'.format(dict(tuner.requests)))
+    print('Timeouts: {}'.format(metrics['timeouts']))
+    print('Circuit breakers: {}'.format(metrics['circuit_breakers']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0.05, help='server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='server latency jitter in seconds')
+    parser.add_argument('--fault-rate', type=float, default=0, help='fraction of API requests that fail')
+    parser.add_argument('--playlist-size', type=int, default=4, help='tracks returned per playlist request')
+    parser.add_argument('--low-water-mark', type=int, default=1, help='playlist_low_water_mark to configure')
+    parser.add_argument('--tracks', type=int, default=20, help='number of tracks to play')
+    parser.add_argument('--think-time', type=float, default=0, help='seconds to wait between tracks')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for jitter and faults')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+""" Benchmark of the time that :class:`mopidy_pandora.playback.PandoraPlaybackProvider` takes to change tracks, which
+is the length of the gap between two tracks, against a local :class:`FakeTuner`.
+
+Each track change is measured twice: once 'cold', when the playability of the track still has to be checked, and once
+'pre-validated', when the track has already been checked ahead of time as is done when the current track is about to
+finish.
+
+Usage::
+
+    python -m tests.benchmarks.bench_gap --latency 0.05 --jitter 0.02 --tracks 20
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+
+import time
+
+import mock
+
+from mopidy_pandora.backend import PandoraBackend
+from mopidy_pandora.uri import PandoraUri
+
+from tests import conftest
+from tests.fake_tuner import FakeTuner
+
+
+def create_backend(tuner, playability_cache_ttl):
+    config = conftest.config()
+    config['pandora'].update(tuner.config)
+    config['pandora']['playability_cache_ttl'] = playability_cache_ttl
+    config['proxy'] = {}
+
+    backend = PandoraBackend(config=config, audio=mock.Mock())
+    tuner.apply(backend.api.transport)
+    backend.on_start()
+    return backend
+
+
+def measure_gaps(backend, station_id, tracks, pre_validate):
+    gaps = []
+    for _ in range(tracks):
+        track = backend.library.get_next_pandora_track(station_id)
+        if track is None:
+            continue
+        if pre_validate:
+            backend.probe_track_playability(track.uri).join()
+
+        start_time = time.time()
+        if backend.playback.change_track(track):
+            gaps.append(time.time() - start_time)
+    return gaps
+
+
+def run(args):
+    results = {}
+    with FakeTuner(latency=args.latency, jitter=args.jitter, playlist_size=args.playlist_size,
+                   seed=args.seed) as tuner:
+        for name, ttl, pre_validate in (('cold', 0, False), ('pre-validated', 300, True)):
+            backend = create_backend(tuner, ttl)
+            station = backend.api.get_station_list()[0]
+            backend.library.browse(PandoraUri.factory(station).uri)
+            results[name] = measure_gaps(backend, station.id, args.tracks, pre_validate)
+
+    print('{:<16} {:>6} {:>10} {:>10} {:>10}'.format('track change', 'count', 'mean (ms)', 'p95 (ms)', 'max (ms)'))
+    for name, gaps in results.items():
+        if not gaps:
+            continue
+        gaps = sorted(gaps)
+        p95 = gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))]
+        print('{:<16} {:>6d} {:>10.1f} {:>10.1f} {:>10.1f}'.format(name, len(gaps), 1000 * sum(gaps) / len(gaps),
+                                                                   1000 * p95, 1000 * gaps[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0.05, help='server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='server latency jitter in seconds')
+    parser.add_argument('--playlist-size', type=int, default=4, help='tracks returned per playlist request')
+    parser.add_argument('--tracks', type=int, default=20, help='number of track changes to measure')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for jitter')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
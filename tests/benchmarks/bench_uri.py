@@ -0,0 +1,75 @@
+""" Microbenchmark of the number of URIs per second that :func:`mopidy_pandora.uri.PandoraUri.factory` can parse.
+
+Each scenario is measured for a mix of ``--distinct`` different URIs:
+
+- 'uncached': parsing every URI from scratch, as was done before the parse cache was introduced.
+- 'cached': parsing URIs that have been parsed before.
+- 'cached (batch)': parsing the same URIs ``--batch`` at a time using :func:`PandoraUri.factory_many`.
+- 'other backend': rejecting URIs that belong to another Mopidy backend.
+- 'is_pandora_uri': checking URIs of Pandora and other backends, as is done for every Mopidy core event.
+
+Usage::
+
+    python -m tests.benchmarks.bench_uri --iterations 100000 --distinct 50 --batch 50
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+
+import time
+
+from mopidy_pandora.uri import PandoraUri
+
+
+def measure(func, uris, iterations):
+    start_time = time.time()
+    for i in range(iterations):
+        func(uris[i % len(uris)])
+    return iterations / (time.time() - start_time)
+
+
+def measure_batches(uris, iterations, batch_size):
+    batch = [uris[i % len(uris)] for i in range(batch_size)]
+    start_time = time.time()
+    for _ in range(iterations // batch_size):
+        PandoraUri.factory_many(batch)
+    return iterations // batch_size * batch_size / (time.time() - start_time)
+
+
+def reject(uri):
+    try:
+        PandoraUri.factory(uri)
+    except NotImplementedError:
+        pass
+
+
+def run(args):
+    pandora_uris = ['pandora:track:station_id_{:d}:track_token_{:d}'.format(i, i) for i in range(args.distinct)]
+    other_uris = ['local:track:Artist/Album/Track%20{:d}.mp3'.format(i) for i in range(args.distinct)]
+
+    for uri in pandora_uris:
+        PandoraUri.factory(uri)
+
+    results = [
+        ('uncached', measure(PandoraUri._from_uri, pandora_uris, args.iterations)),
+        ('cached', measure(PandoraUri.factory, pandora_uris, args.iterations)),
+        ('cached (batch)', measure_batches(pandora_uris, args.iterations, args.batch)),
+        ('other backend', measure(reject, other_uris, args.iterations)),
+        ('is_pandora_uri', measure(PandoraUri.is_pandora_uri, pandora_uris + other_uris, args.iterations)),
+    ]
+
+    print('{:<16} {:>14}'.format('scenario', 'parses/s'))
+    for name, rate in results:
+        print('{:<16} {:>14,.0f}'.format(name, rate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=100000, help='number of URIs to parse per scenario')
+    parser.add_argument('--distinct', type=int, default=50, help='number of different URIs to parse')
+    parser.add_argument('--batch', type=int, default=50, help='number of URIs to parse per batch')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -66,6 +66,29 @@ def config():
             'sort_order': 'a-z',
             'auto_setup': True,
             'cache_time_to_live': 86400,
+            'cache_max_staleness': 0,
+            'persist_station_lists': False,
+            'playlist_low_water_mark': 1,
+            'audio_url_ttl': 3600,
+            'playability_cache_ttl': 300,
+            'audio_cache_size': 0,
+            'audio_proxy_cache_size': 0,
+            'audio_ring_buffer_size': 0,
+            'connection_pool_size': 10,
+            'connection_pool_maxsize': 10,
+            'connect_timeout': 5,
+            'read_timeout': 15,
+            'login_deadline': 30,
+            'station_list_deadline': 30,
+            'playlist_deadline': 20,
+            'feedback_deadline': 10,
+            'playability_deadline': 5,
+            'retry_max_attempts': 3,
+            'circuit_breaker_threshold': 5,
+            'circuit_breaker_reset_timeout': 30,
+            'playlist_rate_limit': 0,
+            'station_playlist_rate_limit': 0,
+            'metrics_log_interval': 0,
 
             'event_support_enabled': True,
             'double_click_interval': '0.5',
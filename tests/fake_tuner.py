@@ -0,0 +1,478 @@
+""" A local stand-in for the Pandora tuner JSON API and audio CDN.
+
+:class:`FakeTuner` runs an HTTP server on the loopback interface that speaks the same (Blowfish encrypted) protocol as
+the real Pandora tuner, so that the full request path through pydora's transport, encryption, JSON decoding, and
+``requests`` can be exercised in integration tests and benchmarks without network access.
+
+Latency, jitter, and faults can be injected to simulate a slow or degraded server::
+
+    with FakeTuner(latency=0.05, jitter=0.02, fault_rate=0.1) as tuner:
+        config['pandora'].update(tuner.config)
+        backend = PandoraBackend(config, audio)
+        tuner.apply(backend.api.transport)
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import binascii
+
+import hashlib
+
+import json
+
+import random
+
+import threading
+
+import time
+
+from collections import Counter
+
+from Crypto.Cipher import Blowfish
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+
+API_PATH = '/services/json/'
+AUDIO_PATH = '/audio/'
+
+AUDIO_QUALITIES = {
+    'highQuality': ('192', 'mp3'),
+    'mediumQuality': ('64', 'aacplus'),
+    'lowQuality': ('32', 'aacplus'),
+}
+
+# Pandora API error codes, see 'pandora.errors'.
+INTERNAL_SERVER_ERROR = 0
+UNKNOWN_METHOD_NAME = 14
+INVALID_AUTH_TOKEN = 1001
+INVALID_PARTNER_LOGIN = 1002
+STATION_DOES_NOT_EXIST = 1006
+
+# Fault types that can be injected for API methods.
+HTTP_ERROR = 'http_error'
+DISCONNECT = 'disconnect'
+
+
+class FakeTuner(object):
+    """ Fake Pandora tuner server.
+
+    :param encryption_key: the partner encryption key that clients should use.
+    :param decryption_key: the partner decryption key that clients should use.
+    :param latency: the number of seconds to wait before responding to each request.
+    :param jitter: a random number of seconds, up to this value, that is added to or subtracted from ``latency``.
+    :param fault_rate: the probability (between 0 and 1) that an API request fails with an HTTP 500 error.
+    :param faults: dictionary of API method names to the fault that should be injected for every call to that method.
+           Faults can either be ``HTTP_ERROR``, ``DISCONNECT``, or a Pandora API error code.
+    :param station_count: the number of stations in the user's station list, in addition to the QuickMix station.
+    :param playlist_size: the number of tracks returned for every playlist request.
+    :param ad_interval: insert an advertisement after every this many tracks in a playlist. '0' disables adverts.
+    :param audio_size: the size (in bytes) of every audio file served by the fake CDN.
+    :param seed: seed for the random number generator used for jitter and faults.
+    """
+
+    def __init__(self, encryption_key='fake_encryption_key', decryption_key='fake_decryption_key', latency=0,
+                 jitter=0, fault_rate=0, faults=None, station_count=5, playlist_size=4, ad_interval=0,
+                 audio_size=64 * 1024, seed=None):
+        self.encryption_key = encryption_key
+        self.decryption_key = decryption_key
+        self.latency = latency
+        self.jitter = jitter
+        self.fault_rate = fault_rate
+        self.faults = faults or {}
+        self.playlist_size = playlist_size
+        self.ad_interval = ad_interval
+        self.audio_size = audio_size
+
+        self.requests = Counter()
+        self.audio_requests = Counter()
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+        self._track_count = 0
+        self._station_count = 0
+        self._partner_auth_token = None
+        self._user_auth_token = None
+        self.stations = [self._create_station('Fake Station {:d}'.format(i)) for i in range(1, station_count + 1)]
+        # Pandora always includes a QuickMix station, which shuffles between the other stations, in the station list.
+        self.stations.insert(0, self._create_quickmix_station(self.stations))
+        self.genre_categories = [
+            {'categoryName': 'Fake Category {:d}'.format(c),
+             'stations': [{'stationName': 'Fake Genre {:d}.{:d}'.format(c, s),
+                           'stationToken': 'G{:d}{:02d}'.format(c, s),
+                           'stationId': 'G{:d}{:02d}'.format(c, s)} for s in range(1, 4)]}
+            for c in range(1, 4)]
+        self.feedback = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self):
+        return 'http://{}:{:d}'.format(*self._server.server_address)
+
+    @property
+    def api_host(self):
+        return '{}:{:d}{}'.format(self._server.server_address[0], self._server.server_address[1], API_PATH)
+
+    @property
+    def config(self):
+        """ The Mopidy-Pandora configuration values that are required to connect to this server. """
+        return {
+            'api_host': self.api_host,
+            'partner_encryption_key': self.encryption_key,
+            'partner_decryption_key': self.decryption_key,
+        }
+
+    def start(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _RequestHandler)
+        self._server.tuner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='FakeTuner')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def apply(self, transport):
+        """ Configure a pydora transport to communicate with this server, which does not support TLS. """
+        transport.REQUIRE_TLS = ()
+
+    def expire_auth_tokens(self):
+        """ Invalidate all issued auth tokens, so that clients have to log in again. """
+        with self._lock:
+            self._partner_auth_token = None
+            self._user_auth_token = None
+
+    def audio_url(self, track_token, quality='highQuality'):
+        return '{}{}{}-{}.{}'.format(self.url, AUDIO_PATH, track_token, quality, AUDIO_QUALITIES[quality][1])
+
+    def audio_data(self, path):
+        """ Returns the deterministic content of the audio file at 'path'. """
+        seed = hashlib.md5(path.encode('utf-8')).digest()
+        return (seed * (self.audio_size // len(seed) + 1))[:self.audio_size]
+
+    def delay(self):
+        latency = self.latency
+        if self.jitter:
+            with self._lock:
+                latency += self._random.uniform(-self.jitter, self.jitter)
+        if latency > 0:
+            time.sleep(latency)
+
+    def get_fault(self, method):
+        fault = self.faults.get(method)
+        if fault is not None:
+            return fault
+        if self.fault_rate:
+            with self._lock:
+                if self._random.random() < self.fault_rate:
+                    return HTTP_ERROR
+        return None
+
+    def handle_api_call(self, method, params, data):
+        """ Returns the result of calling the API 'method', or raises an :class:`APIError`. """
+        handler = getattr(self, '_' + method.replace('.', '_'), None)
+        if handler is None:
+            raise APIError(UNKNOWN_METHOD_NAME, 'Unknown method name: {}'.format(method))
+
+        if method == 'auth.userLogin':
+            if params.get('auth_token') != self._partner_auth_token:
+                raise APIError(INVALID_AUTH_TOKEN, 'Invalid partner auth token.')
+        elif method != 'auth.partnerLogin':
+            if self._user_auth_token is None or params.get('auth_token') != self._user_auth_token:
+                raise APIError(INVALID_AUTH_TOKEN, 'Invalid user auth token.')
+
+        return handler(data)
+
+    def decrypt(self, body):
+        raw = _blowfish(self.encryption_key).decrypt(binascii.unhexlify(body.strip()))
+        # Strip the padding that was added to the JSON document.
+        return json.loads(raw[:raw.rindex(b'}') + 1].decode('utf-8'))
+
+    def encrypt_sync_time(self, sync_time):
+        data = b'\x00' * 4 + '{:010d}'.format(sync_time).encode('ascii') + b'\x00' * 2
+        return binascii.hexlify(_blowfish(self.decryption_key).encrypt(data)).decode('ascii')
+
+    def _create_station(self, name):
+        with self._lock:
+            self._station_count += 1
+            station_id = '{:019d}'.format(self._station_count)
+        return {
+            'stationId': station_id,
+            'stationToken': station_id,
+            'stationName': name,
+            'stationDetailUrl': None,
+            'artUrl': None,
+            'allowDelete': True,
+            'allowRename': True,
+            'isQuickMix': False,
+            'isShared': False,
+            'dateCreated': {'time': int(time.time() * 1000)},
+        }
+
+    def _create_quickmix_station(self, stations):
+        station = self._create_station('QuickMix')
+        station.update({
+            'allowDelete': False,
+            'allowRename': False,
+            'isQuickMix': True,
+            'quickMixStationIds': [s['stationId'] for s in stations],
+        })
+        return station
+
+    def _create_track(self, station_id):
+        with self._lock:
+            self._track_count += 1
+            track_count = self._track_count
+
+        track_token = 'T{:032d}'.format(track_count)
+        return {
+            'trackToken': track_token,
+            'songName': 'Fake Track {:d}'.format(track_count),
+            'artistName': 'Fake Artist {:d}'.format(track_count % 10),
+            'albumName': 'Fake Album {:d}'.format(track_count % 20),
+            'albumArtUrl': None,
+            'songDetailUrl': None,
+            'stationId': station_id,
+            'songRating': 0,
+            'trackLength': 180,
+            'adToken': None,
+            'audioUrlMap': dict((quality, {'bitrate': bitrate,
+                                           'encoding': encoding,
+                                           'audioUrl': self.audio_url(track_token, quality),
+                                           'protocol': 'http'})
+                                for quality, (bitrate, encoding) in AUDIO_QUALITIES.items()),
+        }
+
+    def _find_station(self, station_token):
+        for station in self.stations:
+            if station['stationToken'] == station_token:
+                return station
+        raise APIError(STATION_DOES_NOT_EXIST, 'Station does not exist: {}'.format(station_token))
+
+    def _checksum(self):
+        return hashlib.md5(''.join(s['stationId'] for s in self.stations).encode('utf-8')).hexdigest()
+
+    # API methods
+
+    def _auth_partnerLogin(self, data):  # noqa: N802
+        if data.get('username') is None:
+            raise APIError(INVALID_PARTNER_LOGIN, 'Invalid partner login.')
+        with self._lock:
+            self._partner_auth_token = 'partner_{:f}'.format(time.time())
+        return {
+            'partnerId': '42',
+            'partnerAuthToken': self._partner_auth_token,
+            'syncTime': self.encrypt_sync_time(int(time.time())),
+        }
+
+    def _auth_userLogin(self, data):  # noqa: N802
+        if data.get('username') is None:
+            raise APIError(INVALID_PARTNER_LOGIN, 'Invalid user login.')
+        with self._lock:
+            self._user_auth_token = 'user_{:f}'.format(time.time())
+        return {
+            'userId': '4242',
+            'userAuthToken': self._user_auth_token,
+        }
+
+    def _user_getStationList(self, data):  # noqa: N802
+        return {'stations': list(self.stations), 'checksum': self._checksum()}
+
+    def _user_getStationListChecksum(self, data):  # noqa: N802
+        return {'checksum': self._checksum()}
+
+    def _station_getGenreStations(self, data):  # noqa: N802
+        return {'categories': self.genre_categories}
+
+    def _station_getGenreStationsChecksum(self, data):  # noqa: N802
+        return {'checksum': hashlib.md5(json.dumps(self.genre_categories).encode('utf-8')).hexdigest()}
+
+    def _station_getStation(self, data):  # noqa: N802
+        return self._find_station(data.get('stationToken'))
+
+    def _station_getPlaylist(self, data):  # noqa: N802
+        station = self._find_station(data.get('stationToken'))
+        items = []
+        for i in range(self.playlist_size):
+            items.append(self._create_track(station['stationId']))
+            if self.ad_interval and (i + 1) % self.ad_interval == 0:
+                items.append({'adToken': 'A{:d}-none'.format(self._track_count)})
+        return {'items': items}
+
+    def _ad_getAdMetadata(self, data):  # noqa: N802
+        track = self._create_track(None)
+        return {
+            'title': 'Fake Advertisement',
+            'companyName': 'Fake Company',
+            'clickThroughUrl': None,
+            'imageUrl': None,
+            'trackGain': '0.0',
+            'audioUrlMap': track['audioUrlMap'],
+            'adTrackingTokens': [data.get('adToken')],
+        }
+
+    def _ad_registerAd(self, data):  # noqa: N802
+        return {}
+
+    def _station_addFeedback(self, data):  # noqa: N802
+        with self._lock:
+            self.feedback.append((data.get('trackToken'), data.get('isPositive')))
+        return {'feedbackId': str(len(self.feedback)), 'isPositive': data.get('isPositive')}
+
+    def _station_deleteFeedback(self, data):  # noqa: N802
+        return {}
+
+    def _user_sleepSong(self, data):  # noqa: N802
+        return {}
+
+    def _bookmark_addArtistBookmark(self, data):  # noqa: N802
+        return {}
+
+    def _bookmark_addSongBookmark(self, data):  # noqa: N802
+        return {}
+
+    def _music_search(self, data):
+        text = data.get('searchText', '')
+        return {
+            'nearMatchesAvailable': False,
+            'explanation': '',
+            'songs': [{'songName': '{} Song'.format(text), 'artistName': '{} Artist'.format(text),
+                       'musicToken': 'S{:d}'.format(len(text)), 'score': 100}],
+            'artists': [{'artistName': '{} Artist'.format(text), 'musicToken': 'R{:d}'.format(len(text)),
+                         'likelyMatch': True, 'score': 100}],
+            'genreStations': [{'stationName': '{} Genre'.format(text), 'musicToken': 'G{:d}'.format(len(text)),
+                               'score': 100}],
+        }
+
+    def _station_createStation(self, data):  # noqa: N802
+        token = data.get('musicToken') or data.get('trackToken')
+        if not token:
+            raise APIError(9, 'Parameter missing.')
+        station = self._create_station('Fake Station {}'.format(token))
+        with self._lock:
+            self.stations.append(station)
+        return station
+
+    def _station_deleteStation(self, data):  # noqa: N802
+        station = self._find_station(data.get('stationToken'))
+        with self._lock:
+            self.stations.remove(station)
+        return {}
+
+
+class APIError(Exception):
+
+    def __init__(self, code, message):
+        super(APIError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def tuner(self):
+        return self.server.tuner
+
+    def do_POST(self):  # noqa: N802
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('ascii')
+        if url.path != API_PATH:
+            return self._send(404, b'')
+
+        params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        method = params.get('method')
+        with self.tuner._lock:
+            self.tuner.requests[method] += 1
+
+        self.tuner.delay()
+        fault = self.tuner.get_fault(method)
+        if fault == DISCONNECT:
+            self.close_connection = True
+            return
+        if fault == HTTP_ERROR:
+            return self._send(500, b'Internal Server Error')
+
+        try:
+            if fault is not None:
+                raise APIError(fault, 'Injected fault.')
+            data = json.loads(body) if method == 'auth.partnerLogin' else self.tuner.decrypt(body)
+            response = {'stat': 'ok', 'result': self.tuner.handle_api_call(method, params, data)}
+        except APIError as e:
+            response = {'stat': 'fail', 'code': e.code, 'message': e.message}
+        except Exception as e:
+            response = {'stat': 'fail', 'code': INTERNAL_SERVER_ERROR, 'message': str(e)}
+
+        self._send(200, json.dumps(response).encode('utf-8'), 'application/json')
+
+    def do_HEAD(self):  # noqa: N802
+        self._send_audio(head=True)
+
+    def do_GET(self):  # noqa: N802
+        self._send_audio()
+
+    def _send_audio(self, head=False):
+        url = urlparse(self.path)
+        if not url.path.startswith(AUDIO_PATH):
+            return self._send(404, b'')
+
+        with self.tuner._lock:
+            self.tuner.audio_requests[url.path] += 1
+        self.tuner.delay()
+
+        data = self.tuner.audio_data(url.path)
+        status = 200
+        headers = {'Accept-Ranges': 'bytes'}
+        byte_range = self.headers.get('Range')
+        if byte_range and byte_range.startswith('bytes='):
+            start, _, end = byte_range[len('bytes='):].partition('-')
+            start = int(start or 0)
+            end = min(int(end) if end else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                return self._send(416, b'', headers={'Content-Range': 'bytes */{:d}'.format(len(data))})
+            headers['Content-Range'] = 'bytes {:d}-{:d}/{:d}'.format(start, end, len(data))
+            data = data[start:end + 1]
+            status = 206
+
+        self._send(status, data, 'audio/mpeg', headers=headers, head=head)
+
+    def _send(self, status, body, content_type='text/plain', headers=None, head=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+def _blowfish(key):
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return Blowfish.new(key, Blowfish.MODE_ECB)
@@ -0,0 +1,124 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+
+import mock
+
+import requests
+
+from mopidy_pandora.audiocache import AudioCache
+
+
+def response_mock(data, chunk_size=4):
+    response = mock.Mock(spec=requests.Response)
+    response.iter_content.return_value = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    return response
+
+
+def open_url_mock(responses):
+    return mock.Mock(side_effect=lambda url: response_mock(responses[url]))
+
+
+def test_init_clears_cache_directory(tmpdir):
+    tmpdir.join('audio').ensure('stale_file')
+    AudioCache(str(tmpdir.join('audio')), 100, mock.Mock())
+
+    assert tmpdir.join('audio').check(dir=True)
+    assert tmpdir.join('audio').listdir() == []
+
+
+def test_prefetch_downloads_audio(tmpdir):
+    cache = AudioCache(str(tmpdir), 100, open_url_mock({'url_a': b'audio_data_a'}))
+
+    cache.prefetch('a', 'url_a').join()
+
+    assert 'a' in cache
+    assert cache.currsize == len(b'audio_data_a')
+    uri = cache.get_uri('a')
+    assert uri.startswith('file://')
+    with open(cache._get_file_path('a'), 'rb') as f:
+        assert f.read() == b'audio_data_a'
+
+
+def test_prefetch_ignores_cached_tracks(tmpdir):
+    open_url = open_url_mock({'url_a': b'audio_data_a'})
+    cache = AudioCache(str(tmpdir), 100, open_url)
+
+    cache.prefetch('a', 'url_a').join()
+    assert cache.prefetch('a', 'url_a') is None
+    assert open_url.call_count == 1
+
+
+def test_get_uri_returns_none_for_missing_tracks(tmpdir):
+    cache = AudioCache(str(tmpdir), 100, mock.Mock())
+
+    assert cache.get_uri('a') is None
+    assert cache.misses == 1
+
+
+def test_least_recently_used_files_are_evicted(tmpdir):
+    cache = AudioCache(str(tmpdir), 20, open_url_mock({'url_a': b'a' * 8, 'url_b': b'b' * 8, 'url_c': b'c' * 8}))
+
+    cache.prefetch('a', 'url_a').join()
+    cache.prefetch('b', 'url_b').join()
+    assert cache.get_uri('a') is not None
+    cache.prefetch('c', 'url_c').join()
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert cache.currsize == 16
+    assert cache.evictions == 1
+    assert not os.path.exists(cache._get_file_path('b'))
+
+
+def test_pinned_files_are_not_evicted(tmpdir):
+    cache = AudioCache(str(tmpdir), 20, open_url_mock({'url_a': b'a' * 8, 'url_b': b'b' * 8, 'url_c': b'c' * 8}))
+
+    cache.pin('a')
+    cache.prefetch('a', 'url_a').join()
+    cache.prefetch('b', 'url_b').join()
+    cache.prefetch('c', 'url_c').join()
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.get_uri('a') is not None
+
+    cache.unpin('a')
+    cache.get_uri('c')
+    cache.prefetch('b', 'url_b').join()
+
+    assert 'a' not in cache
+    assert not os.path.exists(cache._get_file_path('a'))
+
+
+def test_prefetch_handles_request_exceptions(tmpdir, caplog):
+    cache = AudioCache(str(tmpdir), 100, mock.Mock(side_effect=requests.exceptions.ConnectionError('error_mock')))
+
+    cache.prefetch('a', 'url_a').join()
+
+    assert 'a' not in cache
+    assert cache.errors == 1
+    assert cache.stats['downloading'] == 0
+    assert "Error caching audio for Pandora track 'a'" in caplog.text()
+
+
+def test_prefetch_discards_files_larger_than_cache(tmpdir):
+    cache = AudioCache(str(tmpdir), 10, open_url_mock({'url_a': b'a' * 20}))
+
+    cache.prefetch('a', 'url_a').join()
+
+    assert 'a' not in cache
+    assert cache.errors == 1
+    assert tmpdir.listdir() == []
+
+
+def test_prefetch_reports_transfer(tmpdir):
+    on_transfer = mock.Mock()
+    cache = AudioCache(str(tmpdir), 100, open_url_mock({'url_a': b'audio_data_a'}), on_transfer=on_transfer)
+
+    cache.prefetch('a', 'url_a').join()
+
+    assert on_transfer.call_count == 1
+    assert on_transfer.call_args[0][0] == len(b'audio_data_a')
+    assert on_transfer.call_args[1]['ttfb'] >= 0
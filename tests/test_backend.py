@@ -1,5 +1,7 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import os
+
 import mock
 
 from mopidy import backend as backend_api
@@ -8,10 +10,15 @@ from mopidy import models
 from pandora import APIClient, BaseAPIClient
 from pandora.errors import PandoraException
 
-from mopidy_pandora import client, library, playback
+from mopidy_pandora import Extension, client, library, playback
+from mopidy_pandora.audiocache import AudioCache
 from mopidy_pandora.backend import PandoraBackend
-from mopidy_pandora.library import PandoraLibraryProvider
-from tests.conftest import get_backend
+from mopidy_pandora.client import DeadlineExceeded
+from mopidy_pandora.library import PandoraLibraryProvider, TrackCacheItem
+from mopidy_pandora.proxy import AudioProxy
+from mopidy_pandora.uri import PandoraUri
+from tests import conftest
+from tests.conftest import ThreadJoiner, get_backend, request_exception_mock
 
 
 def test_uri_schemes(config):
@@ -40,6 +47,171 @@ def test_end_of_tracklist_reached_prepares_next_track(config):
     backend.prepare_next_track.assert_called_with('id_token_mock', False)
 
 
+def test_queued_tracks_changed_pins_tracks_in_cache(config):
+    backend = get_backend(config)
+
+    backend.queued_tracks_changed(['pandora:track:id_token_mock:id_token_mock'])
+    assert backend.library.pandora_track_cache.is_pinned('pandora:track:id_token_mock:id_token_mock')
+
+    backend.queued_tracks_changed([])
+    assert not backend.library.pandora_track_cache.is_pinned('pandora:track:id_token_mock:id_token_mock')
+
+
+def test_init_creates_audio_cache(config, tmpdir):
+    config['pandora']['audio_cache_size'] = 5
+    with mock.patch.object(Extension, 'get_cache_dir', return_value=str(tmpdir)):
+        backend = get_backend(config)
+
+    assert backend.audio_cache.path == str(tmpdir.join('audio'))
+    assert backend.audio_cache.maxsize == 5 * 1024 * 1024
+    assert 'audio_cache' in backend.get_metrics()
+
+
+def test_init_audio_cache_disabled_by_default(config):
+    backend = get_backend(config)
+
+    assert backend.audio_cache is None
+    assert 'audio_cache' not in backend.get_metrics()
+
+
+def test_audio_proxy_is_started_and_stopped_with_backend(config, tmpdir):
+    config['pandora']['audio_proxy_cache_size'] = 5
+    with mock.patch.object(Extension, 'get_cache_dir', return_value=str(tmpdir)):
+        backend = get_backend(config)
+
+    assert backend.audio_proxy.path == str(tmpdir.join('proxy'))
+    assert backend.audio_proxy.maxsize == 5 * 1024 * 1024
+    assert backend.audio_proxy.ring_buffer is None
+
+    with mock.patch.object(AudioProxy, 'start') as start_mock, mock.patch.object(AudioProxy, 'stop') as stop_mock:
+        backend.api.login = mock.Mock()
+        backend.on_start()
+        assert start_mock.called
+
+        backend.on_stop()
+        assert stop_mock.called
+    assert 'audio_proxy' in backend.get_metrics()
+
+
+def test_init_creates_audio_ring_buffer(config, tmpdir):
+    config['pandora']['audio_proxy_cache_size'] = 5
+    config['pandora']['audio_ring_buffer_size'] = 2
+    with mock.patch.object(Extension, 'get_cache_dir', return_value=str(tmpdir)):
+        backend = get_backend(config)
+
+    assert backend.audio_proxy.ring_buffer.size == 2 * 1024 * 1024
+    assert 'ring_buffer' in backend.get_metrics()['audio_proxy']
+
+
+def test_init_creates_adaptive_quality_selector(config):
+    config['pandora']['preferred_audio_quality'] = 'adaptive'
+    backend = get_backend(config)
+
+    assert backend.quality_selector.quality == BaseAPIClient.MED_AUDIO_QUALITY
+    assert backend.api.default_audio_quality == BaseAPIClient.MED_AUDIO_QUALITY
+    assert backend.get_metrics()['audio_quality']['quality'] == BaseAPIClient.MED_AUDIO_QUALITY
+
+
+def test_init_does_not_create_quality_selector_for_fixed_quality(config):
+    backend = get_backend(config)
+
+    assert backend.quality_selector is None
+    assert 'audio_quality' not in backend.get_metrics()
+
+
+def test_queued_tracks_changed_prefetches_audio(config, playlist_item_mock):
+    backend = get_backend(config)
+    backend.audio_cache = mock.Mock(spec=AudioCache)
+    track_uri = PandoraUri.factory(playlist_item_mock).uri
+    backend.library.pandora_track_cache[track_uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                    playlist_item_mock)
+
+    backend.queued_tracks_changed([track_uri, 'pandora:track:id_token_mock:unknown_mock'])
+    backend.audio_cache.prefetch.assert_called_once_with(track_uri, conftest.MOCK_TRACK_AUDIO_HIGH)
+
+
+def test_prefetch_audio_skips_current_track(config, playlist_item_mock):
+    backend = get_backend(config)
+    backend.audio_cache = mock.Mock(spec=AudioCache)
+    track_uri = PandoraUri.factory(playlist_item_mock).uri
+    backend.library.pandora_track_cache[track_uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                    playlist_item_mock)
+    backend.playback._current_track_uri = track_uri
+
+    backend.prefetch_audio([track_uri])
+    assert not backend.audio_cache.prefetch.called
+
+
+def test_track_playback_started_invalidates_expiring_tracks(config):
+    backend = get_backend(config)
+    current = models.Track(uri='pandora:track:id_token_mock:current_mock', length=60000)
+
+    backend.library.pandora_track_cache.set_queued([current.uri, 'pandora:track:id_token_mock:next_mock'])
+    backend.library.is_track_expired = mock.Mock(return_value=True)
+    backend._trigger_track_invalidated = mock.Mock()
+
+    backend.track_playback_started(models.TlTrack(tlid=1, track=current))
+
+    backend.library.is_track_expired.assert_called_once_with('pandora:track:id_token_mock:next_mock', 60)
+    backend._trigger_track_invalidated.assert_called_once_with('pandora:track:id_token_mock:next_mock')
+
+
+def test_track_playback_resumed_uses_remaining_time_as_margin(config):
+    backend = get_backend(config)
+    current = models.Track(uri='pandora:track:id_token_mock:current_mock', length=60000)
+
+    backend.library.pandora_track_cache.set_queued([current.uri, 'pandora:track:id_token_mock:next_mock'])
+    backend.library.is_track_expired = mock.Mock(return_value=False)
+    backend._trigger_track_invalidated = mock.Mock()
+
+    backend.track_playback_resumed(models.TlTrack(tlid=1, track=current), 45000)
+
+    backend.library.is_track_expired.assert_called_once_with('pandora:track:id_token_mock:next_mock', 15)
+    assert not backend._trigger_track_invalidated.called
+
+
+def test_track_playback_started_prepares_upcoming_tracks(config):
+    backend = get_backend(config)
+    current = models.Track(uri='pandora:track:id_token_mock:current_mock', length=60000)
+
+    backend.prepare_upcoming_tracks = mock.Mock()
+    backend.track_playback_started(models.TlTrack(tlid=1, track=current))
+
+    backend.prepare_upcoming_tracks.assert_called_once_with(current.uri)
+
+
+def test_prepare_upcoming_tracks_probes_queued_tracks(config):
+    backend = get_backend(config)
+
+    backend.library.pandora_track_cache.set_queued(['pandora:track:id_token_mock:current_mock',
+                                                    'pandora:track:id_token_mock:next_mock'])
+    backend.probe_track_playability = mock.Mock()
+
+    backend.prepare_upcoming_tracks('pandora:track:id_token_mock:current_mock')
+    backend.probe_track_playability.assert_called_once_with('pandora:track:id_token_mock:next_mock')
+
+
+def test_prepare_upcoming_tracks_does_nothing_if_disabled(config):
+    config['pandora']['playability_cache_ttl'] = 0
+    backend = get_backend(config)
+
+    backend.library.pandora_track_cache.set_queued(['pandora:track:id_token_mock:next_mock'])
+    backend.probe_track_playability = mock.Mock()
+
+    backend.prepare_upcoming_tracks()
+    assert not backend.probe_track_playability.called
+
+
+def test_invalidate_expiring_tracks_ignores_non_pandora_tracks(config):
+    backend = get_backend(config)
+
+    backend.library.pandora_track_cache.set_queued(['pandora:track:id_token_mock:next_mock'])
+    backend.library.is_track_expired = mock.Mock(return_value=True)
+
+    backend.invalidate_expiring_tracks('mock:track:id_mock:token_mock', 60000)
+    assert not backend.library.is_track_expired.called
+
+
 def test_event_triggered_processes_event(config):
     backend = get_backend(config)
 
@@ -65,6 +237,56 @@ def test_on_start_logs_in(config):
     backend.api.login.assert_called_once_with('john', 'smith')
 
 
+def test_on_start_revalidates_snapshot(config):
+    backend = get_backend(config)
+
+    backend.api.login = mock.Mock()
+    backend.api.load_snapshot = mock.Mock(return_value=True)
+    backend.api.revalidate_snapshot = mock.Mock()
+    with ThreadJoiner(timeout=1.0):
+        backend.on_start()
+
+    assert backend.api.load_snapshot.called
+    assert backend.api.revalidate_snapshot.called
+
+
+def test_init_configures_snapshot_path(config, tmpdir):
+    config['core'] = {'cache_dir': str(tmpdir)}
+    config['pandora']['persist_station_lists'] = True
+    backend = get_backend(config)
+
+    assert backend.api.snapshot.path == os.path.join(str(tmpdir), 'pandora', 'station_lists.json')
+
+
+def test_on_start_starts_metrics_logger(config):
+    config['pandora']['metrics_log_interval'] = 60
+    backend = get_backend(config)
+
+    backend.api.login = mock.Mock()
+    backend.metrics_logger = mock.Mock()
+    backend.on_start()
+    assert backend.metrics_logger.start.called
+
+    backend.on_stop()
+    assert backend.metrics_logger.stop.called
+
+
+def test_init_disables_metrics_logger_by_default(config):
+    backend = get_backend(config)
+
+    assert backend.metrics_logger is None
+
+
+def test_get_metrics_includes_playlist_stats(config):
+    backend = get_backend(config)
+
+    metrics = backend.get_metrics()
+    assert metrics['playlists'] == {}
+    assert metrics['track_cache']['size'] == 0
+    assert 'calls' in metrics
+    assert 'cache' in metrics
+
+
 def test_prepare_next_track_triggers_event(config):
     with mock.patch.object(PandoraLibraryProvider,
                            'get_next_pandora_track',
@@ -81,6 +303,99 @@ def test_prepare_next_track_triggers_event(config):
         backend._trigger_next_track_available.assert_called_with(track, False)
 
 
+def test_prepare_next_track_probes_playability(config):
+    with mock.patch.object(PandoraLibraryProvider,
+                           'get_next_pandora_track',
+                           mock.Mock()) as get_next_pandora_track_mock:
+        track = models.Ref.track(name='name_mock', uri='pandora:track:id_token_mock:id_token_mock')
+        get_next_pandora_track_mock.return_value = track
+
+        backend = get_backend(config)
+        backend._trigger_next_track_available = mock.Mock()
+        backend.probe_track_playability = mock.Mock()
+
+        backend.prepare_next_track('id_token_mock')
+        backend.probe_track_playability.assert_called_once_with(track.uri)
+
+
+def test_prepare_next_track_does_not_probe_playability_if_disabled(config):
+    config['pandora']['playability_cache_ttl'] = 0
+    with mock.patch.object(PandoraLibraryProvider,
+                           'get_next_pandora_track',
+                           mock.Mock()) as get_next_pandora_track_mock:
+        get_next_pandora_track_mock.return_value = models.Ref.track(name='name_mock',
+                                                                    uri='pandora:track:id_token_mock:id_token_mock')
+
+        backend = get_backend(config)
+        backend._trigger_next_track_available = mock.Mock()
+        backend.probe_track_playability = mock.Mock()
+
+        backend.prepare_next_track('id_token_mock')
+        assert not backend.probe_track_playability.called
+
+
+def test_probe_track_playability_runs_checks_on_scheduler(config):
+    backend = get_backend(config)
+    backend._probe_scheduler = mock.Mock()
+
+    assert backend.probe_track_playability('pandora:track:id_token_mock:id_token_mock') is True
+    backend._probe_scheduler.call_soon.assert_called_once_with(backend._probe_track_playability,
+                                                               'pandora:track:id_token_mock:id_token_mock')
+
+
+def test_probe_track_playability_skips_pending_and_cached_tracks(config):
+    backend = get_backend(config)
+    backend._probe_scheduler = mock.Mock()
+
+    assert backend.probe_track_playability('pandora:track:id_token_mock:pending_mock') is True
+    assert backend.probe_track_playability('pandora:track:id_token_mock:pending_mock') is False
+
+    backend.library._playability_cache['pandora:track:id_token_mock:cached_mock'] = True
+    assert backend.probe_track_playability('pandora:track:id_token_mock:cached_mock') is False
+
+    assert backend._probe_scheduler.call_soon.call_count == 1
+
+
+def test_probe_track_playability_can_be_scheduled_again_once_checked(config):
+    with mock.patch.object(PandoraLibraryProvider, 'is_track_playable', return_value=True):
+        backend = get_backend(config)
+        backend._probe_scheduler = mock.Mock()
+
+        backend.probe_track_playability('pandora:track:id_token_mock:id_token_mock')
+        backend._probe_track_playability('pandora:track:id_token_mock:id_token_mock')
+
+        assert backend.probe_track_playability('pandora:track:id_token_mock:id_token_mock') is True
+
+
+def test_probe_track_playability_invalidates_unplayable_tracks(config):
+    with mock.patch.object(PandoraLibraryProvider, 'is_track_playable', return_value=False):
+        backend = get_backend(config)
+        backend._trigger_track_invalidated = mock.Mock()
+
+        backend._probe_track_playability('pandora:track:id_token_mock:id_token_mock')
+        backend._trigger_track_invalidated.assert_called_once_with('pandora:track:id_token_mock:id_token_mock')
+
+
+def test_probe_track_playability_ignores_playable_tracks(config):
+    with mock.patch.object(PandoraLibraryProvider, 'is_track_playable', return_value=True):
+        backend = get_backend(config)
+        backend._trigger_track_invalidated = mock.Mock()
+
+        backend._probe_track_playability('pandora:track:id_token_mock:id_token_mock')
+        assert not backend._trigger_track_invalidated.called
+
+
+def test_probe_track_playability_ignores_request_exceptions(config, caplog):
+    with mock.patch.object(PandoraLibraryProvider, 'is_track_playable', side_effect=request_exception_mock):
+        backend = get_backend(config)
+        backend._trigger_track_invalidated = mock.Mock()
+
+        backend._probe_track_playability('pandora:track:id_token_mock:id_token_mock')
+        assert not backend._trigger_track_invalidated.called
+        assert ("Error checking if Pandora track 'pandora:track:id_token_mock:id_token_mock' is playable"
+                in caplog.text())
+
+
 def test_process_event_calls_method(config, caplog):
     with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', mock.Mock()):
         with mock.patch.object(APIClient, '__call__', mock.Mock()) as mock_call:
@@ -120,3 +435,19 @@ def test_process_event_handles_pandora_exception(config, caplog):
             assert not backend._trigger_event_processed.called
 
             assert 'Error calling Pandora event: thumbs_up.' in caplog.text()
+
+
+def test_process_event_handles_deadline_exceeded(config, caplog):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', mock.Mock()):
+        with mock.patch.object(PandoraBackend, 'thumbs_up', mock.Mock()) as mock_call:
+
+            backend = get_backend(config)
+            uri_mock = 'pandora:track:id_token_mock:id_token_mock'
+            backend._trigger_event_processed = mock.Mock()
+            mock_call.side_effect = DeadlineExceeded('feedback', 5)
+
+            assert not backend.process_event(uri_mock, 'thumbs_up')
+            assert not backend._trigger_event_processed.called
+
+            assert 'Error calling Pandora event: thumbs_up. Could not reach the Pandora server' in caplog.text()
+            assert 'Traceback' not in caplog.text()
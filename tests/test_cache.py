@@ -0,0 +1,113 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+
+from mopidy_pandora.cache import TrackCache
+
+
+def test_getitem_marks_item_as_recently_used():
+    cache = TrackCache(maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+
+    assert cache['a'] == 1
+    cache['c'] = 3
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.evictions == 1
+
+
+def test_getitem_raises_key_error_for_missing_items():
+    cache = TrackCache(maxsize=2)
+
+    with pytest.raises(KeyError):
+        cache['a']
+    assert cache.get('a') is None
+    assert cache.misses == 2
+
+
+def test_pinned_items_are_not_evicted():
+    cache = TrackCache(maxsize=2)
+    cache['a'] = 1
+    cache.pin('a')
+    cache['b'] = 2
+    cache['c'] = 3
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_cache_grows_beyond_maxsize_if_all_items_are_pinned():
+    cache = TrackCache(maxsize=1)
+    cache.pin('a')
+    cache.pin('b')
+    cache['a'] = 1
+    cache['b'] = 2
+
+    assert len(cache) == 2
+
+    cache.unpin('a')
+    assert 'a' not in cache
+    assert len(cache) == 1
+
+
+def test_pins_are_reference_counted():
+    cache = TrackCache(maxsize=1)
+    cache['a'] = 1
+    cache.pin('a')
+    cache.pin('a')
+
+    cache.unpin('a')
+    cache['b'] = 2
+    assert 'a' in cache
+
+    cache.unpin('a')
+    cache['c'] = 3
+    assert 'a' not in cache
+
+
+def test_set_queued_pins_queued_items_and_releases_removed_items():
+    cache = TrackCache(maxsize=1)
+    cache.set_queued(['a', 'b'])
+    cache['a'] = 1
+    cache['b'] = 2
+
+    assert cache.is_pinned('a')
+    assert len(cache) == 2
+
+    cache.set_queued(['b'])
+    assert not cache.is_pinned('a')
+    assert 'a' not in cache
+    assert 'b' in cache
+
+
+def test_set_queued_retains_explicit_pins():
+    cache = TrackCache(maxsize=1)
+    cache.pin('a')
+    cache.set_queued(['a'])
+    cache.set_queued([])
+
+    assert cache.is_pinned('a')
+
+
+def test_stats():
+    cache = TrackCache(maxsize=1)
+    cache.set_queued(['a'])
+    cache['a'] = 1
+    cache['b'] = 2
+    cache['c'] = 3
+    cache['a']
+
+    assert cache.stats == {'size': 2, 'maxsize': 1, 'pinned': 1, 'hits': 1, 'misses': 0, 'evictions': 1}
+    assert 'c' in cache
+
+
+def test_setitem_does_not_evict_new_item():
+    cache = TrackCache(maxsize=1)
+    cache.pin('a')
+    cache['a'] = 1
+    cache['b'] = 2
+
+    assert 'b' in cache
@@ -1,15 +1,22 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import threading
 import time
 
 import mock
 
 from pandora import APIClient
+from pandora.errors import PandoraException, StationDoesNotExist
 from pandora.models.pandora import GenreStationList, StationList
 
 import pytest
 
-from mopidy_pandora.client import MopidyAPIClient
+import requests
+
+from mopidy_pandora.client import DeadlineExceeded, MopidyAPIClient, MopidyAPITransport, PlaylistRateLimiter, \
+    PooledSession
+from mopidy_pandora.snapshot import StationListSnapshot
+from mopidy_pandora.utils import CircuitOpenError, RateLimitExceeded
 
 from . import conftest
 
@@ -215,3 +222,566 @@ def test_create_genre_station_invalidates_cache(config):
             backend.library._create_station_for_token('test_token')
             assert t not in list(backend.api.station_list_cache)
             assert backend.api.station_list_cache.currsize == 1
+
+
+def test_get_station_list_saves_snapshot(config, tmpdir):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        backend = conftest.get_backend(config)
+        backend.api.snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+
+        backend.api.get_station_list()
+
+        station_list, _ = backend.api.snapshot.load(backend.api)
+        assert station_list.checksum == conftest.MOCK_STATION_LIST_CHECKSUM
+
+
+def test_load_snapshot_populates_caches(config, tmpdir):
+    with mock.patch.object(APIClient, 'get_genre_stations', conftest.get_genre_stations_mock):
+        snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+        snapshot.save(station_list=conftest.get_station_list_mock(None),
+                      genre_stations=conftest.get_genre_stations_mock(None))
+
+        backend = conftest.get_backend(config)
+        backend.api.snapshot = snapshot
+
+        assert backend.api.load_snapshot() is True
+        assert backend.api.station_list_cache.currsize == 1
+        assert backend.api.genre_stations_cache.currsize == 1
+        # Served from the snapshot, does not require a call to the Pandora server.
+        assert backend.api.get_station_list().checksum == conftest.MOCK_STATION_LIST_CHECKSUM
+
+
+def test_load_snapshot_cache_disabled(config, tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+    snapshot.save(station_list=conftest.get_station_list_mock(None))
+
+    config['pandora']['cache_time_to_live'] = 0
+    backend = conftest.get_backend(config)
+    backend.api.snapshot = snapshot
+
+    assert backend.api.load_snapshot() is False
+    assert backend.api.station_list_cache.currsize == 0
+
+
+def test_revalidate_snapshot_refreshes_changed_lists(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        with mock.patch.object(APIClient, 'get_genre_stations', conftest.get_genre_stations_mock):
+            with mock.patch.object(StationList, 'has_changed', return_value=True):
+                backend = conftest.get_backend(config)
+                t = time.time()
+                backend.api.station_list_cache[t] = mock.Mock(spec=StationList)
+                backend.api.genre_stations_cache[t] = mock.Mock(spec=GenreStationList)
+
+                backend.api.revalidate_snapshot()
+
+                assert t not in list(backend.api.station_list_cache)
+                assert t not in list(backend.api.genre_stations_cache)
+
+
+def test_get_station_list_returns_stale_list_while_revalidating(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        config['pandora']['cache_max_staleness'] = 3600
+        backend = conftest.get_backend(config)
+
+        stale_list = mock.Mock(spec=StationList)
+        backend.api.station_list_stale_cache[time.time()] = stale_list
+
+        with conftest.ThreadJoiner(timeout=1.0):
+            assert backend.api.get_station_list() is stale_list
+
+        # Replaced in the background
+        assert backend.api.get_station_list().checksum == conftest.MOCK_STATION_LIST_CHECKSUM
+
+
+def test_get_station_list_force_refresh_revalidates_in_background(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        with mock.patch.object(StationList, 'has_changed', return_value=True):
+            config['pandora']['cache_max_staleness'] = 3600
+            backend = conftest.get_backend(config)
+
+            cached_list = StationList.from_json(APIClient, conftest.station_list_result_mock())
+            cached_list.checksum = 'zz00aa00aa00aa00aa00aa00aa00aa99'
+            backend.api.station_list_cache[time.time()] = cached_list
+
+            with conftest.ThreadJoiner(timeout=1.0):
+                assert backend.api.get_station_list(force_refresh=True) is cached_list
+
+            assert backend.api.get_station_list().checksum == conftest.MOCK_STATION_LIST_CHECKSUM
+
+
+def test_get_station_list_waits_if_no_stale_list_available(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        config['pandora']['cache_max_staleness'] = 3600
+        backend = conftest.get_backend(config)
+
+        assert backend.api.get_station_list().checksum == conftest.MOCK_STATION_LIST_CHECKSUM
+        assert backend.api.station_list_stale_cache.currsize == 1
+
+
+def test_get_genre_stations_returns_stale_list_while_revalidating(config):
+    with mock.patch.object(APIClient, 'get_genre_stations', conftest.get_genre_stations_mock):
+        config['pandora']['cache_max_staleness'] = 3600
+        backend = conftest.get_backend(config)
+
+        stale_list = mock.Mock(spec=GenreStationList)
+        backend.api.genre_stations_stale_cache[time.time()] = stale_list
+
+        with conftest.ThreadJoiner(timeout=1.0):
+            assert backend.api.get_genre_stations() is stale_list
+
+        assert 'Category mock' in list(backend.api.get_genre_stations())
+
+
+def test_revalidate_async_only_starts_one_refresh(config):
+    config['pandora']['cache_max_staleness'] = 3600
+    backend = conftest.get_backend(config)
+
+    backend.api._revalidate = mock.Mock()
+    backend.api._revalidate_async(backend.api._refresh_station_list, False)
+    backend.api._revalidating.add('_refresh_station_list')
+    backend.api._revalidate_async(backend.api._refresh_station_list, False)
+
+    assert backend.api._revalidate.call_count == 1
+
+
+def test_delete_station_invalidates_station_list(config):
+    with mock.patch.object(APIClient, 'delete_station', mock.Mock()):
+        backend = conftest.get_backend(config)
+        t = time.time()
+        backend.api.station_list_cache[t] = mock.Mock(spec=StationList)
+        backend.api.station_list_stale_cache[t] = mock.Mock(spec=StationList)
+
+        backend.api.delete_station(conftest.MOCK_STATION_TOKEN)
+
+        assert backend.api.station_list_cache.currsize == 0
+        assert backend.api.station_list_stale_cache.currsize == 0
+
+
+def test_get_station_list_coalesces_concurrent_requests(config):
+    release = threading.Event()
+    get_station_list_mock = mock.Mock(side_effect=lambda: release.wait(1.0) and
+                                      conftest.get_station_list_mock(None))
+
+    with mock.patch.object(APIClient, 'get_station_list', get_station_list_mock):
+        backend = conftest.get_backend(config)
+
+        threads = [threading.Thread(target=backend.api.get_station_list) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(1.0)
+
+        assert get_station_list_mock.call_count == 1
+        assert backend.api.station_list_cache.currsize == 1
+
+
+def test_get_invalid_station_coalesces_concurrent_requests(config):
+    release = threading.Event()
+    get_station_mock = mock.Mock(side_effect=lambda station_token: release.wait(1.0) and conftest.station_mock())
+
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        with mock.patch.object(APIClient, 'get_station', get_station_mock):
+            backend = conftest.get_backend(config)
+            backend.api.get_station_list()
+
+            threads = [threading.Thread(target=backend.api.get_station, args=('9999999999999999999',))
+                       for _ in range(3)]
+            for t in threads:
+                t.start()
+            time.sleep(0.1)
+            release.set()
+            for t in threads:
+                t.join(1.0)
+
+            assert get_station_mock.call_count == 1
+
+
+def test_get_station_index_contains_ids_and_tokens(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        backend = conftest.get_backend(config)
+
+        index = backend.api.get_station_index()
+
+        assert len(index) == len(conftest.station_list_result_mock()['stations'])
+        assert index[conftest.MOCK_STATION_ID].name == conftest.MOCK_STATION_NAME + ' 1'
+        assert index[conftest.MOCK_STATION_TOKEN].name == conftest.MOCK_STATION_NAME + ' 1'
+
+
+def test_get_station_index_only_rebuilt_if_station_list_changes(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        with mock.patch.object(StationList, 'has_changed', return_value=True):
+            backend = conftest.get_backend(config)
+
+            index = backend.api.get_station_index()
+            assert backend.api.get_station_index() is index
+
+            backend.api.get_station_list(force_refresh=True)
+            assert backend.api.get_station_index() is not index
+
+
+def test_get_station_index_not_rebuilt_if_station_list_cannot_be_retrieved(config):
+    with mock.patch.object(APIClient, 'get_station_list', side_effect=requests.exceptions.ConnectionError()):
+        backend = conftest.get_backend(config)
+        backend.api.station_not_found_cache['9999999999999999999'] = StationDoesNotExist('Invalid station')
+
+        index = backend.api.get_station_index()
+        assert backend.api.get_station_index() is index
+        assert '9999999999999999999' in backend.api.station_not_found_cache
+
+
+def test_get_invalid_station_caches_station_does_not_exist(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        error = StationDoesNotExist('Invalid station')
+        with mock.patch.object(APIClient, 'get_station', side_effect=error) as get_mock:
+            backend = conftest.get_backend(config)
+
+            for _ in range(3):
+                with pytest.raises(StationDoesNotExist):
+                    backend.api.get_station('9999999999999999999')
+
+            assert get_mock.call_count == 1
+            assert '9999999999999999999' in backend.api.station_not_found_cache
+            assert backend.api.station_not_found_cache.ttl == MopidyAPIClient.STATION_NOT_FOUND_CACHE_TTL
+
+
+def test_get_invalid_station_does_not_cache_other_pandora_exceptions(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        with mock.patch.object(APIClient, 'get_station', side_effect=PandoraException('Read only mode')) as get_mock:
+            backend = conftest.get_backend(config)
+
+            for _ in range(2):
+                with pytest.raises(PandoraException):
+                    backend.api.get_station('9999999999999999999')
+
+            assert get_mock.call_count == 2
+            assert backend.api.station_not_found_cache.currsize == 0
+
+
+def test_get_invalid_station_does_not_cache_request_exceptions(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        backend = conftest.get_backend(config)
+
+        for _ in range(2):
+            with pytest.raises(conftest.TransportCallTestNotImplemented):
+                backend.api.get_station('9999999999999999999')
+
+        assert backend.api.station_not_found_cache.currsize == 0
+
+
+def test_station_not_found_cache_cleared_when_station_list_changes(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        backend = conftest.get_backend(config)
+        backend.api.get_station_index()
+
+        backend.api.station_not_found_cache['9999999999999999999'] = StationDoesNotExist('Invalid station')
+        backend.api.invalidate_station_list()
+
+        assert backend.api.station_not_found_cache.currsize == 0
+
+
+def test_transport_uses_pooled_session(config):
+    config['pandora']['connection_pool_size'] = 3
+    config['pandora']['connection_pool_maxsize'] = 7
+    backend = conftest.get_backend(config)
+
+    transport = backend.api.transport
+    assert isinstance(transport, MopidyAPITransport)
+    assert isinstance(transport.session, PooledSession)
+    assert transport.session.timeout == (5, 15)
+    assert transport.session.proxies == {'http': 'host_mock:port_mock', 'https': 'host_mock:port_mock'}
+
+    adapter = transport.session.get_adapter('https://tuner.pandora.com')
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 7
+
+
+def test_pooled_session_applies_default_timeout():
+    session = PooledSession(timeout=(1, 2))
+
+    with mock.patch.object(requests.Session, 'request') as request_mock:
+        session.head('http://mockup.com/audio')
+        assert request_mock.call_args[1]['timeout'] == (1, 2)
+
+        session.request('GET', 'http://mockup.com/audio', timeout=10)
+        assert request_mock.call_args[1]['timeout'] == 10
+
+
+def test_test_url_reuses_transport_session(config):
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(PooledSession, 'head') as head_mock:
+        head_mock.return_value.status_code = requests.codes.OK
+
+        assert backend.api.transport.test_url(conftest.MOCK_TRACK_AUDIO_HIGH)
+        head_mock.assert_called_once_with(conftest.MOCK_TRACK_AUDIO_HIGH, timeout=mock.ANY)
+
+
+def test_open_url_streams_using_transport_session(config):
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(PooledSession, 'get') as get_mock:
+        assert backend.api.transport.open_url(conftest.MOCK_TRACK_AUDIO_HIGH) is get_mock.return_value
+        get_mock.assert_called_once_with(conftest.MOCK_TRACK_AUDIO_HIGH, stream=True)
+
+
+def test_transport_applies_deadlines_from_config(config):
+    config['pandora']['playlist_deadline'] = 7
+    backend = conftest.get_backend(config)
+
+    assert backend.api.transport.deadlines['playlist'] == 7
+    assert backend.api.transport.get_operation('station.getPlaylist') == 'playlist'
+    assert backend.api.transport.get_operation('user.getStationList') == 'station_list'
+
+
+def test_deadline_limits_request_timeouts_to_remaining_time(config):
+    config['pandora']['feedback_deadline'] = 2
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with mock.patch.object(PooledSession, 'post') as post_mock:
+        with transport.deadline('feedback'):
+            transport._make_http_request('http://mockup.com/api', '{}', {})
+
+        connect_timeout, read_timeout = post_mock.call_args[1]['timeout']
+        assert 0 < connect_timeout <= 2
+        assert 0 < read_timeout <= 2
+
+        transport._make_http_request('http://mockup.com/api', '{}', {})
+        assert 'timeout' not in post_mock.call_args[1]
+
+
+def test_deadline_nested_uses_outer_deadline(config):
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with transport.deadline('feedback'):
+        outer = transport._local.deadline
+        with transport.deadline('login'):
+            assert transport._local.deadline == outer
+
+    assert transport._local.deadline is None
+
+
+def test_deadline_exceeded_raises_and_counts_timeout(config, caplog):
+    config['pandora']['playlist_deadline'] = 1
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with mock.patch.object(PooledSession, 'post') as post_mock:
+        with pytest.raises(DeadlineExceeded) as exc_info:
+            with transport.deadline('playlist'):
+                transport._local.deadline = ('playlist', time.time() - 1)
+                transport._make_http_request('http://mockup.com/api', '{}', {})
+
+    assert not post_mock.called
+    assert isinstance(exc_info.value, requests.exceptions.Timeout)
+    assert not isinstance(exc_info.value, PandoraException)
+    assert transport.timeouts['playlist'] == 1
+    assert "Pandora 'playlist' request timed out." in caplog.text()
+
+
+def test_deadline_exceeded_counts_single_failure(config):
+    config['pandora']['playlist_deadline'] = 1
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    def slow_post(url, **kwargs):
+        time.sleep(0.1)
+        raise requests.exceptions.ReadTimeout()
+
+    with mock.patch.object(MopidyAPITransport, '_call',
+                           side_effect=lambda method, data: transport._request(slow_post, 'http://mockup.com/api')):
+        with mock.patch.object(time, 'sleep', wraps=time.sleep) as sleep_mock:
+            with pytest.raises(DeadlineExceeded):
+                with transport.deadline('playlist'):
+                    transport._local.deadline = ('playlist', time.time() + 0.05)
+                    transport._execute('station.getPlaylist', {})
+
+    assert sleep_mock.call_count == 1  # Not retried.
+    assert transport.timeouts['playlist'] == 1
+    assert transport.get_circuit_breaker('station.getPlaylist')._failures == 1
+
+
+def test_request_timeout_is_counted_per_operation(config):
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with mock.patch.object(PooledSession, 'head', side_effect=requests.exceptions.ConnectTimeout):
+        with pytest.raises(requests.exceptions.Timeout):
+            transport.test_url(conftest.MOCK_TRACK_AUDIO_HIGH)
+
+    assert transport.timeouts == {'playability': 1}
+
+
+def test_call_applies_deadline_for_operation(config):
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(MopidyAPITransport, 'deadline', wraps=backend.api.transport.deadline) as deadline_mock:
+        with mock.patch.object(APIClient, '__call__', mock.Mock()):
+            backend.api('station.addFeedback', stationToken='token_mock')
+
+        deadline_mock.assert_called_once_with('feedback')
+
+
+def test_transport_retries_idempotent_methods(config):
+    config['pandora']['retry_max_attempts'] = 3
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with mock.patch.object(MopidyAPITransport, '_call',
+                           side_effect=[requests.exceptions.ConnectionError, 'result']) as call_mock:
+        with mock.patch.object(time, 'sleep'):
+            assert transport._execute('user.getStationList', {}) == 'result'
+
+    assert call_mock.call_count == 2
+
+
+def test_transport_does_not_retry_other_methods(config):
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with mock.patch.object(MopidyAPITransport, '_call', side_effect=requests.exceptions.ConnectionError) as call_mock:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            transport._execute('station.createStation', {})
+
+    assert call_mock.call_count == 1
+
+
+def test_transport_does_not_retry_pandora_exceptions(config):
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    with mock.patch.object(MopidyAPITransport, '_call', side_effect=PandoraException('error_mock')) as call_mock:
+        with pytest.raises(PandoraException):
+            transport._execute('user.getStationList', {})
+
+    assert call_mock.call_count == 1
+    assert transport.get_circuit_breaker('user.getStationList').state == 'closed'
+
+
+def test_transport_circuit_breaker_is_per_method(config):
+    config['pandora']['circuit_breaker_threshold'] = 2
+    config['pandora']['circuit_breaker_reset_timeout'] = 60
+    backend = conftest.get_backend(config)
+    transport = backend.api.transport
+
+    circuit_breaker = transport.get_circuit_breaker('user.getStationList')
+    assert circuit_breaker is transport.get_circuit_breaker('user.getStationList')
+    assert circuit_breaker is not transport.get_circuit_breaker('station.getPlaylist')
+    assert circuit_breaker.failure_threshold == 2
+    assert circuit_breaker.reset_timeout == 60
+
+
+def test_get_station_list_serves_stale_list_while_circuit_is_open(config, caplog):
+    config['pandora']['cache_time_to_live'] = 1
+    config['pandora']['cache_max_staleness'] = 60
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        station_list = backend.api.get_station_list()
+
+    backend.api.station_list_cache.clear()
+    with mock.patch.object(APIClient, 'get_station_list', side_effect=CircuitOpenError('open_mock')):
+        assert backend.api._refresh_station_list() is station_list
+
+    assert 'Error retrieving Pandora station list: open_mock' in caplog.text()
+
+
+def test_call_records_metrics(config):
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(APIClient, '__call__', mock.Mock(side_effect=[None, requests.exceptions.Timeout])):
+        backend.api('station.addFeedback', stationToken='token_mock')
+        with pytest.raises(requests.exceptions.Timeout):
+            backend.api('station.addFeedback', stationToken='token_mock')
+
+    call = backend.api.get_metrics()['calls']['station.addFeedback']
+    assert call['count'] == 2
+    assert call['errors_by_type'] == {'Timeout': 1}
+
+
+def test_get_station_list_records_cache_hits_and_misses(config):
+    with mock.patch.object(APIClient, 'get_station_list', conftest.get_station_list_mock):
+        backend = conftest.get_backend(config)
+
+        backend.api.get_station_list()
+        backend.api.get_station_list()
+
+    assert backend.api.get_metrics()['cache']['station_list'] == {'hits': 1, 'misses': 1}
+
+
+def test_get_metrics_includes_timeouts_and_circuit_breakers(config):
+    backend = conftest.get_backend(config)
+
+    backend.api.transport.timeouts['playlist'] += 1
+    backend.api.transport.get_circuit_breaker('station.getPlaylist')
+
+    metrics = backend.api.get_metrics()
+    assert metrics['timeouts'] == {'playlist': 1}
+    assert metrics['circuit_breakers'] == {'station.getPlaylist': 'closed'}
+
+
+def test_call_remembers_audio_url_maps_of_playlist_items(config, playlist_result_mock):
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(APIClient, '__call__', mock.Mock(return_value=playlist_result_mock['result'])):
+        backend.api('station.getPlaylist', stationToken=conftest.MOCK_STATION_TOKEN)
+
+    audio_url_map = backend.api.get_audio_url_map(conftest.MOCK_TRACK_TOKEN)
+    assert audio_url_map['lowQuality']['audioUrl'] == conftest.MOCK_TRACK_AUDIO_LOW
+    assert backend.api.get_audio_url_map(conftest.MOCK_TRACK_AD_TOKEN) is None
+
+
+def test_playlist_rate_limiter_delays_requests_beyond_burst():
+    limiter = PlaylistRateLimiter(station_limit=36, max_delay=200)
+
+    with mock.patch.object(time, 'sleep') as sleep_mock, limiter.allow_delay():
+        for _ in range(3):
+            assert limiter.acquire('station_token_mock') == 0
+        assert limiter.get_remaining('station_token_mock') == 0
+        assert limiter.acquire('station_token_mock') == pytest.approx(100, abs=1)
+
+        sleep_mock.assert_called_once_with(pytest.approx(100, abs=1))
+        # Other stations are not affected.
+        assert limiter.acquire('other_station_token_mock') == 0
+
+    assert limiter.get_remaining('unknown_station_token_mock') == 3
+
+
+def test_playlist_rate_limiter_does_not_delay_requests_by_default():
+    limiter = PlaylistRateLimiter(station_limit=36, max_delay=200)
+
+    with mock.patch.object(time, 'sleep') as sleep_mock:
+        for _ in range(3):
+            limiter.acquire('station_token_mock')
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire('station_token_mock')
+
+        assert not sleep_mock.called
+    assert limiter.stats['stations']['station_token_mock']['rejected'] == 1
+
+
+def test_playlist_rate_limiter_applies_account_limit_to_all_stations():
+    limiter = PlaylistRateLimiter(account_limit=10, station_limit=100, max_delay=0)
+
+    limiter.acquire('station_token_mock')
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire('other_station_token_mock')
+
+    # The reservation for the station is returned if the account limit is exceeded.
+    assert limiter.get_station_bucket('other_station_token_mock').remaining == 10
+    assert limiter.stats['account']['rejected'] == 1
+
+
+def test_get_playlist_is_rate_limited(config):
+    config['pandora']['station_playlist_rate_limit'] = 60
+    backend = conftest.get_backend(config)
+
+    with mock.patch.object(PlaylistRateLimiter, 'acquire') as acquire_mock:
+        with mock.patch.object(APIClient, '__call__', mock.Mock(return_value={'items': []})):
+            backend.api.get_playlist(conftest.MOCK_STATION_TOKEN)
+
+        acquire_mock.assert_called_once_with(conftest.MOCK_STATION_TOKEN)
+    assert 'playlist_rate_limits' in backend.api.get_metrics()
@@ -31,6 +31,29 @@ class ExtensionTests(unittest.TestCase):
         assert 'sort_order = a-z'in config
         assert 'auto_setup = true'in config
         assert 'cache_time_to_live = 86400'in config
+        assert 'cache_max_staleness = 86400'in config
+        assert 'persist_station_lists = true'in config
+        assert 'playlist_low_water_mark = 1'in config
+        assert 'audio_url_ttl = 3600'in config
+        assert 'playability_cache_ttl = 300'in config
+        assert 'audio_cache_size = 0'in config
+        assert 'audio_proxy_cache_size = 0'in config
+        assert 'audio_ring_buffer_size = 0'in config
+        assert 'connection_pool_size = 10'in config
+        assert 'connection_pool_maxsize = 10'in config
+        assert 'connect_timeout = 5'in config
+        assert 'read_timeout = 15'in config
+        assert 'login_deadline = 30'in config
+        assert 'station_list_deadline = 30'in config
+        assert 'playlist_deadline = 20'in config
+        assert 'feedback_deadline = 10'in config
+        assert 'playability_deadline = 5'in config
+        assert 'retry_max_attempts = 3'in config
+        assert 'circuit_breaker_threshold = 5'in config
+        assert 'circuit_breaker_reset_timeout = 30'in config
+        assert 'playlist_rate_limit = 0'in config
+        assert 'station_playlist_rate_limit = 0'in config
+        assert 'metrics_log_interval = 0'in config
         assert 'event_support_enabled = false'in config
         assert 'double_click_interval = 2.50'in config
         assert 'on_pause_resume_click = thumbs_up'in config
@@ -56,6 +79,29 @@ class ExtensionTests(unittest.TestCase):
         assert 'sort_order'in schema
         assert 'auto_setup'in schema
         assert 'cache_time_to_live'in schema
+        assert 'cache_max_staleness'in schema
+        assert 'persist_station_lists'in schema
+        assert 'playlist_low_water_mark'in schema
+        assert 'audio_url_ttl'in schema
+        assert 'playability_cache_ttl'in schema
+        assert 'audio_cache_size'in schema
+        assert 'audio_proxy_cache_size'in schema
+        assert 'audio_ring_buffer_size'in schema
+        assert 'connection_pool_size'in schema
+        assert 'connection_pool_maxsize'in schema
+        assert 'connect_timeout'in schema
+        assert 'read_timeout'in schema
+        assert 'login_deadline'in schema
+        assert 'station_list_deadline'in schema
+        assert 'playlist_deadline'in schema
+        assert 'feedback_deadline'in schema
+        assert 'playability_deadline'in schema
+        assert 'retry_max_attempts'in schema
+        assert 'circuit_breaker_threshold'in schema
+        assert 'circuit_breaker_reset_timeout'in schema
+        assert 'playlist_rate_limit'in schema
+        assert 'station_playlist_rate_limit'in schema
+        assert 'metrics_log_interval'in schema
         assert 'event_support_enabled'in schema
         assert 'double_click_interval'in schema
         assert 'on_pause_resume_click'in schema
@@ -18,12 +18,20 @@ import pykka
 from mopidy_pandora import frontend
 from mopidy_pandora.frontend import EventMarker, EventSequence, MatchResult, PandoraFrontend
 from mopidy_pandora.listener import EventMonitorListener, PandoraBackendListener, PandoraFrontendListener
+from mopidy_pandora.utils import Scheduler
 
 from tests import conftest, dummy_audio, dummy_backend
 from tests.dummy_audio import DummyAudio
 from tests.dummy_backend import DummyBackend, DummyPandoraBackend
 
 
+def wait_for(condition, timeout=1.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
 class BaseTest(unittest.TestCase):
     tracks = [
         models.Track(uri='pandora:track:id_mock:token_mock1', length=40000),  # Regular track
@@ -334,6 +342,22 @@ class FrontendTests(BaseTest):
             assert len(self.core.tracklist.get_tl_tracks().get()) == len(self.tl_tracks)
             assert self.events.qsize() == 0
 
+    def test_changing_track_uses_local_core_state(self):
+        self.core.tracklist.set_consume(True)
+        self.core.playback.play(tlid=self.tl_tracks[0].tlid)
+        self.replay_events()
+        self.frontend.track_changing(self.tl_tracks[1].track).get()
+        self.core.playback.next().get()
+        self.replay_events()
+
+        core_calls = self.frontend.core_state.get().core_calls
+        self.frontend.track_changing(self.tl_tracks[2].track).get()
+        self.core.playback.next().get()
+        self.replay_events()
+
+        # Only the tracklist has to be retrieved again, after the previous track was consumed.
+        assert self.frontend.core_state.get().core_calls - core_calls <= 1
+
     def test_changing_track_station_changed(self):
         with conftest.ThreadJoiner(timeout=1.0) as thread_joiner:
             self.core.tracklist.clear()
@@ -361,6 +385,38 @@ class FrontendTests(BaseTest):
 
             assert call in self.send_mock.mock_calls
 
+    def test_tracklist_changed_triggers_queued_tracks_changed_event(self):
+        self.frontend.tracklist_changed().get()
+
+        call = mock.call(PandoraFrontendListener,
+                         'queued_tracks_changed',
+                         track_uris=[uri for uri in self.uris if uri.startswith('pandora:')])
+
+        assert call in self.send_mock.mock_calls
+
+    def test_track_invalidated_removes_track_from_tracklist(self):
+        self.core.playback.play(tlid=self.tl_tracks[0].tlid)
+        self.replay_events()
+
+        self.frontend.track_invalidated(self.tl_tracks[1].track.uri).get()
+
+        assert self.tl_tracks[1] not in self.core.tracklist.get_tl_tracks().get()
+        assert self.core.playback.get_state().get() == PlaybackState.PLAYING
+
+    def test_track_invalidated_triggers_end_of_tracklist_event(self):
+        self.core.playback.play(tlid=self.tl_tracks[0].tlid)
+        self.replay_events()
+
+        self.frontend.track_invalidated(self.tl_tracks[-1].track.uri).get()
+
+        call = mock.call(PandoraFrontendListener,
+                         'end_of_tracklist_reached',
+                         station_id='id_mock',
+                         auto_play=False)
+
+        assert call in self.send_mock.mock_calls
+        assert self.tl_tracks[-1] not in self.core.tracklist.get_tl_tracks().get()
+
     def test_track_unplayable_removes_tracks_from_tracklist(self):
         tl_tracks = self.core.tracklist.get_tl_tracks().get()
         unplayable_track = tl_tracks[0]
@@ -394,6 +450,13 @@ class EventMonitorFrontendTests(BaseTest):
         # Consume mode needs to be enabled to detect 'previous' track changes
         self.core.tracklist.set_consume(True)
 
+    def wait_for_monitor(self, timeout=1.0):
+        # Event sequences are monitored on the scheduler thread of the event monitor, which is started before the
+        # tests are run and can therefore not be joined by ThreadJoiner.
+        monitor = self.monitor._actor
+        return wait_for(lambda: not monitor._monitor_lock.locked() and
+                        not any(es.is_monitoring() for es in monitor.event_sequences), timeout=timeout)
+
     def test_delete_station_clears_tracklist_on_finish(self):
         self.core.playback.play(tlid=self.tl_tracks[0].tlid)
         self.replay_events()
@@ -499,8 +562,31 @@ class EventMonitorFrontendTests(BaseTest):
 
             assert call in self.send_mock.mock_calls
 
-    def test_events_triggered_on_next_action(self):
+    def test_detect_track_change_previous_from_paused_after_next(self):
         with conftest.ThreadJoiner(timeout=5.0) as thread_joiner:
+            self.core.playback.play(tlid=self.tl_tracks[0].tlid).get()
+            self.replay_events()
+            self.core.playback.next().get()
+            self.replay_events()
+            # Load the history into the frontend's model of the core before changing tracks while paused.
+            assert len(self.monitor.core_state.get().get_history()) == 2
+            self.core.playback.seek(100).get()
+            self.replay_events()
+            self.core.playback.pause().get()
+            self.replay_events()
+            self.core.playback.previous().get()
+            self.replay_events(until='track_changed_previous')
+
+            thread_joiner.wait(timeout=5.0)
+            call = mock.call(EventMonitorListener,
+                             'track_changed_previous',
+                             old_uri=self.tl_tracks[1].track.uri,
+                             new_uri=self.tl_tracks[1].track.uri)
+
+            assert call in self.send_mock.mock_calls
+
+    def test_events_triggered_on_next_action(self):
+        with conftest.ThreadJoiner(timeout=5.0):
             # Pause -> Next
             self.core.playback.play(tlid=self.tl_tracks[0].tlid)
             self.replay_events()
@@ -511,7 +597,7 @@ class EventMonitorFrontendTests(BaseTest):
             self.core.playback.next().get()
             self.replay_events(until='event_triggered')
 
-            thread_joiner.wait(timeout=5.0)
+            assert self.wait_for_monitor(timeout=5.0)
             call = mock.call(EventMonitorListener,
                              'event_triggered',
                              track_uri=self.tl_tracks[0].track.uri,
@@ -520,7 +606,7 @@ class EventMonitorFrontendTests(BaseTest):
             assert call in self.send_mock.mock_calls
 
     def test_events_triggered_on_previous_action(self):
-        with conftest.ThreadJoiner(timeout=5.0) as thread_joiner:
+        with conftest.ThreadJoiner(timeout=5.0):
             # Pause -> Previous
             self.core.playback.play(tlid=self.tl_tracks[0].tlid).get()
             self.replay_events()
@@ -531,7 +617,7 @@ class EventMonitorFrontendTests(BaseTest):
             self.core.playback.previous().get()
             self.replay_events(until='event_triggered')
 
-            thread_joiner.wait(timeout=5.0)
+            assert self.wait_for_monitor(timeout=5.0)
             call = mock.call(EventMonitorListener,
                              'event_triggered',
                              track_uri=self.tl_tracks[0].track.uri,
@@ -540,7 +626,7 @@ class EventMonitorFrontendTests(BaseTest):
             assert call in self.send_mock.mock_calls
 
     def test_events_triggered_on_resume_action(self):
-        with conftest.ThreadJoiner(timeout=1.0) as thread_joiner:
+        with conftest.ThreadJoiner(timeout=1.0):
             # Pause -> Resume
             self.core.playback.play(tlid=self.tl_tracks[0].tlid)
             self.replay_events()
@@ -551,7 +637,7 @@ class EventMonitorFrontendTests(BaseTest):
             self.core.playback.resume().get()
             self.replay_events(until='event_triggered')
 
-            thread_joiner.wait(timeout=1.0)
+            assert self.wait_for_monitor(timeout=2.0)
             call = mock.call(EventMonitorListener,
                              'event_triggered',
                              track_uri=self.tl_tracks[0].track.uri,
@@ -560,7 +646,7 @@ class EventMonitorFrontendTests(BaseTest):
             assert call in self.send_mock.mock_calls
 
     def test_events_triggered_on_triple_click_action(self):
-        with conftest.ThreadJoiner(timeout=1.0) as thread_joiner:
+        with conftest.ThreadJoiner(timeout=1.0):
             # Pause -> Resume -> Pause
             self.core.playback.play(tlid=self.tl_tracks[0].tlid)
             self.replay_events()
@@ -573,7 +659,7 @@ class EventMonitorFrontendTests(BaseTest):
             self.core.playback.pause().get()
             self.replay_events(until='event_triggered')
 
-            thread_joiner.wait(timeout=1.0)
+            assert self.wait_for_monitor(timeout=2.0)
             call = mock.call(EventMonitorListener,
                              'event_triggered',
                              track_uri=self.tl_tracks[0].track.uri,
@@ -582,7 +668,7 @@ class EventMonitorFrontendTests(BaseTest):
             assert call in self.send_mock.mock_calls
 
     def test_monitor_ignores_ads(self):
-        with conftest.ThreadJoiner(timeout=1.0) as thread_joiner:
+        with conftest.ThreadJoiner(timeout=1.0):
             self.core.playback.play(tlid=self.tl_tracks[2].tlid)
             self.core.playback.seek(100)
             self.core.playback.pause()
@@ -590,11 +676,11 @@ class EventMonitorFrontendTests(BaseTest):
             self.core.playback.resume().get()
             self.replay_events(until='track_playback_resumed')
 
-            thread_joiner.wait(timeout=1.0)
+            assert self.wait_for_monitor(timeout=2.0)
             assert self.events.qsize() == 0  # Check that no events were triggered
 
     def test_monitor_resumes_playback_after_event_trigger(self):
-        with conftest.ThreadJoiner(timeout=1.0) as thread_joiner:
+        with conftest.ThreadJoiner(timeout=1.0):
             self.core.playback.play(tlid=self.tl_tracks[0].tlid)
             self.replay_events()
             self.core.playback.seek(100)
@@ -606,8 +692,8 @@ class EventMonitorFrontendTests(BaseTest):
             self.core.playback.next().get()
             self.replay_events()
 
-            thread_joiner.wait(timeout=5.0)
-            assert self.core.playback.get_state().get() == PlaybackState.PLAYING
+            assert self.wait_for_monitor(timeout=5.0)
+            assert wait_for(lambda: self.core.playback.get_state().get() == PlaybackState.PLAYING)
 
 
 class EventSequenceTests(unittest.TestCase):
@@ -677,6 +763,27 @@ class EventSequenceTests(unittest.TestCase):
         assert not self.es_wait.is_monitoring()
         assert self.rq.qsize() == 1
 
+    def test_stop_monitor_does_not_block_other_sequences_while_waiting(self):
+        scheduler = Scheduler()
+        completed = []
+        es = EventSequence('match_mock', ['e1'], self.rq, 0.1, scheduler=scheduler,
+                           on_completed=lambda: completed.append('es'))
+        es_wait = EventSequence('match_mock', ['e1'], self.rq, 0.1, wait_for='w1', scheduler=scheduler,
+                                on_completed=lambda: completed.append('es_wait'))
+        try:
+            es_wait.notify('e1', time_position=100)
+            time.sleep(0.05)
+            es.notify('e1', time_position=100)
+
+            # 'es_wait' is still waiting for 'w1' when 'es' completes.
+            assert es.wait(timeout=1.0)
+            assert es_wait.is_monitoring()
+            assert es_wait.wait(timeout=1.0)
+            assert completed == ['es', 'es_wait']
+            assert self.rq.qsize() == 1
+        finally:
+            scheduler.stop()
+
     def test_get_stop_monitor_ensures_that_all_events_occurred(self):
         self.es.notify('e1', tl_track=self.tl_track_mock, time_position=100)
         self.es.notify('e2', time_position=100)
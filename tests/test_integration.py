@@ -0,0 +1,136 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import mock
+
+from pandora.errors import PandoraException
+
+import pytest
+
+import requests
+
+from mopidy_pandora.backend import PandoraBackend
+from mopidy_pandora.client import MopidyAPITransport
+from mopidy_pandora.library import PandoraLibraryProvider
+from mopidy_pandora.uri import PandoraUri
+
+from . import conftest
+from .fake_tuner import DISCONNECT, FakeTuner, HTTP_ERROR, STATION_DOES_NOT_EXIST
+
+
+def transport_call(self, method, **data):
+    return self._execute(method, data)
+
+
+@pytest.yield_fixture
+def tuner():
+    with FakeTuner(seed=1) as tuner:
+        yield tuner
+
+
+@pytest.yield_fixture
+def tuner_backend(config, tuner):
+    config['pandora'].update(tuner.config)
+    config['proxy'] = {}
+
+    # 'conftest.get_backend' replaces the transport's '__call__' to prevent requests to the Pandora server, restore it.
+    with mock.patch.object(MopidyAPITransport, '__call__', transport_call):
+        backend = PandoraBackend(config=config, audio=mock.Mock())
+        tuner.apply(backend.api.transport)
+        backend.on_start()
+        yield backend
+
+
+def test_on_start_logs_in_to_tuner(tuner_backend, tuner):
+    assert tuner.requests['auth.partnerLogin'] == 1
+    assert tuner.requests['auth.userLogin'] == 1
+
+
+def test_browse_root_lists_stations(tuner_backend, tuner):
+    results = tuner_backend.library.browse(PandoraLibraryProvider.root_directory.uri)
+
+    assert results[0] == PandoraLibraryProvider.genre_directory
+    assert results[1].name == 'QuickMix (marked with *)'
+    assert [r.name for r in results[2:]] == sorted(s['stationName'] + '*' for s in tuner.stations
+                                                   if not s['isQuickMix'])
+
+
+def test_browse_genres_lists_categories(tuner_backend, tuner):
+    results = tuner_backend.library.browse(PandoraLibraryProvider.genre_directory.uri)
+
+    assert [r.name for r in results] == [c['categoryName'] for c in tuner.genre_categories]
+
+
+def test_browse_station_returns_playable_track(tuner_backend, tuner):
+    station_uri = PandoraUri.factory(tuner_backend.api.get_station_list()[0]).uri
+
+    with conftest.ThreadJoiner(timeout=5.0):
+        track = tuner_backend.library.browse(station_uri)[0]
+
+    pandora_track = tuner_backend.library.lookup_pandora_track(track.uri)
+    assert pandora_track.get_is_playable()
+    assert tuner.audio_requests
+
+
+def test_thumbs_up_sends_feedback(tuner_backend, tuner):
+    station_uri = PandoraUri.factory(tuner_backend.api.get_station_list()[0]).uri
+    with conftest.ThreadJoiner(timeout=5.0):
+        track = tuner_backend.library.browse(station_uri)[0]
+
+    assert tuner_backend.process_event(track.uri, 'thumbs_up')
+    assert tuner.feedback == [(PandoraUri.factory(track.uri).token, True)]
+
+
+def test_search_and_create_station(tuner_backend, tuner):
+    search_result = tuner_backend.api.search('fake', include_genre_stations=True)
+    station_count = len(tuner.stations)
+
+    tuner_backend.api.create_station(search_token=search_result.artists[0].token)
+
+    assert len(tuner.stations) == station_count + 1
+    assert len(tuner_backend.api.get_station_list()) == station_count + 1
+
+
+def test_expired_auth_token_logs_in_again(tuner_backend, tuner):
+    tuner.expire_auth_tokens()
+
+    tuner_backend.api.get_station_list()
+
+    assert tuner.requests['auth.userLogin'] == 2
+
+
+def test_pandora_errors_are_not_retried(tuner_backend, tuner):
+    tuner.faults['station.getStation'] = STATION_DOES_NOT_EXIST
+
+    with pytest.raises(PandoraException):
+        tuner_backend.api.get_station('unknown_token_mock')
+
+    assert tuner.requests['station.getStation'] == 1
+
+
+def test_transient_errors_are_retried(tuner_backend, tuner):
+    tuner.faults['user.getStationList'] = DISCONNECT
+
+    with mock.patch('time.sleep'):
+        assert tuner_backend.api.get_station_list() == []
+
+    assert tuner.requests['user.getStationList'] == 3
+
+
+def test_circuit_breaker_stops_requests_to_failing_method(tuner_backend, tuner):
+    tuner.faults['station.getGenreStations'] = HTTP_ERROR
+    config_threshold = tuner_backend.config['circuit_breaker_threshold']
+
+    with mock.patch('time.sleep'):
+        for _ in range(config_threshold + 2):
+            tuner_backend.api.get_genre_stations()
+
+    assert tuner.requests['station.getGenreStations'] == config_threshold * 3
+
+
+def test_http_errors_are_raised_for_non_idempotent_methods(tuner_backend, tuner):
+    tuner.faults['station.createStation'] = HTTP_ERROR
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        tuner_backend.api.create_station(search_token='R123')
+
+    assert tuner.requests['station.createStation'] == 1
@@ -6,13 +6,17 @@ import mock
 
 from mopidy import models
 
-from pandora import APIClient
+from pandora import APIClient, BaseAPIClient
 from pandora.models.pandora import Station, StationList
 
 import pytest
 
+import requests
+
 from mopidy_pandora.client import MopidyAPIClient
 from mopidy_pandora.library import PandoraLibraryProvider, StationCacheItem, TrackCacheItem
+from mopidy_pandora.prefetch import PlaylistPrefetcher
+from mopidy_pandora.quality import AdaptiveAudioQuality
 
 from mopidy_pandora.uri import GenreUri, PandoraUri, PlaylistItemUri, StationUri
 
@@ -92,6 +96,148 @@ def test_get_next_pandora_track_fetches_track(config, playlist_item_mock):
     assert backend.library.pandora_track_cache[ref.uri].track == playlist_item_mock
 
 
+def test_get_next_pandora_track_records_fetch_time(config, playlist_item_mock):
+    backend = conftest.get_backend(config)
+
+    station_mock = mock.Mock(spec=Station)
+    station_mock.id = 'id_token_mock'
+    prefetcher = PlaylistPrefetcher(mock.Mock(return_value=iter([playlist_item_mock])), low_water_mark=0)
+    backend.library.pandora_station_cache[station_mock.id] = StationCacheItem(station_mock, prefetcher)
+
+    ref = backend.library.get_next_pandora_track('id_token_mock')
+    assert backend.library.pandora_track_cache[ref.uri].fetched_at == prefetcher.last_fetched_at
+
+
+def test_get_next_pandora_track_selects_adaptive_audio_quality(config, playlist_item_mock, playlist_result_mock):
+    config['pandora']['preferred_audio_quality'] = 'adaptive'
+    backend = conftest.get_backend(config)
+    backend.quality_selector = AdaptiveAudioQuality(initial_quality=BaseAPIClient.LOW_AUDIO_QUALITY)
+    backend.api._store_audio_url_maps(playlist_result_mock['result'])
+
+    station_mock = mock.Mock(spec=Station)
+    station_mock.id = 'id_token_mock'
+    backend.library.pandora_station_cache[station_mock.id] = StationCacheItem(station_mock, iter([playlist_item_mock]))
+
+    backend.library.get_next_pandora_track('id_token_mock')
+    assert playlist_item_mock.audio_url == conftest.MOCK_TRACK_AUDIO_LOW
+    assert playlist_item_mock.bitrate == '32'
+
+
+def test_is_track_expired(config, playlist_item_mock):
+    config['pandora']['audio_url_ttl'] = 60
+    backend = conftest.get_backend(config)
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock, time.time() - 50)
+
+    assert not backend.library.is_track_expired(track_uri.uri)
+    assert backend.library.is_track_expired(track_uri.uri, margin=20)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock, time.time() - 70)
+    assert backend.library.is_track_expired(track_uri.uri)
+
+
+def test_is_track_expired_ignores_unknown_fetch_times(config, playlist_item_mock):
+    backend = conftest.get_backend(config)
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock)
+
+    assert not backend.library.is_track_expired(track_uri.uri, margin=10000)
+    assert not backend.library.is_track_expired('pandora:track:unknown_mock:unknown_mock')
+
+
+def test_is_track_expired_disabled(config, playlist_item_mock):
+    config['pandora']['audio_url_ttl'] = 0
+    backend = conftest.get_backend(config)
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock, 0)
+
+    assert not backend.library.is_track_expired(track_uri.uri)
+
+
+def test_is_track_playable_caches_result(config, playlist_item_mock):
+    backend = conftest.get_backend(config)
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock)
+
+    with mock.patch.object(playlist_item_mock, 'get_is_playable', return_value=True) as get_is_playable_mock:
+        assert backend.library.is_track_playable(track_uri.uri)
+        assert backend.library.is_track_playable(track_uri.uri)
+        assert get_is_playable_mock.call_count == 1
+
+
+def test_is_track_playable_does_not_cache_if_disabled(config, playlist_item_mock):
+    config['pandora']['playability_cache_ttl'] = 0
+    backend = conftest.get_backend(config)
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock)
+
+    with mock.patch.object(playlist_item_mock, 'get_is_playable', side_effect=[True, False]) as get_is_playable_mock:
+        assert backend.library.is_track_playable(track_uri.uri)
+        assert not backend.library.is_track_playable(track_uri.uri)
+        assert get_is_playable_mock.call_count == 2
+
+
+def test_is_track_playable_records_time_to_first_byte(config, playlist_item_mock):
+    config['pandora']['preferred_audio_quality'] = 'adaptive'
+    backend = conftest.get_backend(config)
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock)
+
+    with mock.patch.object(playlist_item_mock, 'get_is_playable', return_value=True):
+        with mock.patch.object(backend.quality_selector, 'record_ttfb') as record_ttfb_mock:
+            backend.library.is_track_playable(track_uri.uri)
+
+            assert record_ttfb_mock.call_count == 1
+
+
+def test_is_track_playable_falls_back_to_alternate_audio_url(config, playlist_item_mock, playlist_result_mock):
+    backend = conftest.get_backend(config)
+    backend.api._store_audio_url_maps(playlist_result_mock['result'])
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock)
+
+    with mock.patch.object(playlist_item_mock, 'get_is_playable', return_value=False):
+        with mock.patch.object(backend.api.transport, 'test_url',
+                               side_effect=lambda url: url == conftest.MOCK_TRACK_AUDIO_LOW) as test_url_mock:
+            assert backend.library.is_track_playable(track_uri.uri)
+
+            assert test_url_mock.call_count == 2
+            assert playlist_item_mock.audio_url == conftest.MOCK_TRACK_AUDIO_LOW
+            assert playlist_item_mock.bitrate == '32'
+
+
+def test_is_track_playable_raises_exception_if_no_alternate_audio_url_available(config, playlist_item_mock,
+                                                                                playlist_result_mock):
+    backend = conftest.get_backend(config)
+    backend.api._store_audio_url_maps(playlist_result_mock['result'])
+    track_uri = PlaylistItemUri._from_track(playlist_item_mock)
+
+    backend.library.pandora_track_cache[track_uri.uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                        playlist_item_mock)
+
+    with mock.patch.object(playlist_item_mock, 'get_is_playable', side_effect=requests.exceptions.ConnectionError):
+        with mock.patch.object(backend.api.transport, 'test_url', side_effect=requests.exceptions.ConnectionError):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                backend.library.is_track_playable(track_uri.uri)
+
+            assert playlist_item_mock.audio_url == conftest.MOCK_TRACK_AUDIO_HIGH
+
+
 def test_get_next_pandora_track_handles_no_more_tracks_available(config, caplog):
     backend = conftest.get_backend(config)
 
@@ -104,6 +250,17 @@ def test_get_next_pandora_track_handles_no_more_tracks_available(config, caplog)
     assert 'Error retrieving next Pandora track.' in caplog.text()
 
 
+def test_get_station_cache_item_prefetches_playlist(config, station_mock):
+    with mock.patch.object(MopidyAPIClient, 'get_station', conftest.get_station_mock):
+        config['pandora']['playlist_low_water_mark'] = 3
+        backend = conftest.get_backend(config)
+
+        station_iter = backend.library.pandora_station_cache[station_mock.id].iter
+        assert isinstance(station_iter, PlaylistPrefetcher)
+        assert station_iter.low_water_mark == 3
+        assert station_mock.id in backend.library.get_prefetch_stats()
+
+
 def test_get_next_pandora_track_renames_advertisements(config, station_mock):
     with mock.patch.object(MopidyAPIClient, 'get_station', conftest.get_station_mock):
         with mock.patch.object(Station, 'get_playlist', mock.Mock()) as get_playlist_mock:
@@ -51,6 +51,9 @@ class PandoraFrontendListenerTests(unittest.TestCase):
     def test_listener_has_default_impl_for_end_of_tracklist_reached(self):
         self.listener.end_of_tracklist_reached(station_id='id_mock', auto_play=False)
 
+    def test_listener_has_default_impl_for_queued_tracks_changed(self):
+        self.listener.queued_tracks_changed(track_uris=['pandora:track:id_mock:token_mock'])
+
 
 class PandoraBackendListenerTests(unittest.TestCase):
 
@@ -68,6 +71,9 @@ class PandoraBackendListenerTests(unittest.TestCase):
     def test_listener_has_default_impl_for_next_track_available(self):
         self.listener.next_track_available(track=models.Ref(name='name_mock'), auto_play=False)
 
+    def test_listener_has_default_impl_for_track_invalidated(self):
+        self.listener.track_invalidated(track_uri='pandora:track:id_mock:token_mock')
+
     def test_listener_has_default_impl_for_event_processed(self):
         self.listener.event_processed(track_uri='pandora:track:id_mock:token_mock',
                                       pandora_event='event_mock')
@@ -0,0 +1,76 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+
+from mopidy_pandora.metrics import LatencyHistogram, Metrics, MetricsLogger
+
+
+def test_latency_histogram_counts_latencies_per_bucket():
+    histogram = LatencyHistogram(buckets=(0.1, 1))
+
+    for latency in [0.05, 0.1, 0.5, 2]:
+        histogram.observe(latency)
+
+    result = histogram.as_dict()
+    assert result['count'] == 4
+    assert round(result['sum'], 3) == 2.65
+    assert round(result['mean'], 4) == 0.6625
+    assert result['max'] == 2
+    assert result['buckets'] == {'0.1': 2, '1': 1, 'inf': 1}
+
+
+def test_timer_records_call_latency():
+    metrics = Metrics()
+
+    with metrics.timer('method_mock'):
+        pass
+
+    call = metrics.as_dict()['calls']['method_mock']
+    assert call['count'] == 1
+    assert call['errors'] == 0
+    assert call['latency']['count'] == 1
+
+
+def test_timer_records_errors_by_type():
+    metrics = Metrics()
+
+    for error in [ValueError, ValueError, KeyError]:
+        with pytest.raises(error):
+            with metrics.timer('method_mock'):
+                raise error()
+
+    call = metrics.as_dict()['calls']['method_mock']
+    assert call['count'] == 3
+    assert call['errors'] == 3
+    assert call['errors_by_type'] == {'ValueError': 2, 'KeyError': 1}
+
+
+def test_cache_hits_and_misses_are_counted():
+    metrics = Metrics()
+
+    metrics.record_cache_hit('station_list')
+    metrics.record_cache_hit('station_list')
+    metrics.record_cache_miss('station_list')
+
+    assert metrics.as_dict()['cache'] == {'station_list': {'hits': 2, 'misses': 1}}
+
+
+def test_metrics_logger_logs_summary(caplog):
+    metrics = Metrics()
+    metrics.record_call('station.getPlaylist', 0.5, error=ValueError())
+    metrics.record_cache_miss('station_list')
+
+    MetricsLogger(metrics, 60).log_summary()
+
+    assert "'station.getPlaylist': 1 calls, 1 errors, mean 0.500s, max 0.500s." in caplog.text()
+    assert "'station_list' cache: 0 hits, 1 misses." in caplog.text()
+
+
+def test_metrics_logger_stops():
+    metrics_logger = MetricsLogger(Metrics(), 60)
+
+    metrics_logger.start()
+    metrics_logger.stop()
+    metrics_logger._thread.join(1.0)
+
+    assert not metrics_logger._thread.is_alive()
@@ -10,11 +10,13 @@ from pandora.models.pandora import PlaylistItem
 import pytest
 
 from mopidy_pandora import playback
+from mopidy_pandora.audiocache import AudioCache
 
 from mopidy_pandora.backend import MopidyAPIClient
 from mopidy_pandora.library import PandoraLibraryProvider, TrackCacheItem
 
 from mopidy_pandora.playback import PandoraPlaybackProvider
+from mopidy_pandora.proxy import AudioProxy
 
 from mopidy_pandora.uri import PandoraUri
 
@@ -156,6 +158,36 @@ def test_change_track_triggers_event_on_success(provider, playlist_item_mock):
             assert provider._trigger_track_changing.called
 
 
+def test_init_sets_about_to_finish_callback(provider, audio_mock):
+    audio_mock.set_about_to_finish_callback.assert_called_once_with(provider.about_to_finish)
+
+
+def test_about_to_finish_prepares_upcoming_tracks(provider, playlist_item_mock):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', return_value=playlist_item_mock):
+        with mock.patch.object(PlaylistItem, 'get_is_playable', return_value=True):
+            track = PandoraUri.factory(playlist_item_mock)
+            provider.backend.prepare_upcoming_tracks = mock.Mock()
+
+            assert provider.change_track(track) is True
+            provider.about_to_finish()
+
+            provider.backend.prepare_upcoming_tracks.assert_called_once_with(track.uri)
+
+
+def test_change_track_skips_expired_track_without_checking_url(provider, playlist_item_mock, caplog):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', return_value=playlist_item_mock):
+        with mock.patch.object(PandoraLibraryProvider, 'is_track_expired', return_value=True):
+            with mock.patch.object(PlaylistItem, 'get_is_playable') as get_is_playable_mock:
+                track = PandoraUri.factory(playlist_item_mock)
+
+                provider._trigger_track_unplayable = mock.PropertyMock()
+
+                assert provider.change_track(track) is False
+                assert not get_is_playable_mock.called
+                assert provider._trigger_track_unplayable.called
+                assert "Audio URL for track with URI '{}' has expired.".format(track.uri) in caplog.text()
+
+
 def test_translate_uri_returns_audio_url(provider, playlist_item_mock):
     test_uri = 'pandora:track:test_station_id:test_token'
     provider.backend.library.pandora_track_cache[test_uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
@@ -164,6 +196,85 @@ def test_translate_uri_returns_audio_url(provider, playlist_item_mock):
     assert provider.translate_uri(test_uri) == conftest.MOCK_TRACK_AUDIO_HIGH
 
 
+def test_translate_uri_returns_cached_audio(provider, playlist_item_mock):
+    test_uri = 'pandora:track:test_station_id:test_token'
+    provider.backend.audio_cache = mock.Mock(spec=AudioCache)
+    provider.backend.audio_cache.get_uri.return_value = 'file:///cache/audio/test_file'
+
+    assert provider.translate_uri(test_uri) == 'file:///cache/audio/test_file'
+
+
+def test_translate_uri_returns_proxy_url(provider, playlist_item_mock):
+    test_uri = 'pandora:track:test_station_id:test_token'
+    provider.backend.library.pandora_track_cache[test_uri] = TrackCacheItem(mock.Mock(spec=models.Ref.track),
+                                                                            playlist_item_mock)
+    provider.backend.audio_proxy = mock.Mock(spec=AudioProxy)
+    provider.backend.audio_proxy.get_url.return_value = 'http://127.0.0.1:1234/test_token'
+
+    assert provider.translate_uri(test_uri) == 'http://127.0.0.1:1234/test_token'
+    provider.backend.audio_proxy.get_url.assert_called_once_with(test_uri, conftest.MOCK_TRACK_AUDIO_HIGH)
+
+
+def test_change_track_does_not_check_url_of_cached_audio(provider, playlist_item_mock):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', return_value=playlist_item_mock):
+        with mock.patch.object(PlaylistItem, 'get_is_playable') as get_is_playable_mock:
+            track = PandoraUri.factory(playlist_item_mock)
+            provider.backend.audio_cache = mock.MagicMock(spec=AudioCache)
+            provider.backend.audio_cache.__contains__.return_value = True
+            provider.backend.audio_cache.get_uri.return_value = 'file:///cache/audio/test_file'
+
+            assert provider.change_track(track) is True
+            assert not get_is_playable_mock.called
+            provider.audio.set_uri.assert_called_once_with('file:///cache/audio/test_file')
+
+
+def test_change_track_pins_cached_audio_of_current_track(provider, playlist_item_mock):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', return_value=playlist_item_mock):
+        with mock.patch.object(PlaylistItem, 'get_is_playable', return_value=True):
+            provider.backend.audio_cache = mock.MagicMock(spec=AudioCache)
+            provider.backend.audio_cache.__contains__.return_value = True
+            provider.backend.audio_cache.get_uri.return_value = 'file:///cache/audio/test_file'
+            track = models.Track(uri='pandora:track:test_station_id:test_token')
+            next_track = models.Track(uri='pandora:track:test_station_id:test_token_next')
+
+            assert provider.change_track(track) is True
+            provider.backend.audio_cache.pin.assert_called_once_with(track.uri)
+            assert not provider.backend.audio_cache.unpin.called
+
+            assert provider.change_track(next_track) is True
+            provider.backend.audio_cache.pin.assert_called_with(next_track.uri)
+            provider.backend.audio_cache.unpin.assert_called_once_with(track.uri)
+
+
+def test_change_track_does_not_check_url_of_audio_cached_by_proxy(provider, playlist_item_mock):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', return_value=playlist_item_mock):
+        with mock.patch.object(PlaylistItem, 'get_is_playable') as get_is_playable_mock:
+            track = PandoraUri.factory(playlist_item_mock)
+            provider.backend.audio_proxy = mock.Mock(spec=AudioProxy)
+            provider.backend.audio_proxy.is_cached.return_value = True
+
+            assert provider.change_track(track) is True
+            assert not get_is_playable_mock.called
+            provider.backend.audio_proxy.is_cached.assert_called_with(track.uri)
+
+
+def test_change_track_pins_audio_cached_by_proxy(provider, playlist_item_mock):
+    with mock.patch.object(PandoraLibraryProvider, 'lookup_pandora_track', return_value=playlist_item_mock):
+        with mock.patch.object(PlaylistItem, 'get_is_playable', return_value=True):
+            provider.backend.audio_proxy = mock.Mock(spec=AudioProxy)
+            provider.backend.audio_proxy.is_cached.return_value = True
+            provider.backend.audio_proxy.get_url.return_value = 'http://127.0.0.1:1234/test_token'
+            track = models.Track(uri='pandora:track:test_station_id:test_token')
+            next_track = models.Track(uri='pandora:track:test_station_id:test_token_next')
+
+            assert provider.change_track(track) is True
+            provider.backend.audio_proxy.pin.assert_called_once_with(track.uri)
+
+            assert provider.change_track(next_track) is True
+            provider.backend.audio_proxy.pin.assert_called_with(next_track.uri)
+            provider.backend.audio_proxy.unpin.assert_called_once_with(track.uri)
+
+
 def test_resume_click_ignored_if_start_of_track(provider):
     with mock.patch.object(PandoraPlaybackProvider, 'get_time_position', return_value=0):
 
@@ -0,0 +1,137 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import threading
+
+import time
+
+import mock
+
+import pytest
+
+from mopidy_pandora.prefetch import PlaylistPrefetcher
+
+from . import conftest
+
+
+def playlist_items(count):
+    return [mock.Mock(name='playlist_item_{}'.format(i)) for i in range(count)]
+
+
+def test_next_fetches_playlist_when_buffer_is_empty():
+    items = playlist_items(2)
+    get_playlist = mock.Mock(return_value=iter(items))
+    prefetcher = PlaylistPrefetcher(get_playlist, low_water_mark=0)
+
+    assert next(prefetcher) == items[0]
+    assert next(prefetcher) == items[1]
+    assert get_playlist.call_count == 1
+
+
+def test_next_prepares_item_for_playback():
+    items = playlist_items(1)
+    prefetcher = PlaylistPrefetcher(mock.Mock(return_value=iter(items)), low_water_mark=0)
+
+    next(prefetcher)
+    assert items[0].prepare_playback.called
+
+
+def test_next_prefetches_in_background_below_low_water_mark():
+    batches = [iter(playlist_items(2)), iter(playlist_items(2))]
+    get_playlist = mock.Mock(side_effect=batches)
+    prefetcher = PlaylistPrefetcher(get_playlist, low_water_mark=2)
+
+    with conftest.ThreadJoiner(timeout=1.0):
+        next(prefetcher)
+
+    assert get_playlist.call_count == 2
+    assert prefetcher.depth == 3
+
+
+def test_only_background_refills_use_prefetch_context():
+    batches = iter([playlist_items(2), playlist_items(2)])
+    prefetch_context = mock.MagicMock()
+    in_context = []
+
+    def get_playlist():
+        in_context.append(prefetch_context.return_value.__enter__.call_count == 1)
+        return iter(next(batches))
+
+    prefetcher = PlaylistPrefetcher(get_playlist, low_water_mark=2, prefetch_context=prefetch_context)
+
+    with conftest.ThreadJoiner(timeout=1.0):
+        next(prefetcher)
+
+    assert in_context == [False, True]
+    assert prefetch_context.return_value.__exit__.call_count == 1
+
+
+def test_next_waits_for_background_refill_in_progress():
+    items = playlist_items(1)
+    refill_started = threading.Event()
+    release_refill = threading.Event()
+
+    def slow_get_playlist():
+        refill_started.set()
+        release_refill.wait(1.0)
+        return iter(items)
+
+    prefetcher = PlaylistPrefetcher(slow_get_playlist, low_water_mark=1)
+
+    with conftest.ThreadJoiner(timeout=1.0):
+        prefetcher._refilling = True
+        prefetcher._refill_async()
+        assert refill_started.wait(1.0)
+
+        threading.Timer(0.1, release_refill.set).start()
+        assert next(prefetcher) == items[0]
+
+
+def test_next_raises_stop_iteration_if_no_tracks_available():
+    prefetcher = PlaylistPrefetcher(mock.Mock(return_value=iter([])), low_water_mark=0)
+
+    with pytest.raises(StopIteration):
+        next(prefetcher)
+
+
+def test_next_raises_errors_from_foreground_refill():
+    prefetcher = PlaylistPrefetcher(mock.Mock(side_effect=conftest.TransportCallTestNotImplemented),
+                                    low_water_mark=0)
+
+    with pytest.raises(conftest.TransportCallTestNotImplemented):
+        next(prefetcher)
+    assert not prefetcher._refilling
+
+
+def test_next_raises_errors_from_background_refill_once_buffer_is_empty(caplog):
+    items = playlist_items(1)
+    get_playlist = mock.Mock(side_effect=[iter(items), conftest.TransportCallTestNotImplemented])
+    prefetcher = PlaylistPrefetcher(get_playlist, low_water_mark=1)
+
+    with conftest.ThreadJoiner(timeout=1.0):
+        assert next(prefetcher) == items[0]
+
+    assert 'Error prefetching Pandora playlist' in caplog.text()
+    with pytest.raises(conftest.TransportCallTestNotImplemented):
+        next(prefetcher)
+
+
+def test_next_records_fetch_time_of_item():
+    prefetcher = PlaylistPrefetcher(mock.Mock(return_value=iter(playlist_items(1))), low_water_mark=0)
+    assert prefetcher.last_fetched_at is None
+
+    start_time = time.time()
+    next(prefetcher)
+
+    assert start_time <= prefetcher.last_fetched_at <= time.time()
+
+
+def test_stats_reports_buffer_depth_and_refill_latency():
+    prefetcher = PlaylistPrefetcher(mock.Mock(return_value=iter(playlist_items(4))), low_water_mark=0)
+
+    assert prefetcher.stats == {'depth': 0, 'refill_count': 0, 'last_refill_latency': None}
+
+    next(prefetcher)
+    stats = prefetcher.stats
+    assert stats['depth'] == 3
+    assert stats['refill_count'] == 1
+    assert stats['last_refill_latency'] >= 0
@@ -0,0 +1,267 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+
+import threading
+
+import time
+
+import mock
+
+import pytest
+
+import requests
+
+from mopidy_pandora.proxy import AudioProxy, RangeSet
+from mopidy_pandora.ringbuffer import AudioRingBuffer
+
+from .fake_tuner import FakeTuner
+
+
+def open_url(url, **kwargs):
+    return requests.get(url, stream=True, **kwargs)
+
+
+@pytest.yield_fixture
+def tuner():
+    with FakeTuner(audio_size=100 * 1024) as tuner:
+        yield tuner
+
+
+@pytest.yield_fixture
+def proxy(tmpdir):
+    proxy = AudioProxy(str(tmpdir.join('proxy')), 1024 * 1024, open_url)
+    proxy.start()
+    yield proxy
+    proxy.stop()
+
+
+def audio_path(tuner, token):
+    return tuner.audio_url(token).replace(tuner.url, '')
+
+
+def wait_for(condition, timeout=1.0):
+    # The proxy cleans up after a request once the response has been sent, which may be after the client received it.
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_range_set_merges_overlapping_and_adjacent_ranges():
+    ranges = RangeSet()
+    ranges.add(0, 10)
+    ranges.add(20, 30)
+    ranges.add(10, 15)
+    ranges.add(25, 40)
+
+    assert list(ranges) == [(0, 15), (20, 40)]
+    assert ranges.size == 35
+    assert ranges.get_end(5) == 15
+    assert ranges.get_end(15) is None
+    assert ranges.get_next_start(15) == 20
+    assert ranges.get_next_start(20) is None
+
+
+def test_proxy_streams_audio(proxy, tuner):
+    url = tuner.audio_url('token_a')
+    response = requests.get(proxy.get_url('pandora:track:id_mock:token_a', url))
+
+    assert response.status_code == 200
+    assert response.content == tuner.audio_data(audio_path(tuner, 'token_a'))
+    assert response.headers['Content-Type'] == 'audio/mpeg'
+
+
+def test_proxy_serves_repeated_requests_from_cache(proxy, tuner):
+    url = tuner.audio_url('token_a')
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', url)
+
+    requests.get(proxy_url)
+    response = requests.get(proxy_url)
+
+    assert response.content == tuner.audio_data(audio_path(tuner, 'token_a'))
+    assert tuner.audio_requests[audio_path(tuner, 'token_a')] == 1
+    assert proxy.stats['cache_bytes'] == tuner.audio_size
+
+
+def test_proxy_serves_range_requests(proxy, tuner):
+    url = tuner.audio_url('token_a')
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', url)
+    data = tuner.audio_data(audio_path(tuner, 'token_a'))
+
+    response = requests.get(proxy_url, headers={'Range': 'bytes=1000-1999'})
+
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 1000-1999/{:d}'.format(len(data))
+    assert response.content == data[1000:2000]
+
+
+def test_proxy_only_downloads_missing_ranges(proxy, tuner):
+    url = tuner.audio_url('token_a')
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', url)
+    data = tuner.audio_data(audio_path(tuner, 'token_a'))
+
+    requests.get(proxy_url, headers={'Range': 'bytes=1000-1999'})
+    response = requests.get(proxy_url)
+
+    assert response.content == data
+    # One request for the initial range, and one each for the data before and after it.
+    assert tuner.audio_requests[audio_path(tuner, 'token_a')] == 3
+    assert proxy.stats['cache_bytes'] == 1000
+
+
+def test_proxy_serves_cached_audio_after_url_expired(proxy, tuner):
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+    requests.get(proxy_url)
+
+    proxy.get_url('pandora:track:id_mock:token_a', tuner.url + '/expired')
+    response = requests.get(proxy_url, headers={'Range': 'bytes=500-'})
+
+    assert response.status_code == 206
+    assert response.content == tuner.audio_data(audio_path(tuner, 'token_a'))[500:]
+
+
+def test_proxy_returns_error_if_audio_cannot_be_retrieved(proxy, tuner, caplog):
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', tuner.url + '/expired')
+
+    response = requests.get(proxy_url)
+
+    assert response.status_code == 502
+    assert 'Error streaming Pandora audio' in caplog.text()
+
+
+def test_proxy_returns_not_found_for_unknown_tracks(proxy):
+    assert requests.get(proxy.url + '/unknown').status_code == 404
+
+
+def test_proxy_evicts_least_recently_used_audio(tmpdir, tuner):
+    proxy = AudioProxy(str(tmpdir.join('proxy')), 150 * 1024, open_url)
+    proxy.start()
+    try:
+        url_a = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+        url_b = proxy.get_url('pandora:track:id_mock:token_b', tuner.audio_url('token_b'))
+
+        requests.get(url_a)
+        requests.get(url_b)
+
+        assert wait_for(lambda: proxy.stats['evictions'] == 1)
+        assert proxy.stats['tracks'] == 1
+        assert proxy.currsize == tuner.audio_size
+    finally:
+        proxy.stop()
+
+
+def test_proxy_does_not_evict_audio_that_is_being_streamed(tmpdir, tuner):
+    proxy = AudioProxy(str(tmpdir.join('proxy')), 150 * 1024, open_url)
+    proxy.start()
+    try:
+        url_a = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+        url_b = proxy.get_url('pandora:track:id_mock:token_b', tuner.audio_url('token_b'))
+        requests.get(url_a)
+        entry_a = proxy._entries[url_a.split('/')[-1]]
+        entry_b = proxy._entries[url_b.split('/')[-1]]
+        assert wait_for(lambda: entry_a.users == 0)
+
+        # Another request is still streaming the audio of track 'a'.
+        assert proxy.acquire_entry(url_a.split('/')[-1]) is entry_a
+        requests.get(url_b)
+        assert wait_for(lambda: entry_b.users == 0)
+
+        assert proxy.stats['evictions'] == 0
+        assert os.path.exists(entry_a.path)
+        assert entry_a.complete
+
+        proxy.release_entry(entry_a)
+        assert proxy.stats['evictions'] == 1
+    finally:
+        proxy.stop()
+
+
+def test_proxy_does_not_evict_pinned_audio(tmpdir, tuner):
+    proxy = AudioProxy(str(tmpdir.join('proxy')), 150 * 1024, open_url)
+    proxy.start()
+    try:
+        url_a = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+        url_b = proxy.get_url('pandora:track:id_mock:token_b', tuner.audio_url('token_b'))
+        url_c = proxy.get_url('pandora:track:id_mock:token_c', tuner.audio_url('token_c'))
+
+        proxy.pin('pandora:track:id_mock:token_a')
+        for url in (url_a, url_b, url_c):
+            requests.get(url)
+            assert wait_for(lambda: all(entry.users == 0 for entry in proxy._entries.values()))
+
+        assert proxy.stats['evictions'] == 1
+        assert proxy.is_cached('pandora:track:id_mock:token_a')
+        assert not proxy.is_cached('pandora:track:id_mock:token_b')
+
+        proxy.unpin('pandora:track:id_mock:token_a')
+        assert proxy.stats['evictions'] == 2
+        assert not proxy.is_cached('pandora:track:id_mock:token_a')
+    finally:
+        proxy.stop()
+
+
+def test_proxy_is_cached_once_audio_has_been_downloaded_completely(proxy, tuner):
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+
+    requests.get(proxy_url, headers={'Range': 'bytes=0-999'})
+    assert not proxy.is_cached('pandora:track:id_mock:token_a')
+
+    requests.get(proxy_url)
+    assert proxy.is_cached('pandora:track:id_mock:token_a')
+    assert not proxy.is_cached('pandora:track:id_mock:token_b')
+
+
+def test_proxy_replays_evicted_audio_from_ring_buffer(tmpdir, tuner):
+    proxy = AudioProxy(str(tmpdir.join('proxy')), 150 * 1024, open_url, ring_buffer=AudioRingBuffer(1024 * 1024))
+    proxy.start()
+    try:
+        url_a = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+        url_b = proxy.get_url('pandora:track:id_mock:token_b', tuner.audio_url('token_b'))
+        requests.get(url_a)
+        requests.get(url_b)
+        assert wait_for(lambda: proxy.stats['evictions'] == 1)
+
+        # Audio URL has expired in the meantime.
+        proxy.get_url('pandora:track:id_mock:token_a', tuner.url + '/expired')
+        response = requests.get(url_a, headers={'Range': 'bytes=100-'})
+
+        assert response.status_code == 206
+        assert response.content == tuner.audio_data(audio_path(tuner, 'token_a'))[100:]
+        assert tuner.audio_requests[audio_path(tuner, 'token_a')] == 1
+        assert proxy.is_cached('pandora:track:id_mock:token_a')
+        assert proxy.stats['ring_buffer']['tracks'] == 2
+    finally:
+        proxy.stop()
+
+
+def test_proxy_reports_upstream_transfers(tmpdir, tuner):
+    reported = threading.Event()
+    on_transfer = mock.Mock(side_effect=lambda *args, **kwargs: reported.set())
+    proxy = AudioProxy(str(tmpdir.join('proxy')), 1024 * 1024, open_url, on_transfer=on_transfer)
+    proxy.start()
+    try:
+        proxy_url = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+        requests.get(proxy_url)
+        # Transfers are reported once the upstream response is closed, which can be after the client has received it.
+        assert reported.wait(1)
+        requests.get(proxy_url)
+
+        # The second request is served from the cache.
+        assert on_transfer.call_count == 1
+        assert on_transfer.call_args[0][0] == tuner.audio_size
+        assert on_transfer.call_args[1]['ttfb'] >= 0
+    finally:
+        proxy.stop()
+
+
+@pytest.mark.skipif(not hasattr(os, 'sendfile'), reason='sendfile is not available on this platform')
+def test_proxy_uses_sendfile_for_cached_audio(proxy, tuner):
+    proxy_url = proxy.get_url('pandora:track:id_mock:token_a', tuner.audio_url('token_a'))
+    requests.get(proxy_url)
+
+    with mock.patch('mopidy_pandora.proxy.os.sendfile', wraps=os.sendfile) as sendfile_mock:
+        response = requests.get(proxy_url)
+
+        assert response.content == tuner.audio_data(audio_path(tuner, 'token_a'))
+        assert sendfile_mock.called
@@ -0,0 +1,111 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from pandora import BaseAPIClient
+
+from mopidy_pandora.quality import AdaptiveAudioQuality
+
+
+LOW = BaseAPIClient.LOW_AUDIO_QUALITY
+MED = BaseAPIClient.MED_AUDIO_QUALITY
+HIGH = BaseAPIClient.HIGH_AUDIO_QUALITY
+
+AUDIO_URL_MAP = {
+    LOW: {'bitrate': '32', 'audioUrl': 'low_url'},
+    MED: {'bitrate': '64', 'audioUrl': 'med_url'},
+    HIGH: {'bitrate': '192', 'audioUrl': 'high_url'},
+}
+
+
+def record_throughput(selector, bytes_per_second, ttfb=0.1):
+    num_bytes = 1024 * 1024
+    selector.record_transfer(num_bytes, num_bytes / bytes_per_second, ttfb=ttfb)
+
+
+def test_starts_with_initial_quality():
+    selector = AdaptiveAudioQuality(initial_quality=LOW)
+
+    assert selector.quality == LOW
+    assert selector.select(AUDIO_URL_MAP) == (LOW, AUDIO_URL_MAP[LOW])
+
+
+def test_upgrades_quality_if_throughput_is_high():
+    selector = AdaptiveAudioQuality(alpha=1.0)
+
+    record_throughput(selector, 100 * 1000)
+
+    assert selector.quality == HIGH
+    assert selector.stats['upgrades'] == 1
+
+
+def test_downgrades_quality_if_throughput_is_low():
+    selector = AdaptiveAudioQuality(initial_quality=HIGH, alpha=1.0)
+
+    record_throughput(selector, 5 * 1000)
+
+    assert selector.quality == LOW
+    assert selector.stats['downgrades'] == 1
+
+
+def test_does_not_change_quality_within_hysteresis_band():
+    selector = AdaptiveAudioQuality(alpha=1.0)
+
+    # Enough to stream medium quality audio, but not by a large enough margin to upgrade to high quality.
+    for throughput in (20 * 1000, 40 * 1000, 30 * 1000):
+        record_throughput(selector, throughput)
+
+    assert selector.quality == MED
+    assert selector.stats['upgrades'] == selector.stats['downgrades'] == 0
+
+
+def test_downgrades_quality_if_time_to_first_byte_is_high():
+    selector = AdaptiveAudioQuality(alpha=1.0, max_ttfb=1.0)
+
+    selector.record_ttfb(3.0)
+
+    assert selector.quality == LOW
+
+
+def test_restores_quality_if_time_to_first_byte_recovers():
+    selector = AdaptiveAudioQuality(alpha=1.0, max_ttfb=1.0)
+
+    selector.record_ttfb(3.0)
+    assert selector.quality == LOW
+
+    selector.record_ttfb(0.2)
+    assert selector.quality == MED
+    assert selector.stats['upgrades'] == 1
+
+    # Without throughput measurements the quality is not raised above the initial quality.
+    selector.record_ttfb(0.2)
+    assert selector.quality == MED
+
+
+def test_does_not_upgrade_quality_if_time_to_first_byte_is_slow():
+    selector = AdaptiveAudioQuality(alpha=1.0, max_ttfb=1.0)
+
+    record_throughput(selector, 100 * 1000, ttfb=0.8)
+
+    assert selector.quality == MED
+
+
+def test_ignores_small_transfers():
+    selector = AdaptiveAudioQuality(alpha=1.0)
+
+    selector.record_transfer(1024, 1.0)
+
+    assert selector.throughput is None
+    assert selector.quality == MED
+
+
+def test_select_falls_back_to_lower_quality():
+    selector = AdaptiveAudioQuality(initial_quality=HIGH)
+    audio_url_map = {LOW: AUDIO_URL_MAP[LOW], MED: AUDIO_URL_MAP[MED]}
+
+    assert selector.select(audio_url_map) == (MED, AUDIO_URL_MAP[MED])
+
+
+def test_select_falls_back_to_higher_quality():
+    selector = AdaptiveAudioQuality(initial_quality=LOW)
+
+    assert selector.select({HIGH: AUDIO_URL_MAP[HIGH]}) == (HIGH, AUDIO_URL_MAP[HIGH])
+    assert selector.select({}) == (None, None)
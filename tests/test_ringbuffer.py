@@ -0,0 +1,65 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+
+import pytest
+
+from mopidy_pandora.ringbuffer import AudioRingBuffer
+
+
+def test_put_and_read():
+    buffer = AudioRingBuffer(16)
+
+    assert buffer.put('a', io.BytesIO(b'abcdef'), 6)
+    assert 'a' in buffer
+    assert buffer.get_length('a') == 6
+    assert buffer.read('a', 0, 100) == b'abcdef'
+    assert buffer.read('a', 2, 3) == b'cde'
+
+
+def test_put_wraps_around_and_drops_overwritten_tracks():
+    buffer = AudioRingBuffer(16)
+
+    buffer.put('a', io.BytesIO(b'a' * 6), 6)
+    buffer.put('b', io.BytesIO(b'b' * 6), 6)
+    buffer.put('c', io.BytesIO(b'0123456789'), 10)
+
+    # 'c' is written to the last four bytes of the buffer and the first six, where 'a' was stored.
+    assert 'a' not in buffer
+    assert buffer.read('b', 0, 6) == b'b' * 6
+    assert buffer.read('c', 0, 10) == b'0123456789'
+    assert buffer.read('c', 2, 4) == b'2345'
+    assert buffer.stats == {'tracks': 2, 'used': 16, 'size': 16}
+
+
+def test_put_keeps_tracks_that_are_not_overwritten():
+    buffer = AudioRingBuffer(16)
+
+    buffer.put('a', io.BytesIO(b'a' * 6), 6)
+    buffer.put('b', io.BytesIO(b'b' * 6), 6)
+    buffer.put('c', io.BytesIO(b'c' * 6), 6)
+
+    assert 'a' not in buffer
+    assert buffer.read('b', 0, 6) == b'b' * 6
+    assert buffer.read('c', 0, 6) == b'c' * 6
+
+
+def test_put_rejects_audio_larger_than_buffer():
+    buffer = AudioRingBuffer(4)
+
+    assert not buffer.put('a', io.BytesIO(b'abcdef'), 6)
+    assert 'a' not in buffer
+
+
+def test_put_rejects_incomplete_audio():
+    buffer = AudioRingBuffer(16)
+
+    assert not buffer.put('a', io.BytesIO(b'abc'), 6)
+    assert 'a' not in buffer
+
+
+def test_read_raises_key_error_for_missing_tracks():
+    buffer = AudioRingBuffer(16)
+
+    with pytest.raises(KeyError):
+        buffer.read('a', 0, 1)
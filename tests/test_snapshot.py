@@ -0,0 +1,99 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import os
+import threading
+
+from pandora import APIClient
+from pandora.models.pandora import GenreStationList, StationList
+
+from mopidy_pandora.snapshot import StationListSnapshot
+
+from . import conftest
+
+
+def station_list_mock():
+    return StationList.from_json(APIClient, conftest.station_list_result_mock())
+
+
+def genre_stations_mock():
+    return GenreStationList.from_json(APIClient, conftest.genre_stations_result_mock())
+
+
+def test_load_returns_none_if_no_snapshot_available(tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+
+    assert snapshot.load(APIClient) == (None, None)
+
+
+def test_save_and_load_station_list(tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+    snapshot.save(station_list=station_list_mock())
+
+    station_list, genre_stations = snapshot.load(APIClient)
+    assert genre_stations is None
+    assert station_list.checksum == conftest.MOCK_STATION_LIST_CHECKSUM
+    assert [s.name for s in station_list] == [s.name for s in station_list_mock()]
+    assert station_list[2].is_quickmix
+    assert station_list[2].quickmix_stations == station_list_mock()[2].quickmix_stations
+
+
+def test_save_and_load_genre_stations(tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+    snapshot.save(genre_stations=genre_stations_mock())
+
+    station_list, genre_stations = snapshot.load(APIClient)
+    assert station_list is None
+    assert list(genre_stations) == ['Category mock']
+    assert genre_stations['Category mock'][0].id == 'G100'
+
+
+def test_save_retains_lists_that_are_not_provided(tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+    snapshot.save(station_list=station_list_mock())
+    snapshot.save(genre_stations=genre_stations_mock())
+
+    station_list, genre_stations = snapshot.load(APIClient)
+    assert len(station_list) == len(station_list_mock())
+    assert len(genre_stations) == len(genre_stations_mock())
+
+
+def test_load_ignores_corrupt_snapshot(tmpdir, caplog):
+    path = tmpdir.join('station_lists.json')
+    path.write('{not json')
+
+    assert StationListSnapshot(str(path)).load(APIClient) == (None, None)
+    assert 'Ignoring corrupt Pandora station list snapshot' in caplog.text()
+
+
+def test_load_ignores_outdated_snapshot(tmpdir):
+    path = tmpdir.join('station_lists.json')
+    path.write(json.dumps({'version': StationListSnapshot.VERSION - 1,
+                           'station_list': conftest.station_list_result_mock()}))
+
+    assert StationListSnapshot(str(path)).load(APIClient) == (None, None)
+
+
+def test_save_does_not_leave_temporary_files(tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+    snapshot.save(station_list=station_list_mock())
+
+    assert os.listdir(str(tmpdir)) == ['station_lists.json']
+
+
+def test_concurrent_saves_retain_both_lists(tmpdir):
+    snapshot = StationListSnapshot(str(tmpdir.join('station_lists.json')))
+    station_list = station_list_mock()
+    genre_stations = genre_stations_mock()
+
+    threads = [threading.Thread(target=snapshot.save, kwargs={'station_list': station_list}) for _ in range(10)] + \
+              [threading.Thread(target=snapshot.save, kwargs={'genre_stations': genre_stations}) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    station_list, genre_stations = snapshot.load(APIClient)
+    assert len(station_list) == len(station_list_mock())
+    assert len(genre_stations) == len(genre_stations_mock())
+    assert os.listdir(str(tmpdir)) == ['station_lists.json']
@@ -0,0 +1,131 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import mock
+
+from mopidy import models
+from mopidy.audio import PlaybackState
+
+import pytest
+
+from mopidy_pandora.state import CoreState
+
+
+tl_tracks = [
+    models.TlTrack(tlid=1, track=models.Track(uri='pandora:track:id_mock:token_mock1')),
+    models.TlTrack(tlid=2, track=models.Track(uri='pandora:track:id_mock:token_mock2')),
+    models.TlTrack(tlid=3, track=models.Track(uri='pandora:track:id_mock_other:token_mock3')),
+]
+
+
+@pytest.fixture
+def core():
+    core = mock.Mock()
+    core.tracklist.get_tl_tracks.return_value.get.return_value = tl_tracks[:2]
+    core.playback.get_current_tl_track.return_value.get.return_value = tl_tracks[0]
+    core.history.get_history.return_value.get.return_value = [(1000, models.Ref.track(uri=tl_tracks[0].track.uri))]
+    for option, value in [('consume', True), ('repeat', False), ('random', False), ('single', False)]:
+        getattr(core.tracklist, 'get_' + option).return_value.get.return_value = value
+    return core
+
+
+def test_tracklist_is_retrieved_once(core):
+    state = CoreState(core)
+
+    assert state.get_tl_tracks() == tl_tracks[:2]
+    assert state.get_length() == 2
+    assert state.index(tl_tracks[1]) == 1
+    assert state.filter(tl_tracks[1].track.uri) == [tl_tracks[1]]
+    assert state.core_calls == 1
+
+
+def test_tracklist_changed_invalidates_tracklist(core):
+    state = CoreState(core)
+    state.get_tl_tracks()
+
+    core.tracklist.get_tl_tracks.return_value.get.return_value = tl_tracks[1:]
+    state.on_event('tracklist_changed')
+
+    assert state.get_tl_tracks() == tl_tracks[1:]
+    assert state.core_calls == 2
+
+
+def test_add_tl_tracks_updates_tracklist(core):
+    state = CoreState(core)
+    state.get_tl_tracks()
+
+    state.add_tl_tracks(tl_tracks[2:])
+
+    assert state.get_tl_tracks() == tl_tracks
+    assert state.core_calls == 1
+
+
+def test_index_defaults_to_current_track(core):
+    state = CoreState(core)
+
+    assert state.index() == 0
+    assert state.index(tl_tracks[2]) is None
+
+
+def test_playback_events_update_current_track(core):
+    state = CoreState(core)
+
+    state.on_event('track_playback_started', tl_track=tl_tracks[1])
+    assert state.get_current_tl_track() == tl_tracks[1]
+    assert state.core_calls == 0
+
+    state.on_event('playback_state_changed', old_state=PlaybackState.PLAYING, new_state=PlaybackState.STOPPED)
+    assert state.get_current_tl_track() == tl_tracks[0]
+    assert state.core_calls == 1
+
+
+def test_track_playback_started_updates_history(core):
+    state = CoreState(core)
+    state.get_history()
+
+    state.on_event('track_playback_started', tl_track=tl_tracks[1])
+
+    history = state.get_history()
+    assert [ref.uri for _, ref in history] == [tl_tracks[1].track.uri, tl_tracks[0].track.uri]
+    assert state.core_calls == 1
+
+
+def test_track_playback_paused_invalidates_history(core):
+    state = CoreState(core)
+    state.get_history()
+
+    history = [(2000, models.Ref.track(uri=tl_tracks[1].track.uri)),
+               (1000, models.Ref.track(uri=tl_tracks[0].track.uri))]
+    core.history.get_history.return_value.get.return_value = history
+    state.on_event('track_playback_paused', tl_track=tl_tracks[1])
+
+    assert state.get_history() == history
+    assert state.core_calls == 2
+
+
+def test_options_are_retrieved_once(core):
+    state = CoreState(core)
+
+    assert state.get_option('consume') is True
+    state.set_option('repeat', True)
+    assert state.get_option('repeat') is True
+    assert state.core_calls == len(CoreState.OPTIONS)
+
+    state.on_event('options_changed')
+    assert state.get_option('repeat') is False
+    assert state.core_calls == 2 * len(CoreState.OPTIONS)
+
+
+def test_get_active_uri_order_of_precedence(core):
+    state = CoreState(core)
+
+    assert state.get_active_uri(track=tl_tracks[2].track) == tl_tracks[2].track.uri
+    assert state.get_active_uri(tl_track=tl_tracks[1]) == tl_tracks[1].track.uri
+    assert state.get_active_uri() == tl_tracks[0].track.uri
+    assert state.core_calls == 1
+
+
+def test_get_active_uri_falls_back_to_history(core):
+    core.playback.get_current_tl_track.return_value.get.return_value = None
+    state = CoreState(core)
+
+    assert state.get_active_uri() == tl_tracks[0].track.uri
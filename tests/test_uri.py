@@ -96,11 +96,9 @@ def test_pandora_parse_unicode_mock_uri():
 
 
 def test_pandora_repr_converts_to_string():
-    uri = 'pandora:station:id_mock:'
-    obj = PandoraUri._from_uri(uri)
+    obj = StationUri('id_mock', 0)
 
-    obj.token = 0
-    assert obj.uri == uri + '0'
+    assert obj.uri == 'pandora:station:id_mock:0'
 
 
 def test_pandora_parse_none_mock_uri():
@@ -151,7 +149,7 @@ def test_search_uri_is_track_search():
     obj = PandoraUri._from_uri('pandora:search:S1234567')
     assert obj.is_track_search
 
-    obj.token = 'R123456'
+    obj = SearchUri('R123456')
     assert not obj.is_track_search
 
 
@@ -159,7 +157,7 @@ def test_search_uri_is_artist_search():
     obj = PandoraUri._from_uri('pandora:search:S1234567')
     assert not obj.is_artist_search
 
-    obj.token = 'R123456'
+    obj = SearchUri('R123456')
     assert obj.is_artist_search
 
 
@@ -167,7 +165,7 @@ def test_search_uri_is_composer_search():
     obj = PandoraUri._from_uri('pandora:search:S1234567')
     assert not obj.is_composer_search
 
-    obj.token = 'C12345'
+    obj = SearchUri('C12345')
     assert obj.is_composer_search
 
 
@@ -175,7 +173,7 @@ def test_search_uri_is_genre_search():
     obj = PandoraUri._from_uri('pandora:search:S1234567')
     assert not obj.is_genre_search
 
-    obj.token = 'G123'
+    obj = SearchUri('G123')
     assert obj.is_genre_search
 
 
@@ -322,3 +320,104 @@ def test_track_uri_is_ad(playlist_item_mock, ad_item_mock):
     obj = PandoraUri._from_uri(track_uri.uri)
 
     assert type(obj) is not AdItemUri
+
+
+def test_factory_returns_shared_uri_objects():
+    uri = 'pandora:station:id_mock:token_mock'
+
+    obj = PandoraUri.factory(uri)
+
+    assert PandoraUri.factory(uri) is obj
+    assert PandoraUri.factory(models.Ref(name='name_mock', uri=uri)) is obj
+
+
+def test_factory_returns_immutable_uri_objects():
+    obj = PandoraUri.factory('pandora:station:id_mock:token_mock')
+
+    with pytest.raises(AttributeError):
+        obj.token = 'other_token_mock'
+
+    assert obj.token == 'token_mock'
+
+
+def test_factory_parse_cache_is_bounded():
+    for i in range(PandoraUri.PARSE_CACHE_SIZE + 10):
+        PandoraUri.factory('pandora:station:id_mock:token_mock_{:d}'.format(i))
+
+    assert len(PandoraUri._parse_cache) == PandoraUri.PARSE_CACHE_SIZE
+
+
+def test_factory_does_not_parse_uris_of_other_backends():
+    with mock.patch.object(PandoraUri, '_from_uri') as from_uri_mock:
+        with pytest.raises(NotImplementedError):
+            PandoraUri.factory('spotify:track:token_mock')
+
+        assert not PandoraUri.is_pandora_uri('pandorafake:track:token_mock')
+        assert not from_uri_mock.called
+
+
+def test_uri_objects_are_immutable():
+    obj = PlaylistItemUri('id_mock', 'token_mock')
+
+    with pytest.raises(AttributeError):
+        obj.token = 'other_token_mock'
+    with pytest.raises(AttributeError):
+        obj.other_attribute = 'value_mock'
+    assert not hasattr(obj, '__dict__')
+
+
+def test_uri_objects_compare_and_hash_like_uri_strings():
+    uri = 'pandora:track:id_mock:token_mock'
+    obj = PlaylistItemUri('id_mock', 'token_mock')
+
+    assert obj == uri
+    assert obj == PandoraUri._from_uri(uri)
+    assert obj != PlaylistItemUri('id_mock', 'other_token_mock')
+    assert hash(obj) == hash(uri)
+    assert {uri: 'value_mock'}[obj] == 'value_mock'
+    assert {obj: 'value_mock'}[uri] == 'value_mock'
+
+
+def test_uri_string_is_only_encoded_once():
+    obj = AdItemUri('id_mock', 'ad_token_mock')
+
+    with mock.patch('mopidy_pandora.uri.quote') as quote_mock:
+        assert obj.uri == repr(obj) == 'pandora:ad:id_mock:ad_token_mock'
+        assert not quote_mock.called
+
+
+def test_factory_many_converts_mixed_items(playlist_item_mock):
+    station_mock = mock.PropertyMock(spec=Station)
+    station_mock.id = 'id_mock'
+    station_mock.token = 'token_mock'
+    genre_station_mock = mock.PropertyMock(spec=GenreStation)
+    genre_station_mock.id = 'G100'
+    genre_station_mock.token = 'G100'
+    uri = 'pandora:station:id_mock:token_mock'
+
+    uri_objs = PandoraUri.factory_many([uri, station_mock, genre_station_mock, playlist_item_mock,
+                                        models.Ref(name='name_mock', uri=uri)])
+
+    assert [type(uri_obj) for uri_obj in uri_objs] == [StationUri, StationUri, GenreStationUri, PlaylistItemUri,
+                                                       StationUri]
+    assert uri_objs[0] is PandoraUri.factory(uri) is uri_objs[4]
+    assert uri_objs[1] == uri
+    assert uri_objs[3] == PandoraUri.factory(playlist_item_mock)
+
+
+def test_factory_many_unsupported_type():
+    with pytest.raises(NotImplementedError):
+        PandoraUri.factory_many(['pandora:station:id_mock:token_mock', 0])
+
+    with pytest.raises(NotImplementedError):
+        PandoraUri.factory_many(['spotify:track:token_mock'])
+
+
+def test_search_uri_from_tokens():
+    uri_objs = SearchUri.from_tokens(['S1234567', 'R123456'])
+
+    assert [uri_obj.uri for uri_obj in uri_objs] == ['pandora:search:S1234567', 'pandora:search:R123456']
+    assert uri_objs[1].is_artist_search
+
+    with pytest.raises(AssertionError):
+        SearchUri.from_tokens(['S1234567', 'invalid_token_mock'])
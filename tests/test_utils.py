@@ -9,8 +9,14 @@ import json
 
 import logging
 
+import threading
+
+import time
+
 from mock import mock
 
+import pytest
+
 import requests
 
 from mopidy_pandora import utils
@@ -107,3 +113,253 @@ def test_run_async_queue(caplog):
 def async_func(text, queue=None):
     logger.info(text)
     queue.put('test_value')
+
+
+def test_single_flight_returns_result():
+    single_flight = utils.SingleFlight()
+
+    assert single_flight.call('key', lambda x: x * 2, 21) == 42
+    assert not single_flight.in_flight('key')
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = utils.SingleFlight()
+    release = threading.Event()
+    func = mock.Mock(side_effect=lambda: release.wait(1.0) and 'result')
+    results = queue.Queue()
+
+    def call():
+        results.put(single_flight.call('key', func))
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    threads[0].start()
+    while not single_flight.in_flight('key'):
+        time.sleep(0.01)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(1.0)
+
+    assert func.call_count == 1
+    assert [results.get_nowait() for _ in range(5)] == ['result'] * 5
+
+
+def test_single_flight_shares_errors():
+    single_flight = utils.SingleFlight()
+    release = threading.Event()
+    errors = queue.Queue()
+
+    def fail():
+        release.wait(1.0)
+        raise requests.exceptions.RequestException('failed')
+
+    def call():
+        try:
+            single_flight.call('key', fail)
+        except requests.exceptions.RequestException as e:
+            errors.put(e)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    threads[0].start()
+    while not single_flight.in_flight('key'):
+        time.sleep(0.01)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(1.0)
+
+    assert errors.qsize() == 2
+    assert not single_flight.in_flight('key')
+
+
+def test_single_flight_does_not_coalesce_different_keys():
+    single_flight = utils.SingleFlight()
+    func = mock.Mock(return_value='result')
+
+    single_flight.call('key1', func)
+    single_flight.call('key2', func)
+
+    assert func.call_count == 2
+
+
+def test_retry_policy_retries_until_call_succeeds():
+    retry_policy = utils.RetryPolicy(max_attempts=3)
+    func = mock.Mock(side_effect=[requests.exceptions.ConnectionError, requests.exceptions.ConnectionError, 'result'])
+
+    with mock.patch.object(time, 'sleep') as sleep_mock:
+        assert retry_policy.call(func, 'arg') == 'result'
+
+    assert func.call_count == 3
+    func.assert_called_with('arg')
+    assert sleep_mock.call_count == 2
+
+
+def test_retry_policy_raises_after_max_attempts():
+    retry_policy = utils.RetryPolicy(max_attempts=2)
+    func = mock.Mock(side_effect=requests.exceptions.ConnectionError)
+
+    with mock.patch.object(time, 'sleep'):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            retry_policy.call(func)
+
+    assert func.call_count == 2
+
+
+def test_retry_policy_does_not_retry_excluded_errors():
+    retry_policy = utils.RetryPolicy(max_attempts=3, retry_on=lambda e: not isinstance(e, ValueError))
+    func = mock.Mock(side_effect=ValueError)
+
+    with pytest.raises(ValueError):
+        retry_policy.call(func)
+
+    assert func.call_count == 1
+
+
+def test_retry_policy_delay_is_jittered_and_capped():
+    retry_policy = utils.RetryPolicy(base_delay=1, max_delay=4)
+
+    for attempt in range(1, 6):
+        assert 0 <= retry_policy.get_delay(attempt) <= min(4, 2 ** (attempt - 1))
+
+
+def test_circuit_breaker_opens_after_failure_threshold():
+    circuit_breaker = utils.CircuitBreaker('method_mock', failure_threshold=2, reset_timeout=30)
+    func = mock.Mock(side_effect=requests.exceptions.ConnectionError)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            circuit_breaker.call(func)
+
+    assert circuit_breaker.state == utils.CircuitBreaker.OPEN
+    with pytest.raises(utils.CircuitOpenError):
+        circuit_breaker.call(func)
+    assert func.call_count == 2
+
+
+def test_circuit_breaker_ignores_errors_that_are_not_failures():
+    circuit_breaker = utils.CircuitBreaker('method_mock', failure_threshold=1,
+                                           is_failure=lambda e: not isinstance(e, ValueError))
+
+    with pytest.raises(ValueError):
+        circuit_breaker.call(mock.Mock(side_effect=ValueError))
+
+    assert circuit_breaker.state == utils.CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_closes_after_successful_trial_call():
+    circuit_breaker = utils.CircuitBreaker('method_mock', failure_threshold=1, reset_timeout=30)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        circuit_breaker.call(mock.Mock(side_effect=requests.exceptions.ConnectionError))
+
+    with mock.patch.object(time, 'time', return_value=time.time() + 31):
+        assert circuit_breaker.state == utils.CircuitBreaker.HALF_OPEN
+        assert circuit_breaker.call(mock.Mock(return_value='result')) == 'result'
+
+    assert circuit_breaker.state == utils.CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_reopens_after_failed_trial_call():
+    circuit_breaker = utils.CircuitBreaker('method_mock', failure_threshold=3, reset_timeout=30)
+    circuit_breaker._state = utils.CircuitBreaker.OPEN
+    circuit_breaker._opened_at = time.time() - 31
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        circuit_breaker.call(mock.Mock(side_effect=requests.exceptions.ConnectionError))
+
+    assert circuit_breaker.state == utils.CircuitBreaker.OPEN
+
+
+def test_token_bucket_allows_bursts_up_to_capacity():
+    bucket = utils.TokenBucket('station_mock', rate=1, capacity=3)
+
+    with mock.patch.object(time, 'time', return_value=bucket._updated_at):
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+        assert bucket.remaining == 0
+        assert bucket.reserve() == 1
+        assert bucket.reserve() == 2
+
+    assert bucket.stats['delayed'] == 2
+    assert bucket.stats['total_delay'] == 3
+
+
+def test_token_bucket_refills_over_time():
+    bucket = utils.TokenBucket('station_mock', rate=0.5, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+
+    with mock.patch.object(time, 'time', return_value=bucket._updated_at + 2):
+        assert bucket.remaining == 1
+
+    with mock.patch.object(time, 'time', return_value=bucket._updated_at + 60):
+        assert bucket.remaining == 2
+
+
+def test_token_bucket_rejects_calls_that_would_wait_too_long():
+    bucket = utils.TokenBucket('station_mock', rate=0.1, capacity=1)
+
+    with mock.patch.object(time, 'time', return_value=bucket._updated_at):
+        bucket.reserve(max_delay=5)
+        with pytest.raises(utils.RateLimitExceeded):
+            bucket.reserve(max_delay=5)
+
+    assert bucket.stats['calls'] == 1
+    assert bucket.stats['rejected'] == 1
+
+
+@pytest.yield_fixture
+def scheduler():
+    scheduler = utils.Scheduler()
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_scheduler_runs_calls_in_order_of_deadline(scheduler):
+    done = threading.Event()
+    calls = []
+
+    scheduler.call_later(0.1, done.set)
+    scheduler.call_later(0.05, calls.append, 'second')
+    scheduler.call_soon(calls.append, 'first')
+
+    assert done.wait(1.0)
+    assert calls == ['first', 'second']
+
+
+def test_scheduler_runs_all_calls_on_a_single_thread(scheduler):
+    done = threading.Event()
+    threads = set()
+
+    for delay in [0, 0.01, 0.02]:
+        scheduler.call_later(delay, lambda: threads.add(threading.current_thread()))
+    scheduler.call_later(0.03, done.set)
+
+    assert done.wait(1.0)
+    assert len(threads) == 1
+    assert threading.current_thread() not in threads
+
+
+def test_scheduler_does_not_run_cancelled_calls(scheduler):
+    done = threading.Event()
+    func_mock = mock.Mock()
+
+    scheduler.cancel(scheduler.call_later(0.01, func_mock))
+    scheduler.call_later(0.02, done.set)
+
+    assert done.wait(1.0)
+    assert not func_mock.called
+    assert scheduler.pending == 0
+
+
+def test_scheduler_continues_after_error(scheduler, caplog):
+    done = threading.Event()
+
+    scheduler.call_soon(mock.Mock(side_effect=ValueError, __name__=str('func_mock')))
+    scheduler.call_later(0.01, done.set)
+
+    assert done.wait(1.0)
+    assert "Error running scheduled call 'func_mock'" in caplog.text()